@@ -1,237 +1,328 @@
+import time
+STARTUP_T0 = time.perf_counter()
+
 import os
 import sys
 import re
-import time
-import yt_dlp
 import json
-import math
-import requests
-from datetime import datetime
+import uuid
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                            QLabel, QLineEdit, QPushButton, QListWidget, QListWidgetItem,
+                            QLabel, QLineEdit, QPushButton,
                             QComboBox, QProgressBar, QCheckBox, QTabWidget, QMessageBox,
                             QGroupBox, QGridLayout, QSizePolicy, QFrame, QFileDialog,
-                            QDialog, QDesktopWidget, QSplitter, QTextEdit, QAbstractItemView)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QSize, QTimer, QObject
+                            QDialog, QDesktopWidget, QSplitter, QPlainTextEdit, QAbstractItemView,
+                            QSpinBox, QScrollArea, QListView)
+from PyQt5.QtCore import (Qt, QThread, pyqtSignal, QSize, QTimer, QObject,
+                          QAbstractListModel, QModelIndex, QMimeData)
 from PyQt5.QtGui import QFont, QIcon, QPixmap, QColor, QImage, QPalette
 
-# Global constants
-COOKIE_PATH = r"C:\Users\meet\Desktop\Some_randon_shi\youtube.com_cookies.txt"
-THUMBNAIL_CACHE = {}
+from downloader_core import (
+    COOKIE_PATH, APP_DATA_DIR, DEFAULT_BASE_DOWNLOAD_DIR,
+    DEFAULT_MAX_CONCURRENT_DOWNLOADS, MAX_CONCURRENT_DOWNLOADS_LIMIT,
+    DEFAULT_EXTRACTION_WORKERS, MAX_EXTRACTION_WORKERS_LIMIT, DEFAULT_POSTPROCESS_WORKERS,
+    DEFAULT_METADATA_TTL_HOURS, DEFAULT_STREAM_URL_TTL_HOURS, DEFAULT_PROGRESS_INTERVAL_MS,
+    DEFAULT_MIN_FRAGMENT_THREADS, DEFAULT_MAX_FRAGMENT_THREADS, MAX_FRAGMENT_THREADS_LIMIT,
+    YDL_SESSIONS, METADATA_CACHE, BANDWIDTH, FRAGMENT_TUNER, METRICS, PROFILER, PROFILE_ENV_VAR,
+    profiled, profiling_requested, PARTIAL_FILE_POLICIES, DEFAULT_PARTIAL_FILE_POLICY, SHUTDOWN_GRACE_SECONDS,
+    DownloadCancelled, call_cancellable, DownloadEngine, EngineListener, JobJournal,
+    DownloadArchive, skip_summary, video_id_from_url,
+    LOGGER, LOG_VIEW_MAX_LINES, LogPipeline, RingBufferHandler, ProgressBoard,
+    format_size, format_eta, dated_download_dir, parse_range_selection, parse_schedule, select_formats, video_codec_key,
+    estimate_format_size, estimate_item_size, ThroughputMeter,
+    extract_video_info, iter_playlist, resolve_urls, resolve_playlist_entries
+)
+
+# GUI constants
+DEFAULT_THUMBNAIL_MEMORY_MB = 32
+DEFAULT_THUMBNAIL_DISK_MB = 256
+THUMBNAIL_MAX_SIZE = (320, 180)
+THUMBNAIL_JPEG_QUALITY = 85
+THUMBNAIL_FETCH_WORKERS = 4
+THUMBNAIL_RETRY_BASE = 5.0
+THUMBNAIL_RETRY_CAP = 300.0
+LOG_VIEW_FLUSH_MS = 250
+METRICS_EXPORT_MS = 15000
+STALL_HEARTBEAT_MS = 50
+QUEUE_ICON_CACHE_SIZE = 512
+STARTUP_TIMINGS_PATH = os.path.join(APP_DATA_DIR, 'startup_timings.jsonl')
+SINGLE_TAB, BATCH_TAB, PLAYLIST_TAB, QUEUE_TAB, PROGRESS_TAB, SETTINGS_TAB = range(6)
+
+class ThumbnailCache:
+    """Size-bounded in-memory LRU of QImages backed by a JPEG cache on disk"""
+
+    def __init__(self, cache_dir, memory_limit_mb=DEFAULT_THUMBNAIL_MEMORY_MB,
+                 disk_limit_mb=DEFAULT_THUMBNAIL_DISK_MB):
+        self.cache_dir = cache_dir
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+        self.disk_limit = disk_limit_mb * 1024 * 1024
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.disk_bytes = None
+        self.lock = threading.Lock()
+
+    def path_for(self, video_id):
+        return os.path.join(self.cache_dir, re.sub(r'[^0-9A-Za-z_-]', '_', video_id) + '.jpg')
+
+    def peek(self, video_id):
+        with self.lock:
+            image = self.memory.get(video_id)
+            if image is not None:
+                self.memory.move_to_end(video_id)
+            return image
+
+    def get(self, video_id):
+        image = self.peek(video_id)
+        if image is not None:
+            return image
+
+        path = self.path_for(video_id)
+        if not os.path.exists(path):
+            return None
+        image = QImage(path)
+        if image.isNull():
+            return None
+        os.utime(path)
+        self.remember(video_id, image)
+        return image
+
+    def put(self, video_id, image):
+        max_w, max_h = THUMBNAIL_MAX_SIZE
+        if image.width() > max_w or image.height() > max_h:
+            image = image.scaled(max_w, max_h, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.remember(video_id, image)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path_for(video_id)
+        if image.save(path, 'JPG', THUMBNAIL_JPEG_QUALITY):
+            with self.lock:
+                if self.disk_bytes is not None:
+                    self.disk_bytes += os.path.getsize(path)
+            self.trim_disk()
+        return image
+
+    def remember(self, video_id, image):
+        with self.lock:
+            previous = self.memory.pop(video_id, None)
+            if previous is not None:
+                self.memory_bytes -= previous.sizeInBytes()
+            self.memory[video_id] = image
+            self.memory_bytes += image.sizeInBytes()
+            self.trim_memory()
+
+    def trim_memory(self):
+        while self.memory_bytes > self.memory_limit and len(self.memory) > 1:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= evicted.sizeInBytes()
+
+    def trim_disk(self):
+        with self.lock:
+            if self.disk_bytes is not None and self.disk_bytes <= self.disk_limit:
+                return
+            try:
+                entries = [entry for entry in os.scandir(self.cache_dir) if entry.is_file()]
+            except FileNotFoundError:
+                self.disk_bytes = 0
+                return
+            entries = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries)
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.disk_limit:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+            self.disk_bytes = total
+
+    def set_limits(self, memory_limit_mb, disk_limit_mb):
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+        self.disk_limit = disk_limit_mb * 1024 * 1024
+        with self.lock:
+            self.trim_memory()
+            self.disk_bytes = None
+        self.trim_disk()
+
+THUMBNAIL_CACHE = ThumbnailCache(os.path.join(APP_DATA_DIR, 'thumbnails'))
+
+class ThumbnailFetcher(QObject):
+    """Fixed-size pool that fetches thumbnails over one keep-alive HTTP session.
+
+    Requests for a video_id that is already being fetched are merged into the
+    in-flight job; every listener is notified through the single loaded or
+    failed signal.
+    """
+    loaded = pyqtSignal(str, QImage)
+    failed = pyqtSignal(str)
+
+    def __init__(self, max_workers=THUMBNAIL_FETCH_WORKERS, parent=None):
+        super().__init__(parent)
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='thumbnail')
+        self.http = None
+        self.inflight = {}
+        self.lock = threading.Lock()
+
+    def http_session(self):
+        # requests is only imported once the first thumbnail actually has to be downloaded
+        with self.lock:
+            if self.http is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                self.http = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+                self.http.mount('https://', adapter)
+                self.http.mount('http://', adapter)
+            return self.http
+
+    def request(self, url, video_id):
+        image = THUMBNAIL_CACHE.peek(video_id)
+        if image is not None:
+            METRICS.count('thumbnail_memory_hits')
+            self.loaded.emit(video_id, image)
+            return
 
-def format_size(size_bytes):
-    """Format size in bytes to human-readable format"""
-    if size_bytes is None:
-        return "Unknown size"
-    
-    if size_bytes == 0:
-        return "0B"
-    
-    size_name = ("B", "KB", "MB", "GB", "TB")
-    i = int(math.floor(math.log(size_bytes, 1024)))
-    p = math.pow(1024, i)
-    s = round(size_bytes / p, 2)
-    return f"{s} {size_name[i]}"
-
-class DownloadWorker(QThread):
-    progress = pyqtSignal(dict)
-    completed = pyqtSignal(dict)
-    failed = pyqtSignal(str, str)
-    status = pyqtSignal(str)
-
-    def __init__(self, item, download_dir, cookies):
-        super().__init__()
-        self.item = item
-        self.download_dir = download_dir
-        self.cookies = cookies
-        self.cancelled = False
+        with self.lock:
+            if video_id in self.inflight:
+                return
+            self.inflight[video_id] = self.executor.submit(self.fetch, url, video_id)
 
-    def run(self):
-        url = self.item['url']
-        title = self.item['title'].replace('/', '_').replace('\\', '_')[:100]
-        
-        if 'audio_only' in self.item:
-            format_spec = f"bestaudio[abr>={self.item['audio_format']['abr']}]"
-            ydl_opts = {
-                'quiet': True,
-                'cookiefile': self.cookies if os.path.exists(self.cookies) else None,
-                'outtmpl': os.path.join(self.download_dir, f"{title}.mp3"),
-                'format': format_spec,
-                'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3'}],
-                'ignoreerrors': True,
-                'noprogress': False,
-                'progress_hooks': [self.progress_hook],
-                'no_warnings': True
-            }
-        else:
-            video_selector = f"bestvideo[height={self.item['video_res']}][vcodec^={self.item['video_codec']}]"
-            audio_selector = f"bestaudio[abr>={self.item['audio_abr']}]"
-            format_spec = f"{video_selector}+{audio_selector}/best"
-            ydl_opts = {
-                'quiet': True,
-                'cookiefile': self.cookies if os.path.exists(self.cookies) else None,
-                'outtmpl': os.path.join(self.download_dir, f"{title}.mp4"),
-                'format': format_spec,
-                'merge_output_format': 'mp4',
-                'postprocessors': [{'key': 'FFmpegMerger'}],
-                'ignoreerrors': True,
-                'noprogress': False,
-                'progress_hooks': [self.progress_hook],
-                'no_warnings': True
-            }
-        
+    @profiled
+    def fetch(self, url, video_id):
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
-            if not self.cancelled:
-                self.completed.emit({"title": title, "path": ydl_opts['outtmpl']})
-        except Exception as e:
-            if not self.cancelled:
-                self.failed.emit(title, str(e))
-
-    def progress_hook(self, d):
-        if self.cancelled:
-            return
-            
-        if d['status'] == 'downloading':
-            self.progress.emit(d)
-        elif d['status'] == 'finished':
-            self.status.emit("Merging formats...")
+            image = self.load(url, video_id)
+        finally:
+            # Before notifying: a listener that asks again must start a new fetch, not join this one
+            with self.lock:
+                self.inflight.pop(video_id, None)
+        if image is None:
+            self.failed.emit(video_id)
+        else:
+            self.loaded.emit(video_id, image)
 
-    def cancel(self):
-        self.cancelled = True
+    def load(self, url, video_id):
+        image = THUMBNAIL_CACHE.get(video_id)
+        if image is not None:
+            METRICS.count('thumbnail_cache_hits')
+            return image
 
-class ThumbnailLoader(QThread):
-    loaded = pyqtSignal(str, QPixmap)
-    
-    def __init__(self, url, video_id):
-        super().__init__()
-        self.url = url
-        self.video_id = video_id
-        
-    def run(self):
-        if self.video_id in THUMBNAIL_CACHE:
-            self.loaded.emit(self.video_id, THUMBNAIL_CACHE[self.video_id])
-            return
-            
         try:
-            response = requests.get(self.url, stream=True)
+            with METRICS.timed('thumbnail_fetch'):
+                response = self.http_session().get(url, timeout=15)
+            METRICS.count('thumbnail_bytes', len(response.content))
             if response.status_code == 200:
                 image = QImage()
                 image.loadFromData(response.content)
-                pixmap = QPixmap.fromImage(image)
-                THUMBNAIL_CACHE[self.video_id] = pixmap
-                self.loaded.emit(self.video_id, pixmap)
+                if not image.isNull():
+                    return THUMBNAIL_CACHE.put(video_id, image)
         except Exception:
-            placeholder = QPixmap(120, 90)
-            placeholder.fill(QColor(60, 60, 60))
-            THUMBNAIL_CACHE[self.video_id] = placeholder
-            self.loaded.emit(self.video_id, placeholder)
+            pass
+        # HTTP errors and undecodable images end up here too, so listeners can ask again later
+        METRICS.count('thumbnail_failures')
+        return None
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.http is not None:
+            self.http.close()
+
+class EngineBridge(QObject, EngineListener):
+    """Re-emits DownloadEngine callbacks as Qt signals so they land on the GUI thread"""
+    started = pyqtSignal(dict)
+    status = pyqtSignal(str, str)
+    downloaded = pyqtSignal(str)
+    completed = pyqtSignal(str, dict)
+    failed = pyqtSignal(str, str, str)
+    cancelled = pyqtSignal(str)
+    queue_done = pyqtSignal(dict)
+
+    def job_started(self, item):
+        self.started.emit(item)
+
+    def job_status(self, job_id, status):
+        self.status.emit(job_id, status)
+
+    def job_downloaded(self, job_id):
+        self.downloaded.emit(job_id)
+
+    def job_completed(self, job_id, result):
+        self.completed.emit(job_id, result)
+
+    def job_failed(self, job_id, title, error):
+        self.failed.emit(job_id, title, error)
+
+    def job_cancelled(self, job_id):
+        self.cancelled.emit(job_id)
+
+    def queue_finished(self, outcomes):
+        self.queue_done.emit(outcomes)
 
 class PlaylistProcessor(QThread):
     progress = pyqtSignal(int, int, str)
     completed = pyqtSignal()
     error = pyqtSignal(str)
 
-    def __init__(self, playlist_entries, selected_indices, cookies):
+    def __init__(self, playlist_entries, selected_indices, cookies, max_workers=DEFAULT_EXTRACTION_WORKERS):
         super().__init__()
         self.playlist_entries = playlist_entries
         self.selected_indices = selected_indices
         self.cookies = cookies
+        self.max_workers = max_workers
         self.download_items = []
         self.cancelled = False
 
+    @profiled
     def run(self):
+        with METRICS.timed('playlist_extraction'):
+            download_items = self.resolve()
+        if download_items is None:
+            return
+
+        self.download_items = download_items
         total = len(self.selected_indices)
-        added_count = 0
-        total_size = 0
-        
-        for i, idx in enumerate(self.selected_indices):
-            if self.cancelled:
-                return
-                
-            entry = self.playlist_entries[idx-1]
-            url = entry.get('url')
-            if not url:
-                continue
-                
-            self.progress.emit(i+1, total, f"Processing video {idx}/{len(self.playlist_entries)}")
-            
-            try:
-                ydl_opts = {
-                    'quiet': True,
-                    'cookiefile': self.cookies if os.path.exists(self.cookies) else None,
-                    'no_warnings': True,
-                    'ignoreerrors': True
-                }
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(url, download=False)
-                    if not info:
-                        continue
-                        
-                    formats = info.get('formats', [])
-                    original_language = info.get('language')
-                    
-                    h264_videos = [
-                        f for f in formats 
-                        if f.get('vcodec', '').startswith('avc1') 
-                        and f.get('acodec') == 'none'
-                        and f.get('height') is not None
-                    ]
-                    if not h264_videos:
-                        vp9_videos = [
-                            f for f in formats 
-                            if f.get('vcodec', '').startswith('vp09') 
-                            and f.get('acodec') == 'none'
-                            and f.get('height') is not None
-                        ]
-                        if not vp9_videos:
-                            continue
-                        best_video = max(vp9_videos, key=lambda x: x.get('height', 0))
-                    else:
-                        best_video = max(h264_videos, key=lambda x: x.get('height', 0))
-                        
-                    best_audio = self.select_best_audio(formats, original_language)
-                    if not best_audio:
-                        continue
-                        
-                    video_size = best_video.get('filesize') or best_video.get('filesize_approx') or 0
-                    audio_size = best_audio.get('filesize') or best_audio.get('filesize_approx') or 0
-                    total_size += (video_size + audio_size)
-                    
-                    self.download_items.append({
-                        'url': url,
-                        'video_res': best_video['height'],
-                        'video_codec': 'avc1' if 'avc1' in best_video['vcodec'] else 'vp9',
-                        'audio_abr': best_audio['abr'],
-                        'title': info.get('title', f"Video {idx}"),
-                        'thumbnail': info.get('thumbnail', ''),
-                        'video_id': info.get('id', f'vid_{idx}')
-                    })
-                    added_count += 1
-            except Exception as e:
-                self.error.emit(f"Error processing video {idx}: {str(e)}")
-        
-        self.progress.emit(total, total, f"Added {added_count} videos to queue")
+        self.progress.emit(total, total, f"Added {len(self.download_items)} videos to queue")
         self.completed.emit()
 
-    def select_best_audio(self, formats, original_language=None):
-        if original_language:
-            candidates = [
-                f for f in formats
-                if f.get('acodec', '').startswith(('mp4a.40.2', 'mp4a.40.5', 'aac'))
-                and f.get('vcodec') == 'none'
-                and f.get('language') == original_language
-            ]
-            if candidates:
-                return max(candidates, key=lambda a: a.get('abr', 0))
-        
-        candidates = [
-            f for f in formats
-            if f.get('acodec', '').startswith(('mp4a.40.2', 'mp4a.40.5', 'aac'))
-            and f.get('vcodec') == 'none'
-        ]
-        return max(candidates, key=lambda a: a.get('abr', 0)) if candidates else None
+    def resolve(self):
+        return resolve_playlist_entries(
+            self.cookies,
+            self.playlist_entries,
+            self.selected_indices,
+            self.max_workers,
+            on_progress=lambda done, total: self.progress.emit(done, total, f"Processed {done}/{total} videos"),
+            on_error=lambda job, e: self.error.emit(f"Error processing video {job[2]}: {str(e)}"),
+            is_cancelled=lambda: self.cancelled
+        )
+
+    def cancel(self):
+        self.cancelled = True
+
+class PlaylistEnumerator(QThread):
+    batch = pyqtSignal(dict, list)
+    finished_listing = pyqtSignal()
+    error = pyqtSignal(str)
+
+    def __init__(self, url, cookies):
+        super().__init__()
+        self.url = url
+        self.cookies = cookies
+        self.cancelled = False
+        self.failed = False
+
+    @profiled
+    def run(self):
+        try:
+            with METRICS.timed('playlist_listing'):
+                for playlist_info, entries in iter_playlist(self.cookies, self.url, is_cancelled=lambda: self.cancelled):
+                    self.batch.emit(playlist_info, entries)
+        except Exception as e:
+            self.failed = True
+            self.error.emit(str(e))
+        self.finished_listing.emit()
 
     def cancel(self):
         self.cancelled = True
@@ -244,105 +335,329 @@ class VideoInfoFetcher(QThread):
         super().__init__()
         self.url = url
         self.cookies = cookies
+        self.cancelled = False
 
+    @profiled
     def run(self):
         try:
-            ydl_opts = {
-                'quiet': True,
-                'cookiefile': self.cookies if os.path.exists(self.cookies) else None,
-                'no_warnings': True,
-                'ignoreerrors': True
-            }
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(self.url, download=False)
-                self.info_fetched.emit(info)
+            with METRICS.timed('video_info_fetch'):
+                info = call_cancellable(extract_video_info, self.cookies, self.url,
+                                        is_cancelled=lambda: self.cancelled)
+        except DownloadCancelled:
+            return
         except Exception as e:
             self.error.emit(str(e))
+            return
+        if not self.cancelled:
+            self.info_fetched.emit(info)
+
+    def cancel(self):
+        self.cancelled = True
 
 class BatchDownloader(QThread):
     progress = pyqtSignal(int, int, str)
     completed = pyqtSignal(list)
     error = pyqtSignal(str)
 
-    def __init__(self, urls, cookies):
+    def __init__(self, urls, cookies, max_workers=DEFAULT_EXTRACTION_WORKERS):
         super().__init__()
         self.urls = urls
         self.cookies = cookies
+        self.max_workers = max_workers
         self.download_items = []
+        self.cancelled = False
 
+    @profiled
     def run(self):
-        total = len(self.urls)
-        for i, url in enumerate(self.urls):
-            try:
-                ydl_opts = {
-                    'quiet': True,
-                    'cookiefile': self.cookies if os.path.exists(self.cookies) else None,
-                    'no_warnings': True,
-                    'ignoreerrors': True
-                }
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(url, download=False)
-                    if not info:
-                        continue
-
-                    formats = info.get('formats', [])
-                    original_language = info.get('language')
-
-                    h264_videos = [
-                        f for f in formats 
-                        if f.get('vcodec', '').startswith('avc1') 
-                        and f.get('acodec') == 'none'
-                        and f.get('height') is not None
-                    ]
-                    if not h264_videos:
-                        vp9_videos = [
-                            f for f in formats 
-                            if f.get('vcodec', '').startswith('vp09') 
-                            and f.get('acodec') == 'none'
-                            and f.get('height') is not None
-                        ]
-                        if not vp9_videos:
-                            continue
-                        best_video = max(vp9_videos, key=lambda x: x.get('height', 0))
-                    else:
-                        best_video = max(h264_videos, key=lambda x: x.get('height', 0))
-
-                    best_audio = self.select_best_audio(formats, original_language)
-                    if not best_audio:
-                        continue
-
-                    download_item = {
-                        'url': url,
-                        'video_res': best_video['height'],
-                        'video_codec': 'avc1' if 'avc1' in best_video['vcodec'] else 'vp9',
-                        'audio_abr': best_audio['abr'],
-                        'title': info.get('title', f"Video {i+1}"),
-                        'thumbnail': info.get('thumbnail', ''),
-                        'video_id': info.get('id', f'vid_{i+1}')
-                    }
-                    self.download_items.append(download_item)
-                    self.progress.emit(i+1, total, f"Processed {i+1}/{total} videos")
-            except Exception as e:
-                self.error.emit(str(e))
+        with METRICS.timed('batch_extraction'):
+            download_items = resolve_urls(
+                self.cookies,
+                self.urls,
+                self.max_workers,
+                on_progress=lambda done, total: self.progress.emit(done, total, f"Processed {done}/{total} videos"),
+                on_error=lambda job, e: self.error.emit(str(e)),
+                is_cancelled=lambda: self.cancelled
+            )
+        if download_items is None:
+            return
+        self.download_items = download_items
         self.completed.emit(self.download_items)
 
-    def select_best_audio(self, formats, original_language=None):
-        if original_language:
-            candidates = [
-                f for f in formats
-                if f.get('acodec', '').startswith(('mp4a.40.2', 'mp4a.40.5', 'aac'))
-                and f.get('vcodec') == 'none'
-                and f.get('language') == original_language
-            ]
-            if candidates:
-                return max(candidates, key=lambda a: a.get('abr', 0))
-        
-        candidates = [
-            f for f in formats
-            if f.get('acodec', '').startswith(('mp4a.40.2', 'mp4a.40.5', 'aac'))
-            and f.get('vcodec') == 'none'
-        ]
-        return max(candidates, key=lambda a: a.get('abr', 0)) if candidates else None
+    def cancel(self):
+        self.cancelled = True
+
+class QueueModel(QAbstractListModel):
+    """Download queue backed by a plain list with a job_id -> row index.
+
+    Row numbers after an insert or removal in the middle are recomputed lazily,
+    so appends, thumbnail updates and lookups stay O(1) for large queues.
+    Thumbnails are requested only when a row is actually painted.
+    """
+    thumbnail_needed = pyqtSignal(str, str)
+    order_changed = pyqtSignal()
+    MIME_TYPE = 'application/x-youtube-downloader-jobs'
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.items = []
+        self.rows = {}
+        self.jobs_by_video = {}
+        self.total_size = 0
+        self.unsized = 0
+        self.stale_from = None
+        self.icons = OrderedDict()
+        self.requested_thumbnails = set()
+        # video_id -> (failed fetches, monotonic time before which it is not requested again)
+        self.thumbnail_retries = {}
+        placeholder = QPixmap(120, 90)
+        placeholder.fill(QColor(60, 60, 60))
+        self.placeholder_icon = QIcon(placeholder)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        item = self.items[index.row()]
+        if role == Qt.DisplayRole:
+            if item.get('audio_only'):
+                return f"{item['title']} (Audio Only, {item.get('audio_mode', 'mp3')})"
+            return item['title']
+        if role == Qt.DecorationRole:
+            return self.icon_for(item)
+        if role == Qt.ToolTipRole:
+            return item['url']
+        if role == Qt.UserRole:
+            return item
+        return None
+
+    def icon_for(self, item):
+        video_id = item['video_id']
+        icon = self.icons.get(video_id)
+        if icon is not None:
+            self.icons.move_to_end(video_id)
+            return icon
+        if item.get('thumbnail') and video_id not in self.requested_thumbnails:
+            retry = self.thumbnail_retries.get(video_id)
+            if retry is None or time.monotonic() >= retry[1]:
+                self.requested_thumbnails.add(video_id)
+                self.thumbnail_needed.emit(item['thumbnail'], video_id)
+        return self.placeholder_icon
+
+    def thumbnail_failed(self, video_id):
+        """Request the thumbnail again once the row is painted after a doubling backoff"""
+        if video_id not in self.requested_thumbnails:
+            return
+        self.requested_thumbnails.discard(video_id)
+        failures = self.thumbnail_retries.get(video_id, (0, 0))[0] + 1
+        delay = min(THUMBNAIL_RETRY_CAP, THUMBNAIL_RETRY_BASE * 2 ** (failures - 1))
+        self.thumbnail_retries[video_id] = (failures, time.monotonic() + delay)
+        # Repainting the rows is what re-requests it, and only for rows still on screen
+        QTimer.singleShot(int(delay * 1000), lambda: self.icon_changed(video_id))
+
+    def icon_changed(self, video_id):
+        for job_id in self.jobs_by_video.get(video_id, ()):
+            row = self.row_of(job_id)
+            if row is not None:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def flags(self, index):
+        if index.isValid():
+            return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+        return Qt.ItemIsDropEnabled
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def mimeTypes(self):
+        return [self.MIME_TYPE]
+
+    def mimeData(self, indexes):
+        mime = QMimeData()
+        rows = sorted({index.row() for index in indexes})
+        mime.setData(self.MIME_TYPE, json.dumps(rows).encode())
+        return mime
+
+    def dropMimeData(self, mime, action, row, column, parent):
+        if action != Qt.MoveAction or not mime.hasFormat(self.MIME_TYPE):
+            return False
+        if row == -1:
+            row = parent.row() if parent.isValid() else len(self.items)
+        self.move_rows(json.loads(bytes(mime.data(self.MIME_TYPE)).decode()), row)
+        # The move is already done; returning False stops the view from
+        # removing the source rows a second time.
+        return False
+
+    def add_items(self, download_items):
+        if not download_items:
+            return
+        first = len(self.items)
+        self.beginInsertRows(QModelIndex(), first, first + len(download_items) - 1)
+        for offset, item in enumerate(download_items):
+            self.items.append(item)
+            self.rows[item['job_id']] = first + offset
+            self.jobs_by_video.setdefault(item['video_id'], set()).add(item['job_id'])
+            self.count_size(item, 1)
+        self.endInsertRows()
+
+    def remove_job(self, job_id):
+        row = self.row_of(job_id)
+        if row is not None:
+            self.remove_rows([row])
+
+    def job_ids(self, rows=None):
+        if rows is None:
+            return [item['job_id'] for item in self.items]
+        return [self.items[row]['job_id'] for row in rows]
+
+    def remove_rows(self, rows):
+        for row in sorted(set(rows), reverse=True):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            self.forget(self.items.pop(row))
+            self.mark_stale(row)
+            self.endRemoveRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.items = []
+        self.rows.clear()
+        self.jobs_by_video.clear()
+        self.total_size = 0
+        self.unsized = 0
+        self.icons.clear()
+        self.requested_thumbnails.clear()
+        self.thumbnail_retries.clear()
+        self.stale_from = None
+        self.endResetModel()
+
+    def move_rows(self, rows, target):
+        rows = sorted(set(r for r in rows if 0 <= r < len(self.items)))
+        if not rows:
+            return
+        moving = set(rows)
+        order = [r for r in range(len(self.items)) if r not in moving]
+        insert_at = target - sum(1 for r in rows if r < target)
+        order[insert_at:insert_at] = rows
+
+        self.layoutAboutToBeChanged.emit()
+        new_row = {old: new for new, old in enumerate(order)}
+        persistent = self.persistentIndexList()
+        self.changePersistentIndexList(persistent, [self.index(new_row[i.row()]) for i in persistent])
+        self.items = [self.items[r] for r in order]
+        self.mark_stale(min(rows[0], insert_at))
+        self.layoutChanged.emit()
+        self.order_changed.emit()
+
+    def count_size(self, item, sign):
+        size = item.get('estimated_size')
+        if size:
+            self.total_size += sign * size
+        else:
+            self.unsized += sign
+
+    def forget(self, item):
+        self.count_size(item, -1)
+        self.rows.pop(item['job_id'], None)
+        jobs = self.jobs_by_video.get(item['video_id'])
+        if jobs is not None:
+            jobs.discard(item['job_id'])
+            if not jobs:
+                del self.jobs_by_video[item['video_id']]
+                self.icons.pop(item['video_id'], None)
+                self.requested_thumbnails.discard(item['video_id'])
+                self.thumbnail_retries.pop(item['video_id'], None)
+
+    def mark_stale(self, row):
+        self.stale_from = row if self.stale_from is None else min(self.stale_from, row)
+
+    def row_of(self, job_id):
+        if self.stale_from is not None:
+            for row in range(self.stale_from, len(self.items)):
+                self.rows[self.items[row]['job_id']] = row
+            self.stale_from = None
+        return self.rows.get(job_id)
+
+    def set_thumbnail(self, video_id, image):
+        jobs = self.jobs_by_video.get(video_id)
+        if not jobs:
+            return
+        pixmap = QPixmap.fromImage(image).scaled(120, 90, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.icons[video_id] = QIcon(pixmap)
+        self.icons.move_to_end(video_id)
+        self.thumbnail_retries.pop(video_id, None)
+        while len(self.icons) > QUEUE_ICON_CACHE_SIZE:
+            evicted, _ = self.icons.popitem(last=False)
+            self.requested_thumbnails.discard(evicted)
+        self.icon_changed(video_id)
+
+class DownloadJobWidget(QFrame):
+    cancel_requested = pyqtSignal(str)
+
+    def __init__(self, item, parent=None):
+        super().__init__(parent)
+        self.job_id = item['job_id']
+        self.video_id = item['video_id']
+        self.setStyleSheet("DownloadJobWidget { background-color: #252526; border: 1px solid #3E3E42; border-radius: 5px; }")
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(8, 8, 8, 8)
+        layout.setSpacing(10)
+
+        self.thumbnail_label = QLabel()
+        self.thumbnail_label.setFixedSize(120, 90)
+        placeholder = QPixmap(120, 90)
+        placeholder.fill(QColor(60, 60, 60))
+        self.thumbnail_label.setPixmap(placeholder)
+        layout.addWidget(self.thumbnail_label)
+
+        info_layout = QVBoxLayout()
+        self.title_label = QLabel(item['title'])
+        self.title_label.setWordWrap(True)
+        self.title_label.setStyleSheet("font-weight: bold; font-size: 13px;")
+        info_layout.addWidget(self.title_label)
+
+        self.url_label = QLabel(f'<a href="{item["url"]}">{item["url"]}</a>')
+        self.url_label.setStyleSheet("color: #AAAAAA; font-size: 11px;")
+        self.url_label.setOpenExternalLinks(True)
+        info_layout.addWidget(self.url_label)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setTextVisible(True)
+        self.progress_bar.setFormat("0%")
+        info_layout.addWidget(self.progress_bar)
+
+        details_layout = QHBoxLayout()
+        self.status_label = QLabel("Starting download...")
+        self.speed_label = QLabel("0 MB/s")
+        self.downloaded_label = QLabel("0 MB / 0 MB")
+        self.eta_label = QLabel("ETA: Calculating...")
+        self.fragments_label = QLabel("")
+        self.fragments_label.setStyleSheet("color: #AAAAAA;")
+        details_layout.addWidget(self.status_label, 1)
+        details_layout.addWidget(self.fragments_label)
+        details_layout.addWidget(self.speed_label)
+        details_layout.addWidget(self.downloaded_label)
+        details_layout.addWidget(self.eta_label)
+        info_layout.addLayout(details_layout)
+
+        layout.addLayout(info_layout, 1)
+
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setStyleSheet("background-color: #A1260D;")
+        self.cancel_btn.clicked.connect(self.request_cancel)
+        layout.addWidget(self.cancel_btn, 0, Qt.AlignVCenter)
+
+    def request_cancel(self):
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.setText("Cancelling...")
+        self.cancel_requested.emit(self.job_id)
+
+    def set_thumbnail(self, pixmap):
+        self.thumbnail_label.setPixmap(pixmap.scaled(120, 90, Qt.KeepAspectRatio, Qt.SmoothTransformation))
 
 class YouTubeDownloader(QMainWindow):
     def __init__(self):
@@ -363,7 +678,7 @@ class YouTubeDownloader(QMainWindow):
             QLabel {
                 color: #DCDCDC;
             }
-            QLineEdit, QComboBox, QTextEdit {
+            QLineEdit, QComboBox, QPlainTextEdit {
                 background-color: #3E3E42;
                 border: 1px solid #3E3E42;
                 border-radius: 3px;
@@ -384,7 +699,7 @@ class YouTubeDownloader(QMainWindow):
             QPushButton:disabled {
                 background-color: #505050;
             }
-            QListWidget {
+            QListWidget, QListView {
                 background-color: #252526;
                 border: 1px solid #3E3E42;
                 border-radius: 3px;
@@ -430,14 +745,68 @@ class YouTubeDownloader(QMainWindow):
             }
         """)
         
-        self.download_workers = {}
-        self.base_download_dir = os.path.join(os.getcwd(), 'download')
-        self.current_date = datetime.now().date()
+        self.job_widgets = {}
+        self.job_progress = {}
+        self.speeds = {}
+        self.throughput = ThroughputMeter()
+        self.lazy_tabs = {}
+        self.log_buffer = RingBufferHandler(LOG_VIEW_MAX_LINES)
+        self.log_timer = QTimer(self)
+        self.log_timer.setInterval(LOG_VIEW_FLUSH_MS)
+        self.log_timer.timeout.connect(self.flush_log_views)
+        self.first_paint_done = False
+        self.max_concurrent_downloads = DEFAULT_MAX_CONCURRENT_DOWNLOADS
+        self.extraction_workers = DEFAULT_EXTRACTION_WORKERS
+        self.queue_running = False
+        self.progress_board = ProgressBoard()
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(DEFAULT_PROGRESS_INTERVAL_MS)
+        self.progress_timer.timeout.connect(self.apply_progress_updates)
+        self.base_download_dir = DEFAULT_BASE_DOWNLOAD_DIR
         self.download_dir = self.get_download_dir()
+        self.log_pipeline = LogPipeline(self.download_dir, self.log_buffer)
+        self.log_timer.start()
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setInterval(METRICS_EXPORT_MS)
+        self.metrics_timer.timeout.connect(self.export_metrics)
+        self.metrics_timer.start()
+        self.heartbeat_timer = QTimer(self)
+        self.heartbeat_timer.setTimerType(Qt.PreciseTimer)
+        self.heartbeat_timer.setInterval(STALL_HEARTBEAT_MS)
+        self.heartbeat_timer.timeout.connect(PROFILER.heartbeat)
+        if profiling_requested():
+            self.start_profiling()
         self.cookies = COOKIE_PATH
+        self.engine_bridge = EngineBridge(self)
+        self.engine_bridge.started.connect(self.download_started)
+        self.engine_bridge.status.connect(self.update_status)
+        self.engine_bridge.downloaded.connect(self.download_finished_streams)
+        self.engine_bridge.completed.connect(self.download_completed)
+        self.engine_bridge.failed.connect(self.download_failed)
+        self.engine_bridge.cancelled.connect(self.finish_job)
+        self.engine_bridge.queue_done.connect(self.queue_finished)
+        self.engine = DownloadEngine(
+            self.base_download_dir,
+            self.cookies,
+            self.max_concurrent_downloads,
+            self.engine_bridge,
+            self.progress_board,
+            JobJournal(),
+            DownloadArchive(),
+            postprocess_workers=DEFAULT_POSTPROCESS_WORKERS,
+            partial_policy=DEFAULT_PARTIAL_FILE_POLICY
+        )
         self.current_thumbnail = None
-        self.thumbnail_loaders = []
+        self.thumbnail_fetcher = ThumbnailFetcher(parent=self)
+        self.thumbnail_fetcher.loaded.connect(self.update_single_thumbnail)
+        self.thumbnail_fetcher.loaded.connect(self.update_queue_thumbnail)
+        self.thumbnail_fetcher.loaded.connect(self.update_progress_thumbnail)
+        self.thumbnail_fetcher.failed.connect(self.thumbnail_failed)
         self.playlist_processor = None
+        self.playlist_enumerator = None
+        self.video_info_fetcher = None
+        self.batch_downloader = None
+        self.video_entries = []
         
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -473,11 +842,11 @@ class YouTubeDownloader(QMainWindow):
         self.tab_widget.setFont(QFont("Segoe UI", 10))
         
         self.single_tab = self.create_single_tab()
-        self.batch_tab = self.create_batch_tab()
-        self.playlist_tab = self.create_playlist_tab()
+        self.batch_tab = self.create_lazy_tab(BATCH_TAB, self.create_batch_tab)
+        self.playlist_tab = self.create_lazy_tab(PLAYLIST_TAB, self.create_playlist_tab)
         self.queue_tab = self.create_queue_tab()
-        self.progress_tab = self.create_progress_tab()
-        self.settings_tab = self.create_settings_tab()
+        self.progress_tab = self.create_lazy_tab(PROGRESS_TAB, self.create_progress_tab)
+        self.settings_tab = self.create_lazy_tab(SETTINGS_TAB, self.create_settings_tab)
         
         self.tab_widget.addTab(self.single_tab, "Single Video")
         self.tab_widget.addTab(self.batch_tab, "Batch Download")
@@ -485,6 +854,7 @@ class YouTubeDownloader(QMainWindow):
         self.tab_widget.addTab(self.queue_tab, "Download Queue")
         self.tab_widget.addTab(self.progress_tab, "Progress")
         self.tab_widget.addTab(self.settings_tab, "Settings")
+        self.tab_widget.currentChanged.connect(self.ensure_tab)
         
         main_layout.addWidget(self.tab_widget)
         
@@ -492,8 +862,78 @@ class YouTubeDownloader(QMainWindow):
         
         self.statusBar().showMessage("Ready")
         
+        self.restore_queue()
         self.update_stats()
         
+    def create_lazy_tab(self, index, builder):
+        placeholder = QWidget()
+        placeholder_layout = QVBoxLayout(placeholder)
+        placeholder_layout.setContentsMargins(0, 0, 0, 0)
+        self.lazy_tabs[index] = (placeholder, builder)
+        return placeholder
+
+    @profiled
+    def ensure_tab(self, index):
+        lazy = self.lazy_tabs.pop(index, None)
+        if lazy is None:
+            return False
+        placeholder, builder = lazy
+        placeholder.layout().addWidget(builder())
+        return True
+
+    def tab_built(self, index):
+        return index not in self.lazy_tabs
+
+    def log(self, message, level=logging.INFO, **fields):
+        # Only a queue put here; the JSONL file and the views are fed elsewhere
+        LOGGER.log(level, message, extra={'fields': fields} if fields else None)
+
+    @profiled
+    def flush_log_views(self):
+        lines = self.log_buffer.drain()
+        if not lines:
+            return
+        text = "\n".join(lines)
+        for tab, attr in ((PROGRESS_TAB, 'log_text'), (SETTINGS_TAB, 'log_text_settings')):
+            if self.tab_built(tab):
+                getattr(self, attr).appendPlainText(text)
+
+    def create_log_view(self):
+        view = QPlainTextEdit()
+        view.setReadOnly(True)
+        view.setMaximumBlockCount(LOG_VIEW_MAX_LINES)
+        view.setStyleSheet("background-color: #252526;")
+        view.setPlainText("\n".join(self.log_buffer.history()))
+        return view
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_paint_done:
+            self.first_paint_done = True
+            STARTUP_MARKS['first_paint'] = time.perf_counter() - STARTUP_T0
+            QTimer.singleShot(0, self.report_startup_timings)
+
+    def report_startup_timings(self):
+        timings = {name: round(seconds * 1000, 1) for name, seconds in STARTUP_MARKS.items()}
+        self.log("Startup: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in timings.items()))
+        try:
+            os.makedirs(APP_DATA_DIR, exist_ok=True)
+            with open(STARTUP_TIMINGS_PATH, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'time': time.time(), 'timings_ms': timings}) + "\n")
+        except OSError:
+            pass
+
+    def restore_queue(self):
+        try:
+            restored = self.engine.restore()
+        except Exception as e:
+            self.log(f"Could not read the queue journal: {e}", logging.ERROR)
+            return
+        if restored:
+            self.queue_model.add_items(restored)
+            self.log(f"Restored {len(restored)} unfinished downloads from the previous session")
+            self.statusBar().showMessage(f"Restored {len(restored)} unfinished downloads")
+
     def create_single_tab(self):
         tab = QWidget()
         layout = QGridLayout(tab)
@@ -521,8 +961,20 @@ class YouTubeDownloader(QMainWindow):
         self.get_info_btn.clicked.connect(self.get_video_info)
         layout.addWidget(self.get_info_btn, 2, 2)
         
+        audio_layout = QHBoxLayout()
         self.audio_only_checkbox = QCheckBox("Audio only (best quality)")
-        layout.addWidget(self.audio_only_checkbox, 3, 0)
+        audio_layout.addWidget(self.audio_only_checkbox)
+        self.audio_mode_combo = QComboBox()
+        self.audio_mode_combo.addItem("Original (no re-encode)", 'original')
+        self.audio_mode_combo.addItem("MP3 (re-encode)", 'mp3')
+        self.audio_mode_combo.setEnabled(False)
+        audio_layout.addWidget(self.audio_mode_combo)
+        self.embed_metadata_checkbox = QCheckBox("Tags + cover")
+        self.embed_metadata_checkbox.setEnabled(False)
+        audio_layout.addWidget(self.embed_metadata_checkbox)
+        self.audio_only_checkbox.toggled.connect(self.audio_mode_combo.setEnabled)
+        self.audio_only_checkbox.toggled.connect(self.embed_metadata_checkbox.setEnabled)
+        layout.addLayout(audio_layout, 3, 0)
         
         self.add_single_btn = QPushButton("Add to Queue")
         self.add_single_btn.clicked.connect(self.add_single_download)
@@ -654,21 +1106,28 @@ class YouTubeDownloader(QMainWindow):
         
         layout.addLayout(controls_layout)
         
-        self.queue_list = QListWidget()
-        self.queue_list.setIconSize(QSize(120, 90))
-        self.queue_list.setSelectionMode(QListWidget.ExtendedSelection)
-        self.queue_list.setDragDropMode(QAbstractItemView.InternalMove)
-        self.queue_list.setStyleSheet("""
-            QListWidget::item {
+        self.queue_model = QueueModel(self)
+        self.queue_model.thumbnail_needed.connect(self.thumbnail_fetcher.request)
+        self.queue_model.order_changed.connect(lambda: self.engine.reorder(self.queue_model.job_ids()))
+        self.queue_view = QListView()
+        self.queue_view.setModel(self.queue_model)
+        self.queue_view.setIconSize(QSize(120, 90))
+        self.queue_view.setUniformItemSizes(True)
+        self.queue_view.setLayoutMode(QListView.Batched)
+        self.queue_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.queue_view.setDragDropMode(QAbstractItemView.InternalMove)
+        self.queue_view.setDefaultDropAction(Qt.MoveAction)
+        self.queue_view.setStyleSheet("""
+            QListView::item {
                 padding: 10px;
                 border-bottom: 1px solid #3E3E42;
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background-color: #007ACC;
             }
         """)
-        self.queue_list.itemSelectionChanged.connect(self.update_remove_button_state)
-        layout.addWidget(self.queue_list)
+        self.queue_view.selectionModel().selectionChanged.connect(self.update_remove_button_state)
+        layout.addWidget(self.queue_view)
         
         self.queue_size_label = QLabel("Total queue size: 0 MB")
         self.queue_size_label.setStyleSheet("font-weight: bold; padding: 5px;")
@@ -682,72 +1141,35 @@ class YouTubeDownloader(QMainWindow):
         layout.setContentsMargins(15, 15, 15, 15)
         layout.setSpacing(15)
         
-        current_group = QGroupBox("Current Download")
-        current_layout = QVBoxLayout(current_group)
-        
-        thumb_layout = QHBoxLayout()
-        self.progress_thumbnail_label = QLabel()
-        self.progress_thumbnail_label.setFixedSize(240, 180)
-        self.progress_thumbnail_label.setStyleSheet("background-color: #252526; border: 1px solid #3E3E42;")
-        thumb_layout.addWidget(self.progress_thumbnail_label)
-        
-        info_layout = QVBoxLayout()
-        self.current_title_label = QLabel("No active download")
-        self.current_title_label.setWordWrap(True)
-        self.current_title_label.setStyleSheet("font-weight: bold; font-size: 14px;")
-        
-        self.current_url_label = QLabel("URL will appear here")
-        self.current_url_label.setWordWrap(True)
-        self.current_url_label.setStyleSheet("color: #AAAAAA; font-size: 12px;")
-        self.current_url_label.setOpenExternalLinks(True)
-        
-        info_layout.addWidget(self.current_title_label)
-        info_layout.addWidget(self.current_url_label)
-        info_layout.addStretch()
-        
-        thumb_layout.addLayout(info_layout, 1)
-        current_layout.addLayout(thumb_layout)
-        
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setRange(0, 100)
-        self.progress_bar.setTextVisible(True)
-        self.progress_bar.setFormat("Preparing...")
-        current_layout.addWidget(self.progress_bar)
-        
-        details_layout = QGridLayout()
-        
-        details_layout.addWidget(QLabel("Status:"), 0, 0)
-        self.status_label = QLabel("Idle")
-        details_layout.addWidget(self.status_label, 0, 1)
-        
-        details_layout.addWidget(QLabel("Speed:"), 1, 0)
-        self.speed_label = QLabel("0 MB/s")
-        details_layout.addWidget(self.speed_label, 1, 1)
-        
-        details_layout.addWidget(QLabel("Downloaded:"), 2, 0)
-        self.downloaded_label = QLabel("0 MB")
-        details_layout.addWidget(self.downloaded_label, 2, 1)
-        
-        details_layout.addWidget(QLabel("ETA:"), 0, 2)
-        self.eta_label = QLabel("Calculating...")
-        details_layout.addWidget(self.eta_label, 0, 3)
-        
-        details_layout.addWidget(QLabel("Total Size:"), 1, 2)
-        self.total_size_label = QLabel("0 MB")
-        details_layout.addWidget(self.total_size_label, 1, 3)
-        
-        details_layout.addWidget(QLabel("Progress:"), 2, 2)
-        self.percent_label = QLabel("0%")
-        details_layout.addWidget(self.percent_label, 2, 3)
-        
-        current_layout.addLayout(details_layout)
-        layout.addWidget(current_group)
+        active_group = QGroupBox("Active Downloads")
+        active_layout = QVBoxLayout(active_group)
+
+        summary_layout = QHBoxLayout()
+        self.active_summary_label = QLabel("No active downloads")
+        self.active_summary_label.setStyleSheet("font-weight: bold; font-size: 14px;")
+        summary_layout.addWidget(self.active_summary_label, 1)
+        self.cancel_all_btn = QPushButton("Cancel All")
+        self.cancel_all_btn.setStyleSheet("background-color: #A1260D;")
+        self.cancel_all_btn.clicked.connect(self.cancel_all_downloads)
+        summary_layout.addWidget(self.cancel_all_btn)
+        active_layout.addLayout(summary_layout)
+
+        self.jobs_scroll = QScrollArea()
+        self.jobs_scroll.setWidgetResizable(True)
+        self.jobs_scroll.setFrameShape(QFrame.NoFrame)
+        jobs_container = QWidget()
+        self.jobs_layout = QVBoxLayout(jobs_container)
+        self.jobs_layout.setContentsMargins(0, 0, 0, 0)
+        self.jobs_layout.setSpacing(8)
+        self.jobs_layout.addStretch()
+        self.jobs_scroll.setWidget(jobs_container)
+        active_layout.addWidget(self.jobs_scroll)
+
+        layout.addWidget(active_group, 2)
         
         log_group = QGroupBox("Download Log")
         log_layout = QVBoxLayout(log_group)
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
-        self.log_text.setStyleSheet("background-color: #252526;")
+        self.log_text = self.create_log_view()
         log_layout.addWidget(self.log_text)
         layout.addWidget(log_group, 1)
         
@@ -769,47 +1191,220 @@ class YouTubeDownloader(QMainWindow):
         dir_layout.addWidget(self.change_dir_btn)
         layout.addLayout(dir_layout)
 
+        concurrency_layout = QHBoxLayout()
+        concurrency_layout.addWidget(QLabel("Concurrent Downloads:"))
+        self.concurrency_spin = QSpinBox()
+        self.concurrency_spin.setRange(1, MAX_CONCURRENT_DOWNLOADS_LIMIT)
+        self.concurrency_spin.setValue(self.max_concurrent_downloads)
+        self.concurrency_spin.valueChanged.connect(self.change_max_concurrent_downloads)
+        concurrency_layout.addWidget(self.concurrency_spin)
+        concurrency_layout.addWidget(QLabel("Metadata Workers:"))
+        self.extraction_workers_spin = QSpinBox()
+        self.extraction_workers_spin.setRange(1, MAX_EXTRACTION_WORKERS_LIMIT)
+        self.extraction_workers_spin.setValue(self.extraction_workers)
+        self.extraction_workers_spin.valueChanged.connect(self.change_extraction_workers)
+        concurrency_layout.addWidget(self.extraction_workers_spin)
+        concurrency_layout.addWidget(QLabel("Post-processing Workers:"))
+        self.postprocess_workers_spin = QSpinBox()
+        self.postprocess_workers_spin.setRange(1, max(1, os.cpu_count() or 1))
+        self.postprocess_workers_spin.setValue(self.engine.postprocess_workers)
+        self.postprocess_workers_spin.valueChanged.connect(self.engine.set_postprocess_workers)
+        concurrency_layout.addWidget(self.postprocess_workers_spin)
+        concurrency_layout.addWidget(QLabel("Progress Interval (ms):"))
+        self.progress_interval_spin = QSpinBox()
+        self.progress_interval_spin.setRange(50, 5000)
+        self.progress_interval_spin.setSingleStep(50)
+        self.progress_interval_spin.setValue(DEFAULT_PROGRESS_INTERVAL_MS)
+        self.progress_interval_spin.valueChanged.connect(self.change_progress_interval)
+        concurrency_layout.addWidget(self.progress_interval_spin)
+        concurrency_layout.addStretch()
+        layout.addLayout(concurrency_layout)
+
+        cache_layout = QHBoxLayout()
+        cache_layout.addWidget(QLabel("Metadata Cache TTL (hours):"))
+        self.metadata_ttl_spin = QSpinBox()
+        self.metadata_ttl_spin.setRange(1, 24 * 365)
+        self.metadata_ttl_spin.setValue(DEFAULT_METADATA_TTL_HOURS)
+        self.metadata_ttl_spin.valueChanged.connect(self.change_cache_ttls)
+        cache_layout.addWidget(self.metadata_ttl_spin)
+        cache_layout.addWidget(QLabel("Stream URL TTL (hours):"))
+        self.stream_ttl_spin = QSpinBox()
+        self.stream_ttl_spin.setRange(0, 24)
+        self.stream_ttl_spin.setValue(DEFAULT_STREAM_URL_TTL_HOURS)
+        self.stream_ttl_spin.valueChanged.connect(self.change_cache_ttls)
+        cache_layout.addWidget(self.stream_ttl_spin)
+        self.cache_stats_label = QLabel(METADATA_CACHE.stats_text())
+        self.cache_stats_label.setStyleSheet("color: #AAAAAA;")
+        cache_layout.addWidget(self.cache_stats_label)
+        cache_layout.addStretch()
+        layout.addLayout(cache_layout)
+
+        thumb_cache_layout = QHBoxLayout()
+        thumb_cache_layout.addWidget(QLabel("Thumbnail Memory Cache (MB):"))
+        self.thumbnail_memory_spin = QSpinBox()
+        self.thumbnail_memory_spin.setRange(1, 1024)
+        self.thumbnail_memory_spin.setValue(DEFAULT_THUMBNAIL_MEMORY_MB)
+        self.thumbnail_memory_spin.valueChanged.connect(self.change_thumbnail_cache_limits)
+        thumb_cache_layout.addWidget(self.thumbnail_memory_spin)
+        thumb_cache_layout.addWidget(QLabel("Thumbnail Disk Cache (MB):"))
+        self.thumbnail_disk_spin = QSpinBox()
+        self.thumbnail_disk_spin.setRange(0, 10240)
+        self.thumbnail_disk_spin.setValue(DEFAULT_THUMBNAIL_DISK_MB)
+        self.thumbnail_disk_spin.valueChanged.connect(self.change_thumbnail_cache_limits)
+        thumb_cache_layout.addWidget(self.thumbnail_disk_spin)
+        thumb_cache_layout.addStretch()
+        layout.addLayout(thumb_cache_layout)
+
+        bandwidth_layout = QHBoxLayout()
+        bandwidth_layout.addWidget(QLabel("Total Limit (KB/s, 0 = off):"))
+        self.global_rate_spin = QSpinBox()
+        self.global_rate_spin.setRange(0, 1024 * 1024)
+        self.global_rate_spin.setSingleStep(256)
+        self.global_rate_spin.setValue(BANDWIDTH.global_rate // 1024)
+        self.global_rate_spin.valueChanged.connect(self.change_bandwidth_limits)
+        bandwidth_layout.addWidget(self.global_rate_spin)
+        bandwidth_layout.addWidget(QLabel("Per Download (KB/s):"))
+        self.job_rate_spin = QSpinBox()
+        self.job_rate_spin.setRange(0, 1024 * 1024)
+        self.job_rate_spin.setSingleStep(256)
+        self.job_rate_spin.setValue(BANDWIDTH.default_job_rate // 1024)
+        self.job_rate_spin.valueChanged.connect(self.change_bandwidth_limits)
+        bandwidth_layout.addWidget(self.job_rate_spin)
+        bandwidth_layout.addWidget(QLabel("Schedule:"))
+        self.schedule_input = QLineEdit()
+        self.schedule_input.setPlaceholderText("e.g. 09:00-18:00=1M, 18:00-23:00=5M")
+        self.schedule_input.editingFinished.connect(self.change_bandwidth_schedule)
+        bandwidth_layout.addWidget(self.schedule_input)
+        bandwidth_layout.addWidget(QLabel("Fragment Threads:"))
+        self.min_fragments_spin = QSpinBox()
+        self.min_fragments_spin.setRange(1, MAX_FRAGMENT_THREADS_LIMIT)
+        self.min_fragments_spin.setValue(DEFAULT_MIN_FRAGMENT_THREADS)
+        self.min_fragments_spin.valueChanged.connect(self.change_fragment_bounds)
+        bandwidth_layout.addWidget(self.min_fragments_spin)
+        bandwidth_layout.addWidget(QLabel("to"))
+        self.max_fragments_spin = QSpinBox()
+        self.max_fragments_spin.setRange(1, MAX_FRAGMENT_THREADS_LIMIT)
+        self.max_fragments_spin.setValue(DEFAULT_MAX_FRAGMENT_THREADS)
+        self.max_fragments_spin.valueChanged.connect(self.change_fragment_bounds)
+        bandwidth_layout.addWidget(self.max_fragments_spin)
+        self.bandwidth_label = QLabel(BANDWIDTH.describe())
+        self.bandwidth_label.setStyleSheet("color: #AAAAAA;")
+        bandwidth_layout.addWidget(self.bandwidth_label)
+        layout.addLayout(bandwidth_layout)
+
         log_layout = QVBoxLayout()
         log_layout.addWidget(QLabel("Log:"))
-        self.log_text_settings = QTextEdit()
-        self.log_text_settings.setReadOnly(True)
-        self.log_text_settings.setStyleSheet("background-color: #252526;")
+        self.log_text_settings = self.create_log_view()
         log_layout.addWidget(self.log_text_settings)
         self.open_log_btn = QPushButton("Open Log File")
         self.open_log_btn.clicked.connect(self.open_log_file)
         log_layout.addWidget(self.open_log_btn)
         layout.addLayout(log_layout)
 
+        partial_layout = QHBoxLayout()
+        partial_layout.addWidget(QLabel("Partial files of cancelled downloads:"))
+        self.partial_policy_combo = QComboBox()
+        self.partial_policy_combo.addItem("Keep (a re-added download resumes)", 'keep')
+        self.partial_policy_combo.addItem("Delete", 'delete')
+        self.partial_policy_combo.setCurrentIndex(PARTIAL_FILE_POLICIES.index(self.engine.partial_policy))
+        self.partial_policy_combo.currentIndexChanged.connect(self.change_partial_policy)
+        partial_layout.addWidget(self.partial_policy_combo)
+        partial_layout.addStretch()
+        layout.addLayout(partial_layout)
+
+        self.profile_checkbox = QCheckBox(
+            f"Profile this session: cProfile, memory, GUI stalls (also set {PROFILE_ENV_VAR}=1)")
+        self.profile_checkbox.setToolTip("Unchecking or closing the app writes the profile under the app data folder")
+        self.profile_checkbox.setChecked(PROFILER.enabled)
+        self.profile_checkbox.toggled.connect(self.toggle_profiling)
+        layout.addWidget(self.profile_checkbox)
+
         return tab
     
     def change_download_dir(self):
         new_dir = QFileDialog.getExistingDirectory(self, "Select Base Download Directory", self.base_download_dir)
         if new_dir:
             self.base_download_dir = new_dir
+            self.engine.base_download_dir = new_dir
             self.download_dir = self.get_download_dir()
+            self.log_pipeline.set_directory(self.download_dir)
             self.dir_input.setText(self.base_download_dir)
 
+    def change_partial_policy(self, index):
+        self.engine.partial_policy = self.partial_policy_combo.itemData(index)
+
+    def change_max_concurrent_downloads(self, value):
+        self.max_concurrent_downloads = value
+        self.engine.set_max_concurrent(value)
+
+    def change_extraction_workers(self, value):
+        self.extraction_workers = value
+
+    def change_progress_interval(self, value):
+        self.progress_board.interval = value / 1000
+        self.progress_timer.setInterval(value)
+
+    def change_cache_ttls(self):
+        METADATA_CACHE.set_ttls(self.metadata_ttl_spin.value(), self.stream_ttl_spin.value())
+
+    def change_thumbnail_cache_limits(self):
+        THUMBNAIL_CACHE.set_limits(self.thumbnail_memory_spin.value(), self.thumbnail_disk_spin.value())
+
+    def change_bandwidth_limits(self):
+        BANDWIDTH.set_global_rate(self.global_rate_spin.value() * 1024)
+        BANDWIDTH.set_default_job_rate(self.job_rate_spin.value() * 1024)
+        self.bandwidth_label.setText(BANDWIDTH.describe())
+
+    def change_fragment_bounds(self):
+        self.max_fragments_spin.setMinimum(self.min_fragments_spin.value())
+        FRAGMENT_TUNER.set_bounds(self.min_fragments_spin.value(), self.max_fragments_spin.value())
+
+    def change_bandwidth_schedule(self):
+        try:
+            BANDWIDTH.set_schedule(parse_schedule(self.schedule_input.text()))
+        except ValueError as e:
+            self.schedule_input.setStyleSheet("border: 1px solid #F44336;")
+            self.log(f"Schedule not applied: {e}")
+            return
+        self.schedule_input.setStyleSheet("")
+        self.bandwidth_label.setText(BANDWIDTH.describe())
+
+    def update_cache_stats(self):
+        stats = METADATA_CACHE.stats_text()
+        if self.tab_built(SETTINGS_TAB):
+            self.cache_stats_label.setText(stats)
+        self.log(stats)
+
     def open_log_file(self):
-        log_file = os.path.join(self.download_dir, "download.log")
+        log_file = self.log_pipeline.path
         if os.path.exists(log_file):
             os.startfile(log_file)
         else:
             QMessageBox.warning(self, "Log File Not Found", "Log file does not exist yet.")
 
     def get_download_dir(self):
-        today = datetime.now().strftime('%Y-%m-%d')
-        download_dir = os.path.join(self.base_download_dir, today)
-        os.makedirs(download_dir, exist_ok=True)
-        return download_dir
+        return dated_download_dir(self.base_download_dir)
     
     def get_video_info(self):
+        if self.video_info_fetcher is not None:
+            self.video_info_fetcher.cancel()
+            self.get_info_btn.setEnabled(False)
+            self.get_info_btn.setText("Cancelling...")
+            self.size_info_label.setText("Size information will appear here")
+            self.single_thumbnail_label.setText("Thumbnail will appear here")
+            return
+
         url = self.single_url_input.text().strip()
         if not url:
             QMessageBox.warning(self, "Input Error", "Please enter a YouTube URL")
             return
 
-        self.get_info_btn.setEnabled(False)
-        self.get_info_btn.setText("Fetching...")
+        seen = self.engine.seen(video_id_from_url(url))
+        if seen:
+            QMessageBox.information(self, "Already Added", f"This video is already {seen}.")
+            return
+
+        self.get_info_btn.setText("Cancel")
         self.size_info_label.setText("Calculating sizes...")
 
         self.single_thumbnail_label.clear()
@@ -818,8 +1413,14 @@ class YouTubeDownloader(QMainWindow):
         self.video_info_fetcher = VideoInfoFetcher(url, self.cookies)
         self.video_info_fetcher.info_fetched.connect(self.on_video_info_fetched)
         self.video_info_fetcher.error.connect(self.on_video_info_error)
+        self.video_info_fetcher.finished.connect(self.video_info_fetch_finished)
         self.video_info_fetcher.start()
 
+    def video_info_fetch_finished(self):
+        self.video_info_fetcher = None
+        self.get_info_btn.setEnabled(True)
+        self.get_info_btn.setText("Get Video Info")
+
     def on_video_info_fetched(self, info):
         formats = info.get('formats', [])
         original_language = info.get('language')
@@ -836,37 +1437,21 @@ class YouTubeDownloader(QMainWindow):
         self.video_info_label.setText(info_text)
 
         self.quality_combo.clear()
-        video_options = {}
-        for f in formats:
-            vcodec = f.get('vcodec', '')
-            if vcodec.startswith('avc1') or vcodec.startswith('vp09'):
-                height = f.get('height')
-                if not height:
-                    continue
-                key = f"{height}p"
-
-                filesize = f.get('filesize') or f.get('filesize_approx')
-                size_text = format_size(filesize) if filesize else "Unknown size"
-
-                label = f"{key} - {size_text}"
-
-                if key not in video_options:
-                    video_options[key] = {'format': f, 'label': label, 'size': size_text}
-
-        sorted_options = sorted(video_options.items(), key=lambda x: int(x[0][:-1]), reverse=True)
-        for res, data in sorted_options:
-            self.quality_combo.addItem(data['label'], data['format'])
-
+        best_audio, _, resolutions = select_formats(formats, original_language)
         size_info = ""
-        for res, data in sorted_options:
-            size_info += f"{res}: {data['size']}\n"
+        for height, f in resolutions:
+            filesize = estimate_format_size(f, duration)
+            size_text = format_size(filesize) if filesize else "Unknown size"
+            self.quality_combo.addItem(f"{height}p - {size_text}", f)
+            size_info += f"{height}p: {size_text}\n"
         self.size_info_label.setText(f"<b>Available resolutions(if unknown then dont worry ):</b>\n{size_info}")
 
         self.quality_combo.setEnabled(True)
         self.add_single_btn.setEnabled(True)
         self.video_info = {
-            'formats': formats,
-            'original_language': original_language,
+            'best_audio': best_audio,
+            'duration': duration,
+            'uploader': uploader,
             'title': title,
             'thumbnail': thumbnail_url,
             'url': self.single_url_input.text().strip(),
@@ -874,13 +1459,12 @@ class YouTubeDownloader(QMainWindow):
         }
 
         if thumbnail_url:
-            loader = ThumbnailLoader(thumbnail_url, video_id)
-            loader.loaded.connect(self.update_single_thumbnail)
-            self.thumbnail_loaders.append(loader)
-            loader.start()
+            self.thumbnail_fetcher.request(thumbnail_url, video_id)
 
         self.get_info_btn.setEnabled(True)
         self.get_info_btn.setText("Get Video Info")
+        if self.tab_built(SETTINGS_TAB):
+            self.cache_stats_label.setText(METADATA_CACHE.stats_text())
 
     def on_video_info_error(self, error):
         QMessageBox.critical(self, "Error", f"Failed to get video info: {error}")
@@ -889,14 +1473,15 @@ class YouTubeDownloader(QMainWindow):
         self.get_info_btn.setEnabled(True)
         self.get_info_btn.setText("Get Video Info")
 
-    def update_single_thumbnail(self, video_id, pixmap):
+    @profiled
+    def update_single_thumbnail(self, video_id, image):
         if hasattr(self, 'video_info') and self.video_info.get('video_id') == video_id:
-            scaled_pix = pixmap.scaled(320, 180, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            scaled_pix = QPixmap.fromImage(image).scaled(320, 180, Qt.KeepAspectRatio, Qt.SmoothTransformation)
             self.single_thumbnail_label.setPixmap(scaled_pix)
 
     def add_single_download(self):
         if self.audio_only_checkbox.isChecked():
-            best_audio = self.select_best_audio(self.video_info['formats'], self.video_info['original_language'])
+            best_audio = self.video_info['best_audio']
             if not best_audio:
                 QMessageBox.warning(self, "Audio Error", "No suitable audio track found")
                 return
@@ -904,7 +1489,11 @@ class YouTubeDownloader(QMainWindow):
                 'url': self.video_info['url'],
                 'audio_only': True,
                 'audio_format': best_audio,
+                'audio_mode': self.audio_mode_combo.currentData(),
+                'embed_metadata': self.embed_metadata_checkbox.isChecked(),
+                'estimated_size': estimate_item_size(None, best_audio, self.video_info['duration']),
                 'title': self.video_info['title'],
+                'uploader': self.video_info['uploader'],
                 'thumbnail': self.video_info['thumbnail'],
                 'video_id': self.video_info['video_id']
             }
@@ -913,20 +1502,21 @@ class YouTubeDownloader(QMainWindow):
                 QMessageBox.warning(self, "Selection Error", "Please select a video quality")
                 return
             selected_format = self.quality_combo.currentData()
-            best_audio = self.select_best_audio(self.video_info['formats'], self.video_info['original_language'])
+            best_audio = self.video_info['best_audio']
             if not best_audio:
                 QMessageBox.warning(self, "Audio Error", "No suitable audio track found")
                 return
             download_item = {
                 'url': self.video_info['url'],
                 'video_res': selected_format['height'],
-                'video_codec': 'avc1' if 'avc1' in selected_format['vcodec'] else 'vp9',
+                'video_codec': video_codec_key(selected_format),
                 'audio_abr': best_audio['abr'],
+                'estimated_size': estimate_item_size(selected_format, best_audio, self.video_info['duration']),
                 'title': self.video_info['title'],
                 'thumbnail': self.video_info['thumbnail'],
                 'video_id': self.video_info['video_id']
             }
-        self.add_to_queue_list(download_item)
+        self.add_to_queue_list([download_item])
         self.update_stats()
         self.statusBar().showMessage(f"Added '{download_item['title'][:30]}...' to queue")
 
@@ -940,81 +1530,124 @@ class YouTubeDownloader(QMainWindow):
         self.single_thumbnail_label.setText("Thumbnail will appear here")
 
     def add_batch_download(self):
+        if self.batch_downloader is not None:
+            self.batch_downloader.cancel()
+            self.add_batch_btn.setEnabled(False)
+            self.add_batch_btn.setText("Cancelling...")
+            return
+
         urls_input = self.batch_urls_input.text().strip()
         if not urls_input:
             QMessageBox.warning(self, "Input Error", "Please enter YouTube URLs")
             return
 
         urls = [url.strip() for url in re.split(r'[,;\s]+', urls_input) if url.strip()]
+        urls, skipped = self.engine.filter_new(urls, video_id_from_url)
+        self.batch_skipped = skipped
+        if skipped:
+            self.log(f"Batch: skipped {skip_summary(skipped)}")
+        if not urls:
+            self.batch_status_label.setText(f"Nothing new to add ({skip_summary(skipped)})")
+            self.batch_status_label.setStyleSheet("color: #7FFF00;")
+            return
         self.batch_status_label.setText(f"Processing {len(urls)} URLs...")
         self.batch_status_label.setStyleSheet("color: #FFD700;")
         QApplication.processEvents()
 
-        self.batch_downloader = BatchDownloader(urls, self.cookies)
+        self.batch_downloader = BatchDownloader(urls, self.cookies, self.extraction_workers)
         self.batch_downloader.progress.connect(self.update_batch_progress)
         self.batch_downloader.completed.connect(self.on_batch_completed)
         self.batch_downloader.error.connect(self.on_batch_error)
+        self.batch_downloader.finished.connect(self.batch_finished)
         self.batch_downloader.start()
+        self.add_batch_btn.setText("Cancel")
+
+    def batch_finished(self):
+        if self.batch_downloader.cancelled:
+            self.batch_status_label.setText("Cancelled")
+            self.batch_status_label.setStyleSheet("color: #FF6347;")
+        self.batch_downloader = None
+        self.add_batch_btn.setEnabled(True)
+        self.add_batch_btn.setText("Add to Queue")
 
     def update_batch_progress(self, current, total, status):
         self.batch_status_label.setText(status)
 
+    @profiled
     def on_batch_completed(self, download_items):
-        for item in download_items:
-            self.add_to_queue_list(item)
+        download_items = self.add_to_queue_list(download_items)
         self.update_stats()
-        self.batch_status_label.setText(f"Added {len(download_items)} videos to queue")
+        skipped_text = f" (skipped {skip_summary(self.batch_skipped)})" if self.batch_skipped else ""
+        self.batch_status_label.setText(f"Added {len(download_items)} videos to queue{skipped_text}")
         self.batch_status_label.setStyleSheet("color: #7FFF00;")
         self.batch_urls_input.clear()
+        self.update_cache_stats()
 
     def on_batch_error(self, error):
         self.batch_status_label.setText(f"Error: {error}")
         self.batch_status_label.setStyleSheet("color: #FF6347;")
 
     def get_playlist_info(self):
+        if self.playlist_enumerator is not None:
+            self.playlist_enumerator.cancel()
+            self.get_playlist_btn.setEnabled(False)
+            self.get_playlist_btn.setText("Stopping...")
+            return
+
         url = self.playlist_url_input.text().strip()
         if not url:
             QMessageBox.warning(self, "Input Error", "Please enter a playlist URL")
             return
 
-        self.get_playlist_btn.setEnabled(False)
-        self.get_playlist_btn.setText("Fetching...")
+        self.video_entries = []
+        self.playlist_count_label.setText("0")
+        self.get_playlist_btn.setText("Stop Listing")
+        self.playlist_url_input.setEnabled(False)
+        self.add_playlist_btn.setEnabled(False)
         self.playlist_info_label.setText("Fetching playlist info...")
-        QApplication.processEvents()
 
-        try:
-            cookies = self.cookies if os.path.exists(self.cookies) else None
-            ydl_opts = {
-                'quiet': True, 
-                'cookiefile': cookies, 
-                'extract_flat': True,
-                'no_warnings': True,
-                'ignoreerrors': True
-            }
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                playlist_info = ydl.extract_info(url, download=False)
-                if not playlist_info or 'entries' not in playlist_info:
-                    QMessageBox.warning(self, "Playlist Error", "Invalid playlist or no videos found")
-                    return
-
-                self.video_entries = playlist_info['entries']
-                self.playlist_count_label.setText(str(len(self.video_entries)))
-
-                title = playlist_info.get('title', 'Untitled Playlist')
-                uploader = playlist_info.get('uploader', 'Unknown')
-                info_text = f"<b>{title}</b><br>By: {uploader}<br>Videos: {len(self.video_entries)}"
-                self.playlist_info_label.setText(info_text)
-
-                self.add_playlist_btn.setEnabled(True)
-
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to get playlist info: {str(e)}")
-        finally:
-            self.get_playlist_btn.setEnabled(True)
-            self.get_playlist_btn.setText("Get Playlist Info")
+        self.playlist_enumerator = PlaylistEnumerator(url, self.cookies)
+        self.playlist_enumerator.batch.connect(self.playlist_batch_listed)
+        self.playlist_enumerator.error.connect(self.playlist_listing_error)
+        self.playlist_enumerator.finished_listing.connect(self.playlist_listing_finished)
+        self.playlist_enumerator.start()
+
+    @profiled
+    def playlist_batch_listed(self, playlist_info, entries):
+        self.video_entries.extend(entries)
+        self.show_playlist_info(playlist_info, listing=True)
+        if self.playlist_processor is None:
+            self.add_playlist_btn.setEnabled(True)
+
+    def show_playlist_info(self, playlist_info, listing=False):
+        self.playlist_info = playlist_info
+        count = len(self.video_entries)
+        self.playlist_count_label.setText(f"{count} (listing...)" if listing else str(count))
+        title = playlist_info.get('title', 'Untitled Playlist')
+        uploader = playlist_info.get('uploader', 'Unknown')
+        videos = f"{count} so far" if listing else str(count)
+        self.playlist_info_label.setText(f"<b>{title}</b><br>By: {uploader}<br>Videos: {videos}")
+
+    def playlist_listing_error(self, error):
+        QMessageBox.critical(self, "Error", f"Failed to get playlist info: {error}")
+
+    def playlist_listing_finished(self):
+        stopped = self.playlist_enumerator.cancelled or self.playlist_enumerator.failed
+        self.playlist_enumerator = None
+        self.get_playlist_btn.setEnabled(True)
+        self.get_playlist_btn.setText("Get Playlist Info")
+        if self.video_entries:
+            self.show_playlist_info(self.playlist_info)
+        else:
+            self.playlist_info_label.setText("")
+            self.playlist_count_label.setText("0")
+            if not stopped:
+                QMessageBox.warning(self, "Playlist Error", "Invalid playlist or no videos found")
+        if self.playlist_processor is None:
+            self.playlist_url_input.setEnabled(True)
 
     def add_playlist_download(self):
-        if not hasattr(self, 'video_entries') or not self.video_entries:
+        if not self.video_entries:
             QMessageBox.warning(self, "Playlist Error", "No playlist data available")
             return
 
@@ -1026,14 +1659,22 @@ class YouTubeDownloader(QMainWindow):
         if selection.lower() == 'all':
             selected_indices = range(1, len(self.video_entries)+1)
         else:
-            selected_indices = self.parse_range_selection(selection, len(self.video_entries))
+            selected_indices = parse_range_selection(selection, len(self.video_entries))
 
         if not selected_indices:
             QMessageBox.warning(self, "Selection Error", "No valid videos selected")
             return
 
-        self.playlist_url_input.setEnabled(False)
-        self.get_playlist_btn.setEnabled(False)
+        entries = list(self.video_entries)
+        selected_indices, skipped = self.engine.filter_new(selected_indices, lambda idx: entries[idx - 1].get('id'))
+        self.playlist_skipped = skipped
+        if skipped:
+            self.log(f"Playlist: skipped {skip_summary(skipped)}")
+        if not selected_indices:
+            self.playlist_status_label.setText(f"Nothing new to add ({skip_summary(skipped)})")
+            self.playlist_status_label.setStyleSheet("color: #7FFF00;")
+            return
+
         self.video_selection_input.setEnabled(False)
         self.add_playlist_btn.setEnabled(False)
 
@@ -1043,10 +1684,13 @@ class YouTubeDownloader(QMainWindow):
         self.playlist_status_label.setText(f"Processing 0 of {len(selected_indices)} videos...")
         self.playlist_status_label.setStyleSheet("color: #FFD700;")
 
+        # Entries still being listed are not part of this selection; the snapshot
+        # keeps indices stable while the enumerator keeps appending
         self.playlist_processor = PlaylistProcessor(
-            self.video_entries, 
+            entries,
             selected_indices, 
-            self.cookies
+            self.cookies,
+            self.extraction_workers
         )
         self.playlist_processor.progress.connect(self.update_playlist_progress)
         self.playlist_processor.completed.connect(self.playlist_processing_completed)
@@ -1058,311 +1702,322 @@ class YouTubeDownloader(QMainWindow):
         self.playlist_status_label.setText(status)
         QApplication.processEvents()
 
+    @profiled
     def playlist_processing_completed(self):
-        for item in self.playlist_processor.download_items:
-            self.add_to_queue_list(item)
+        added = self.add_to_queue_list(self.playlist_processor.download_items)
 
         self.update_stats()
-        self.playlist_status_label.setText(f"Added {len(self.playlist_processor.download_items)} videos to queue")
+        skipped_text = f" (skipped {skip_summary(self.playlist_skipped)})" if self.playlist_skipped else ""
+        self.playlist_status_label.setText(f"Added {len(added)} videos to queue{skipped_text}")
         self.playlist_status_label.setStyleSheet("color: #7FFF00;")
 
         self.playlist_progress_bar.setVisible(False)
-        self.playlist_url_input.setEnabled(True)
-        self.get_playlist_btn.setEnabled(True)
+        self.playlist_url_input.setEnabled(self.playlist_enumerator is None)
         self.video_selection_input.setEnabled(True)
         self.add_playlist_btn.setEnabled(True)
         self.video_selection_input.clear()
 
-        total_size = sum(
-            item.get('video_size', 0) + item.get('audio_size', 0)
-            for item in self.playlist_processor.download_items
-        )   
+        total_size = sum(item.get('estimated_size') or 0 for item in added)
         total_size_text = format_size(total_size)
         self.playlist_size_label.setText(f"<b>Total estimated size:</b> {total_size_text}")
 
-        self.statusBar().showMessage(f"Added {len(self.playlist_processor.download_items)} playlist videos to queue")
+        self.statusBar().showMessage(f"Added {len(added)} playlist videos to queue")
         self.playlist_processor = None
+        self.update_cache_stats()
 
     def playlist_processing_error(self, error):
         self.playlist_status_label.setText(error)
         self.playlist_status_label.setStyleSheet("color: #FF6347;")
-        self.playlist_url_input.setEnabled(True)
-        self.get_playlist_btn.setEnabled(True)
+        self.playlist_url_input.setEnabled(self.playlist_enumerator is None)
         self.video_selection_input.setEnabled(True)
         self.add_playlist_btn.setEnabled(True)
         self.playlist_processor = None
 
-    def parse_range_selection(self, selection, total_items):
-        selected_indices = set()
-        parts = selection.split(',')
-
-        for part in parts:
-            part = part.strip()
-            if '-' in part:
-                start, end = part.split('-')
-                try:
-                    start = int(start.strip())
-                    end = int(end.strip())
-                    if 1 <= start <= total_items and 1 <= end <= total_items:
-                        selected_indices.update(range(min(start, end), max(start, end) + 1))
-                except ValueError:
-                    pass
-            else:
-                try:
-                    index = int(part)
-                    if 1 <= index <= total_items:
-                        selected_indices.add(index)
-                except ValueError:
-                    pass
-
-        return sorted(selected_indices)
-
-    def select_best_audio(self, formats, original_language=None):
-        if original_language:
-            candidates = [
-                f for f in formats
-                if f.get('acodec', '').startswith(('mp4a.40.2', 'mp4a.40.5', 'aac'))
-                and f.get('vcodec') == 'none'
-                and f.get('language') == original_language
-            ]
-            if candidates:
-                return max(candidates, key=lambda a: a.get('abr', 0))
-
-        candidates = [
-            f for f in formats
-            if f.get('acodec', '').startswith(('mp4a.40.2', 'mp4a.40.5', 'aac'))
-            and f.get('vcodec') == 'none'
-        ]
-        return max(candidates, key=lambda a: a.get('abr', 0)) if candidates else None
-
-    def add_to_queue_list(self, download_item):
-        title = download_item['title']
-        if download_item.get('audio_only'):
-            title += " (Audio Only)"
-        item = QListWidgetItem(title)
-        item.setData(Qt.UserRole, download_item)
-
-        placeholder = QPixmap(120, 90)
-        placeholder.fill(QColor(60, 60, 60))
-        item.setIcon(QIcon(placeholder))
-
-        self.queue_list.addItem(item)
+    @profiled
+    def add_to_queue_list(self, download_items):
+        # Extraction runs in the background, so re-check what was added meanwhile
+        download_items, skipped = self.engine.filter_new(download_items, lambda item: item.get('video_id'))
+        if skipped:
+            self.log(f"Skipped {skip_summary(skipped)}")
+        for download_item in download_items:
+            download_item.setdefault('job_id', uuid.uuid4().hex)
+        self.queue_model.add_items(download_items)
+        self.engine.submit(download_items)
         self.update_remove_button_state()
+        return download_items
 
-        if download_item['thumbnail']:
-            loader = ThumbnailLoader(download_item['thumbnail'], download_item['video_id'])
-            loader.loaded.connect(self.update_queue_thumbnail)
-            self.thumbnail_loaders.append(loader)
-            loader.start()
+    @profiled
+    def update_queue_thumbnail(self, video_id, image):
+        self.queue_model.set_thumbnail(video_id, image)
 
-    def update_queue_thumbnail(self, video_id, pixmap):
-        for i in range(self.queue_list.count()):
-            item = self.queue_list.item(i)
-            data = item.data(Qt.UserRole)
-            if data and data.get('video_id') == video_id:
-                item.setIcon(QIcon(pixmap.scaled(120, 90, Qt.KeepAspectRatio, Qt.SmoothTransformation)))
+    def thumbnail_failed(self, video_id):
+        self.queue_model.thumbnail_failed(video_id)
+        if hasattr(self, 'video_info') and self.video_info.get('video_id') == video_id:
+            self.single_thumbnail_label.setText("Thumbnail unavailable")
 
     def update_stats(self):
-        queue_count = self.queue_list.count()
+        queue_count = self.queue_model.rowCount()
         self.queue_label.setText(f"Queue: {queue_count} items")
 
-        total_size = queue_count * 100 * 1024 * 1024  # 100 MB per video as placeholder
-        size_text = format_size(total_size)
+        size_text = format_size(self.queue_model.total_size)
+        if self.queue_model.unsized:
+            size_text += f" (+{self.queue_model.unsized} of unknown size)"
         self.size_label.setText(f"Estimated Size: {size_text}")
         self.queue_size_label.setText(f"Total queue size: {size_text}")
+        self.update_time_estimate()
 
         has_queue = queue_count > 0
-        self.start_btn.setEnabled(has_queue)
+        self.start_btn.setEnabled(has_queue and not self.queue_running)
         self.clear_btn.setEnabled(has_queue)
 
+    def update_time_estimate(self):
+        remaining = self.queue_model.total_size + sum(
+            max(0, total - downloaded) for downloaded, total in self.job_progress.values()
+        )
+        eta = self.throughput.eta(remaining)
+        if eta is None:
+            self.time_label.setText("Estimated Time: Unknown" if remaining else "Estimated Time: 0 min")
+        else:
+            self.time_label.setText(f"Estimated Time: {format_eta(eta)}")
+
     def update_remove_button_state(self):
-        self.remove_btn.setEnabled(bool(self.queue_list.selectedItems()))
+        self.remove_btn.setEnabled(self.queue_view.selectionModel().hasSelection())
 
     def remove_selected(self):
-        selected_items = self.queue_list.selectedItems()
-        if not selected_items:
+        selected_rows = [index.row() for index in self.queue_view.selectionModel().selectedRows()]
+        if not selected_rows:
             return
 
-        for item in selected_items:
-            self.queue_list.takeItem(self.queue_list.row(item))
-
+        self.engine.remove(self.queue_model.job_ids(selected_rows))
+        self.queue_model.remove_rows(selected_rows)
         self.update_stats()
 
     def clear_queue(self):
-        self.queue_list.clear()
+        self.engine.clear()
+        self.queue_model.clear()
         self.update_stats()
 
     def process_queue(self):
-        if self.queue_list.count() == 0:
+        if self.queue_model.rowCount() == 0:
             return
 
+        self.queue_running = True
         self.start_btn.setEnabled(False)
         self.clear_btn.setEnabled(False)
         self.remove_btn.setEnabled(False)
 
-        self.tab_widget.setCurrentIndex(4)
-
-        self.process_next_download()
-
-    def process_next_download(self):
-        if self.queue_list.count() == 0:
-            self.start_btn.setEnabled(True)
-            self.clear_btn.setEnabled(True)
-            self.progress_bar.setValue(0)
-            self.progress_bar.setFormat("All downloads completed")
-            self.current_title_label.setText("All downloads completed")
-            self.current_url_label.setText("")
-            self.status_label.setText("Completed")
-            self.log_text.append("All downloads completed successfully!")
-            self.log_text_settings.append("All downloads completed successfully!")
-            return
+        self.tab_widget.setCurrentIndex(PROGRESS_TAB)
 
-        # Check if date has changed
-        if datetime.now().date() != self.current_date:
-            self.current_date = datetime.now().date()
-            self.download_dir = self.get_download_dir()
+        self.progress_timer.start()
+        self.engine.start()
+        self.update_active_summary()
 
-        item_widget = self.queue_list.takeItem(0)
-        item = item_widget.data(Qt.UserRole)
+    @profiled
+    def download_started(self, item):
+        self.ensure_tab(PROGRESS_TAB)
+        self.queue_model.remove_job(item['job_id'])
         self.update_stats()
 
-        self.current_title_label.setText(item['title'])
-        self.current_url_label.setText(f'<a href="{item["url"]}">{item["url"]}</a>')
+        job_widget = DownloadJobWidget(item)
+        job_widget.cancel_requested.connect(self.cancel_download)
+        self.job_widgets[item['job_id']] = job_widget
+        self.jobs_layout.insertWidget(self.jobs_layout.count() - 1, job_widget)
+
+        cached_image = THUMBNAIL_CACHE.peek(item['video_id'])
+        if cached_image is not None:
+            job_widget.set_thumbnail(QPixmap.fromImage(cached_image))
+        elif item['thumbnail']:
+            self.thumbnail_fetcher.request(item['thumbnail'], item['video_id'])
+
+        self.log(f"Starting download: {item['title']}", job_id=item['job_id'], video_id=item['video_id'],
+                 event='started')
+        self.update_active_summary()
+
+    def download_finished_streams(self, job_id):
+        self.job_progress.pop(job_id, None)
+        self.speeds.pop(job_id, None)
+        job_widget = self.job_widgets.get(job_id)
+        if job_widget is not None:
+            job_widget.speed_label.setText("")
+            job_widget.eta_label.setText("")
+            job_widget.fragments_label.setText("")
+        self.update_active_summary()
+
+    @profiled
+    def finish_job(self, job_id):
+        self.job_progress.pop(job_id, None)
+        self.speeds.pop(job_id, None)
+        job_widget = self.job_widgets.pop(job_id, None)
+        if job_widget is not None:
+            self.jobs_layout.removeWidget(job_widget)
+            job_widget.deleteLater()
+        self.update_active_summary()
+        self.update_time_estimate()
+
+    def cancel_download(self, job_id):
+        # The engine frees the slot and reports the job cancelled (removing its widget) before returning
+        self.engine.cancel([job_id])
+
+    def cancel_all_downloads(self):
+        for job_id in self.engine.cancel_all():
+            self.queue_model.remove_job(job_id)
+        self.update_stats()
+        self.log("Cancelled all downloads")
 
-        if item['video_id'] in THUMBNAIL_CACHE:
-            pixmap = THUMBNAIL_CACHE[item['video_id']].scaled(240, 180, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            self.progress_thumbnail_label.setPixmap(pixmap)
+    def queue_finished(self, outcomes):
+        self.queue_running = False
+        self.progress_timer.stop()
+        self.update_stats()
+        self.ensure_tab(PROGRESS_TAB)
+        if outcomes['failed'] or outcomes['cancelled']:
+            summary = (f"Queue finished: {outcomes['completed']} completed, "
+                       f"{outcomes['failed']} failed, {outcomes['cancelled']} cancelled")
+            self.active_summary_label.setText(summary)
+            self.log(summary, event='queue_finished', **outcomes)
         else:
-            placeholder = QPixmap(240, 180)
-            placeholder.fill(QColor(60, 60, 60))
-            self.progress_thumbnail_label.setPixmap(placeholder)
+            self.active_summary_label.setText("All downloads completed")
+            self.log("All downloads completed successfully!", event='queue_finished', **outcomes)
 
-            if item['thumbnail']:
-                loader = ThumbnailLoader(item['thumbnail'], item['video_id'])
-                loader.loaded.connect(self.update_progress_thumbnail)
-                self.thumbnail_loaders.append(loader)
-                loader.start()
+    def update_active_summary(self):
+        if not self.tab_built(PROGRESS_TAB):
+            return
+        active = self.engine.active_count()
+        postprocessing = self.engine.postprocess_count()
+        if active or postprocessing:
+            self.active_summary_label.setText(
+                f"Downloading {active} of {self.max_concurrent_downloads} slots, "
+                f"{postprocessing} post-processing ({self.queue_model.rowCount()} waiting)"
+            )
+        else:
+            self.active_summary_label.setText("No active downloads")
+
+    @profiled
+    def update_progress_thumbnail(self, video_id, image):
+        pixmap = QPixmap.fromImage(image)
+        for job_widget in self.job_widgets.values():
+            if job_widget.video_id == video_id:
+                job_widget.set_thumbnail(pixmap)
+
+    @profiled
+    def apply_progress_updates(self):
+        records = self.progress_board.drain()
+        for record in records.values():
+            self.job_progress[record.job_id] = (record.downloaded, record.total)
+            if record.speed is not None:
+                self.speeds[record.job_id] = record.speed
+        if records and self.speeds:
+            self.throughput.update(sum(self.speeds.values()))
+            self.update_time_estimate()
+
+        for record in records.values():
+            job_widget = self.job_widgets.get(record.job_id)
+            if job_widget is None:
+                continue
 
-        worker = DownloadWorker(item, self.download_dir, self.cookies)
-        self.download_workers[item['title']] = worker
+            if record.total > 0:
+                percent = (record.downloaded / record.total) * 100
+                job_widget.progress_bar.setValue(int(percent))
+                job_widget.progress_bar.setFormat(f"{percent:.1f}%")
+                job_widget.downloaded_label.setText(f"{format_size(record.downloaded)} / {format_size(record.total)}")
+            job_widget.status_label.setText("Downloading...")
 
-        worker.progress.connect(self.update_progress)
-        worker.completed.connect(self.download_completed)
-        worker.failed.connect(self.download_failed)
-        worker.status.connect(self.update_status)
+            if record.speed:
+                job_widget.speed_label.setText(f"{record.speed / (1024 * 1024):.2f} MB/s")
 
-        worker.start()
+            if record.eta is not None:
+                job_widget.eta_label.setText(f"ETA: {format_eta(record.eta)}")
 
-        self.progress_bar.setValue(0)
-        self.progress_bar.setFormat("0%")
-        self.status_label.setText("Starting download...")
-        self.log_text.append(f"Starting download: {item['title']}")
-        self.log_text_settings.append(f"Starting download: {item['title']}")
-
-    def update_progress_thumbnail(self, video_id, pixmap):
-        if self.current_title_label.text():
-            current_item = self.queue_list.item(0)
-            if current_item:
-                current_id = current_item.data(Qt.UserRole).get('video_id', '')
-                if video_id == current_id:
-                    self.progress_thumbnail_label.setPixmap(pixmap.scaled(240, 180, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-
-    def format_eta(self, seconds):
-        if seconds is None:
-            return "Calculating..."
-        if seconds < 60:
-            return f"{seconds} sec"
-        elif seconds < 3600:
-            minutes = seconds // 60
-            seconds = seconds % 60
-            return f"{minutes} min {seconds} sec"
-        else:
-            hours = seconds // 3600
-            minutes = (seconds % 3600) // 60
-            seconds = seconds % 60
-            return f"{hours} hr {minutes} min {seconds} sec"
+            job_widget.fragments_label.setText(f"{record.fragments} fragment threads" if record.fragments else "")
 
-    def update_progress(self, progress_data):
-        if 'downloaded_bytes' in progress_data and 'total_bytes' in progress_data:
-            try:
-                downloaded = progress_data['downloaded_bytes']
-                total = progress_data['total_bytes']
-                if total > 0:
-                    percent = (downloaded / total) * 100
-                    self.progress_bar.setValue(int(percent))
-                    self.progress_bar.setFormat(f"{percent:.1f}%")
-                    self.percent_label.setText(f"{percent:.1f}%")
-
-                if 'speed' in progress_data:
-                    speed = progress_data['speed']
-                    if speed > 0:
-                        speed_mb = speed / (1024 * 1024)
-                        self.speed_label.setText(f"{speed_mb:.2f} MB/s")
-
-                if 'eta' in progress_data:
-                    eta = progress_data['eta']
-                    self.eta_label.setText(self.format_eta(eta))
-
-                if 'total_bytes' in progress_data:
-                    total_bytes = progress_data['total_bytes']
-                    if total_bytes:
-                        self.total_size_label.setText(format_size(total_bytes))
-
-                if 'downloaded_bytes' in progress_data:
-                    downloaded_bytes = progress_data['downloaded_bytes']
-                    if downloaded_bytes:
-                        self.downloaded_label.setText(format_size(downloaded_bytes))
-
-            except Exception as e:
-                print(f"Progress update error: {e}")
-
-    def update_status(self, status):
-        self.status_label.setText(status)
-        self.log_text.append(status)
-        self.log_text_settings.append(status)
-
-    def download_completed(self, result):
+    @profiled
+    def update_status(self, job_id, status):
+        job_widget = self.job_widgets.get(job_id)
+        if job_widget is not None:
+            job_widget.status_label.setText(status)
+        self.log(status, job_id=job_id, event='status')
+
+    @profiled
+    def download_completed(self, job_id, result):
         title = result['title']
         path = result['path']
 
-        if title in self.download_workers:
-            del self.download_workers[title]
-
-        self.log_text.append(f"Completed: {title}")
-        self.log_text_settings.append(f"Completed: {title}")
-        self.log_text.append(f"Saved to: {path}")
-        self.log_text_settings.append(f"Saved to: {path}")
+        self.log(f"Completed: {title}", job_id=job_id, event='completed', path=path,
+                 retries=result.get('retries'), resumed_bytes=result.get('resumed_bytes'))
+        self.log(f"Saved to: {path}")
+        if result.get('retries') or result.get('resumed_bytes'):
+            self.log(f"Retries: {result['retries']}, resumed {format_size(result['resumed_bytes'])} instead of re-downloading")
         self.statusBar().showMessage(f"Completed: {title}")
 
-        self.process_next_download()
+        self.finish_job(job_id)
 
-    def download_failed(self, title, error):
-        if title in self.download_workers:
-            del self.download_workers[title]
-
-        self.progress_bar.setFormat("Failed")
-        self.status_label.setText(f"Error: {error}")
-        self.log_text.append(f"Failed: {title} - {error}")
-        self.log_text_settings.append(f"Failed: {title} - {error}")
+    @profiled
+    def download_failed(self, job_id, title, error):
+        self.log(f"Failed: {title} - {error}", logging.ERROR, job_id=job_id, event='failed')
         self.statusBar().showMessage(f"Failed: {title}")
 
-        self.process_next_download()
+        self.finish_job(job_id)
 
-    def closeEvent(self, event):
-        for worker in self.download_workers.values():
-            worker.cancel()
+    def toggle_profiling(self, enabled):
+        if enabled:
+            self.start_profiling()
+        else:
+            self.stop_profiling()
 
-        for loader in self.thumbnail_loaders:
-            loader.quit()
-            loader.wait(500)
+    def start_profiling(self):
+        if PROFILER.enabled:
+            return
+        PROFILER.start()
+        PROFILER.watch_stalls(STALL_HEARTBEAT_MS / 1000)
+        self.heartbeat_timer.start()
+        self.log("Profiling started", logging.INFO)
 
-        if self.playlist_processor and self.playlist_processor.isRunning():
-            self.playlist_processor.cancel()
-            self.playlist_processor.wait(1000)
+    def stop_profiling(self):
+        self.heartbeat_timer.stop()
+        try:
+            path = PROFILER.stop()
+        except OSError as e:
+            self.log(f"Could not write profile: {e}", logging.WARNING)
+            return
+        if path:
+            self.log(f"Profile written to {path}", logging.INFO)
+            for line in PROFILER.slowest():
+                self.log(f"Slowest: {line}", logging.INFO)
+
+    def export_metrics(self):
+        try:
+            METRICS.export()
+        except OSError as e:
+            LOGGER.warning("Could not write metrics: %s", e)
+
+    def closeEvent(self, event):
+        # Signal every worker first so they all wind down in parallel, then wait for them
+        extraction_threads = [thread for thread in (self.video_info_fetcher, self.batch_downloader,
+                                                    self.playlist_processor, self.playlist_enumerator)
+                              if thread is not None and thread.isRunning()]
+        for thread in extraction_threads:
+            thread.cancel()
+        self.thumbnail_fetcher.shutdown()
+        if not self.engine.shutdown(SHUTDOWN_GRACE_SECONDS):
+            self.log("Some downloads did not stop in time; they will resume on the next start", logging.WARNING)
+        for thread in extraction_threads:
+            thread.wait(1000)
+
+        YDL_SESSIONS.close_all()
+        METADATA_CACHE.close()
+        self.engine.journal.close()
+        self.engine.archive.close()
+        self.metrics_timer.stop()
+        self.export_metrics()
+        if PROFILER.enabled:
+            self.stop_profiling()
+        self.log_timer.stop()
+        self.log_pipeline.close()
 
         QApplication.processEvents()
         event.accept()
 
+STARTUP_MARKS = {'imports': time.perf_counter() - STARTUP_T0}
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     app.setStyle('Fusion')
@@ -1371,5 +2026,6 @@ if __name__ == "__main__":
     app.setFont(font)
 
     window = YouTubeDownloader()
+    STARTUP_MARKS['window_built'] = time.perf_counter() - STARTUP_T0
     window.show()
     sys.exit(app.exec_())
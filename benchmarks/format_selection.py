@@ -0,0 +1,174 @@
+"""Micro-benchmark: select_formats() against the old per-policy list scans.
+
+The corpus is real info_dicts: any *.info.json files (as written by
+`yt-dlp --write-info-json`) passed on the command line, plus everything in the
+app's metadata cache. Without either, a synthetic corpus shaped like large
+YouTube responses (many dubbed audio tracks, every resolution in three codecs)
+is generated so the script still runs.
+
+    python benchmarks/format_selection.py [--repeat 200] [--runs 5] [--output results.json] [PATH ...]
+
+Prints one JSON object with the timings for each call site and whether both
+implementations agreed on every info_dict. Each timing is the best of --runs
+runs, so a busy machine inflates it less.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloader_core import APP_DATA_DIR, AAC_CODEC_PREFIXES, select_formats
+
+# The selection code as it was before select_formats, kept here as the baseline
+def legacy_best_audio(formats, original_language=None):
+    if original_language:
+        candidates = [
+            f for f in formats
+            if f.get('acodec', '').startswith(AAC_CODEC_PREFIXES)
+            and f.get('vcodec') == 'none'
+            and f.get('language') == original_language
+        ]
+        if candidates:
+            return max(candidates, key=lambda a: a.get('abr') or 0)
+    candidates = [
+        f for f in formats
+        if f.get('acodec', '').startswith(AAC_CODEC_PREFIXES)
+        and f.get('vcodec') == 'none'
+    ]
+    return max(candidates, key=lambda a: a.get('abr') or 0) if candidates else None
+
+def legacy_best_video(formats):
+    for prefix in ('avc1', 'vp09'):
+        videos = [
+            f for f in formats
+            if f.get('vcodec', '').startswith(prefix)
+            and f.get('acodec') == 'none'
+            and f.get('height') is not None
+        ]
+        if videos:
+            return max(videos, key=lambda x: x.get('height', 0))
+    return None
+
+def legacy_resolutions(formats):
+    options = {}
+    for f in formats:
+        vcodec = f.get('vcodec', '')
+        if (vcodec.startswith('avc1') or vcodec.startswith('vp09')) and f.get('height'):
+            options.setdefault(f['height'], f)
+    return sorted(options.items(), key=lambda x: x[0], reverse=True)
+
+def load_corpus(paths):
+    corpus = []
+    for path in paths:
+        files = glob.glob(os.path.join(path, '**', '*.json'), recursive=True) if os.path.isdir(path) else [path]
+        for name in files:
+            with open(name, encoding='utf-8') as f:
+                info = json.load(f)
+            if info.get('formats'):
+                corpus.append(info)
+
+    cache_path = os.path.join(APP_DATA_DIR, 'metadata_cache.sqlite3')
+    if os.path.exists(cache_path):
+        conn = sqlite3.connect(cache_path)
+        for (payload,) in conn.execute("SELECT info FROM video_info"):
+            info = json.loads(payload)
+            if info.get('formats'):
+                corpus.append(info)
+        conn.close()
+    return corpus
+
+def synthetic_info(rng, languages=40):
+    formats = [{'format_id': f'sb{i}', 'vcodec': 'none', 'acodec': 'none'} for i in range(4)]
+    for lang in rng.sample(['en', 'de', 'fr', 'es', 'it', 'ja', 'ko', 'pt', 'ru', 'hi', 'ar', 'tr', 'pl',
+                            'nl', 'id', 'vi', 'th', 'uk', 'sv', 'cs'] * 2, languages):
+        for acodec, abr in (('mp4a.40.5', 48), ('mp4a.40.2', 129), ('opus', 50), ('opus', 70), ('opus', 160)):
+            formats.append({'vcodec': 'none', 'acodec': acodec, 'abr': abr + rng.random(), 'language': lang})
+    for height in (144, 240, 360, 480, 720, 1080, 1440, 2160):
+        for vcodec in ('avc1.4d401e', 'vp09.00.40.08', 'av01.0.08M.08'):
+            formats.append({'vcodec': vcodec, 'acodec': 'none', 'height': height,
+                            'filesize': rng.randint(10 ** 6, 10 ** 9)})
+    formats.append({'vcodec': 'avc1.42001E', 'acodec': 'mp4a.40.2', 'height': 360})
+    return {'id': f'synthetic{rng.random()}', 'language': 'en', 'formats': formats}
+
+def timed(fn, corpus, repeat, runs):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for info in corpus:
+                fn(info)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best / (repeat * len(corpus)) * 1e6, 2)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('paths', nargs='*', help="*.info.json files or directories containing them")
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.paths)
+    source = 'real'
+    if not corpus:
+        rng = random.Random(0)
+        corpus = [synthetic_info(rng) for _ in range(50)]
+        source = 'synthetic'
+
+    # build_download_item (every queued video) needs audio and video, the
+    # single-video tab needs the resolution list and audio
+    def legacy_download_item(info):
+        formats = info['formats']
+        return legacy_best_audio(formats, info.get('language')), legacy_best_video(formats)
+
+    def legacy_single_video_tab(info):
+        formats = info['formats']
+        return legacy_resolutions(formats), legacy_best_audio(formats, info.get('language'))
+
+    def legacy_all(info):
+        formats = info['formats']
+        return (legacy_best_audio(formats, info.get('language')), legacy_best_video(formats),
+                legacy_resolutions(formats))
+
+    def selected(info):
+        return select_formats(info['formats'], info.get('language'))
+
+    identities = lambda answers: [id(x) if isinstance(x, dict) else [(h, id(f)) for h, f in x] for x in answers]
+    mismatches = sum(1 for info in corpus if identities(legacy_all(info)) != identities(selected(info)))
+
+    us_per_info = {
+        'legacy_download_item': timed(legacy_download_item, corpus, args.repeat, args.runs),
+        'legacy_single_video_tab': timed(legacy_single_video_tab, corpus, args.repeat, args.runs),
+        'legacy_all_policies': timed(legacy_all, corpus, args.repeat, args.runs),
+        'select_formats': timed(selected, corpus, args.repeat, args.runs),
+    }
+    results = {
+        'corpus': source,
+        'info_dicts': len(corpus),
+        'mean_formats': round(sum(len(info['formats']) for info in corpus) / len(corpus), 1),
+        'repeat': args.repeat,
+        'runs': args.runs,
+        'us_per_info': us_per_info,
+        # One select_formats() pass replaces the legacy scans at each call site
+        'speedup': {
+            name[len('legacy_'):]: round(us_per_info[name] / us_per_info['select_formats'], 2)
+            for name in ('legacy_download_item', 'legacy_single_video_tab', 'legacy_all_policies')
+        },
+        'mismatches': mismatches,
+    }
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,511 @@
+"""Offline end-to-end benchmarks against a local stand-in for YouTube.
+
+A threaded HTTP server on 127.0.0.1 serves canned info_dicts, paged playlists,
+synthetic media (made once with ffmpeg's test sources) and JPEG thumbnails. The
+extractors in yt_dlp_plugins/ point yt-dlp at it, so the real code runs
+unchanged: DownloadEngine/DownloadJob with ffmpeg post-processing, and the GUI's
+BatchDownloader, PlaylistEnumerator, PlaylistProcessor and ThumbnailFetcher
+threads. Caches and downloads go to a temporary directory, not the app's own.
+
+    python benchmarks/offline_suite.py [--jobs 8] [--playlist-size 1000] [--dash] [--output results.json]
+    python benchmarks/offline_suite.py --output new.json --compare old.json
+
+Scenarios:
+  queue       resolve and download --jobs videos, then merge them
+  playlist    list a --playlist-size playlist and resolve every entry, cold and then from the cache
+  thumbnails  load --thumbnails thumbnails over HTTP, then from disk, then from memory
+
+The queue scenario needs ffmpeg. The playlist and thumbnail scenarios need
+PyQt5 (run offscreen). A scenario that cannot run is reported as skipped.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+# BENCH_DIR makes yt_dlp_plugins importable, and yt-dlp loads its extractors from there
+sys.path[:0] = [REPO_DIR, BENCH_DIR]
+
+from downloader_core import (
+    FFMPEG_PATH, METADATA_CACHE, METRICS, YDL_SESSIONS, DownloadEngine, EngineListener,
+    extract_video_info, load_yt_dlp, resolve_urls
+)
+
+SCENARIOS = ('queue', 'playlist', 'thumbnails')
+PLAYLIST_PAGE_SIZE = 100
+NOMINAL_MEDIA_SIZES = {'video': 8 * 1024 * 1024, 'audio': 512 * 1024}
+WAIT_POLL_MS = 20
+
+def bench_video_id(prefix, i):
+    return f"{prefix}{i:010d}"
+
+def make_media(directory, seconds, video_bitrate):
+    """Encode a 720p test pattern and a sine tone; returns {'video': bytes, 'audio': bytes}"""
+    video = os.path.join(directory, 'video.mp4')
+    audio = os.path.join(directory, 'audio.m4a')
+    base = [FFMPEG_PATH, '-y', '-nostdin', '-loglevel', 'error', '-f', 'lavfi']
+    subprocess.run(base + ['-i', f'testsrc2=size=1280x720:rate=30:duration={seconds}',
+                           '-c:v', 'mpeg4', '-b:v', video_bitrate, '-an', '-movflags', '+faststart', video],
+                   check=True)
+    subprocess.run(base + ['-i', f'sine=frequency=440:duration={seconds}',
+                           '-c:a', 'aac', '-b:a', '128k', '-movflags', '+faststart', audio],
+                   check=True)
+    media = {}
+    for kind, path in (('video', video), ('audio', audio)):
+        with open(path, 'rb') as f:
+            media[kind] = f.read()
+    return media
+
+class BenchServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, media=None, thumbnail=b'', fragments=0, seconds=20, latency=0.0):
+        super().__init__(('127.0.0.1', 0), BenchHandler)
+        self.media = media
+        self.thumbnail = thumbnail
+        self.fragments = fragments
+        self.seconds = seconds
+        self.latency = latency
+        self.base = f"http://127.0.0.1:{self.server_address[1]}"
+        self.requests = 0
+        self.sent_bytes = 0
+        self.lock = threading.Lock()
+
+    def media_size(self, kind):
+        return len(self.media[kind]) if self.media else NOMINAL_MEDIA_SIZES[kind]
+
+    def info(self, video_id):
+        formats = [
+            self.media_format(video_id, 'audio', format_id='140', ext='m4a', acodec='mp4a.40.2',
+                              vcodec='none', abr=128, asr=44100, language='en'),
+            self.media_format(video_id, 'video', format_id='136', ext='mp4', vcodec='avc1.4d401f',
+                              acodec='none', width=1280, height=720, fps=30),
+        ]
+        return {
+            'id': video_id,
+            'title': f"Benchmark video {video_id}",
+            'uploader': 'Benchmark',
+            'duration': self.seconds,
+            'language': 'en',
+            'thumbnail': f"{self.base}/thumb/{video_id}.jpg",
+            'webpage_url': f"{self.base}/watch?v={video_id}",
+            'formats': formats,
+        }
+
+    def media_format(self, video_id, kind, **fields):
+        url = f"{self.base}/media/{video_id}/{kind}"
+        fmt = dict(fields, url=url, protocol='http', filesize=self.media_size(kind))
+        if self.fragments:
+            fmt.update(protocol='http_dash_segments', fragment_base_url=url + '/',
+                       fragments=[{'path': str(i)} for i in range(self.fragments)])
+        return fmt
+
+    def fragment(self, kind, index):
+        data = self.media[kind]
+        step = -(-len(data) // self.fragments)
+        return data[index * step:(index + 1) * step]
+
+class BenchHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        parts = urllib.parse.urlsplit(self.path).path.strip('/').split('/')
+        try:
+            body, content_type = self.route(server, parts)
+        except (KeyError, IndexError, ValueError, TypeError):
+            body = None
+        if body is None:
+            self.send_error(404)
+            return
+        with server.lock:
+            server.requests += 1
+        self.send_body(body, content_type)
+
+    def route(self, server, parts):
+        if parts[0] == 'info' and len(parts) == 2:
+            return json.dumps(server.info(parts[1][:-len('.json')])).encode(), 'application/json'
+        if parts[0] == 'playlist' and len(parts) == 3:
+            size = int(parts[1][len('bench'):])
+            page = int(parts[2][:-len('.json')])
+            ids = [bench_video_id('p', i) for i in range(page * PLAYLIST_PAGE_SIZE,
+                                                          min(size, (page + 1) * PLAYLIST_PAGE_SIZE))]
+            return json.dumps(ids).encode(), 'application/json'
+        if parts[0] == 'media' and len(parts) == 3:
+            return server.media[parts[2]], 'video/mp4'
+        if parts[0] == 'media' and len(parts) == 4:
+            return server.fragment(parts[2], int(parts[3])), 'video/mp4'
+        if parts[0] == 'thumb' and len(parts) == 2:
+            return server.thumbnail, 'image/jpeg'
+        return None, None
+
+    def send_body(self, body, content_type):
+        start, end = 0, len(body) - 1
+        match = self.headers.get('Range', '')
+        if match.startswith('bytes='):
+            first, _, last = match[len('bytes='):].partition('-')
+            start = int(first or 0)
+            end = min(int(last), end) if last else end
+            if start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{len(body)}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        self.wfile.write(body[start:end + 1])
+        with self.server.lock:
+            self.server.sent_bytes += end - start + 1
+
+class BenchListener(EngineListener):
+    def __init__(self):
+        self.completed = 0
+        self.failures = []
+        self.lock = threading.Lock()
+
+    def job_completed(self, job_id, result):
+        with self.lock:
+            self.completed += 1
+
+    def job_failed(self, job_id, title, error):
+        with self.lock:
+            self.failures.append(error)
+
+def phase_delta(before, after):
+    """Per-phase count and mean for the observations made between two METRICS snapshots"""
+    phases = {}
+    for name, now in after['phases'].items():
+        prev = before['phases'].get(name, {'count': 0, 'sum_seconds': 0.0})
+        count = now['count'] - prev['count']
+        if count:
+            phases[name] = {'count': count,
+                            'mean_seconds': round((now['sum_seconds'] - prev['sum_seconds']) / count, 4)}
+    return phases
+
+class QtRunner:
+    """Runs the GUI's QThreads to completion under a private event loop"""
+
+    def __init__(self):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5.QtWidgets import QApplication
+        from PyQt5.QtCore import QEventLoop, QTimer
+        import Vidoedownlaoder
+        self.app = QApplication.instance() or QApplication([])
+        self.QEventLoop = QEventLoop
+        self.QTimer = QTimer
+        self.gui = Vidoedownlaoder
+
+    def wait_for(self, signals, timeout, start=None, done=None):
+        """Run the event loop until a signal fires (or, given done, until done() is true); False on timeout"""
+        signals = signals if isinstance(signals, tuple) else (signals,)
+        loop = self.QEventLoop()
+        check = lambda *_: (done is None or done()) and loop.quit()
+        for signal in signals:
+            signal.connect(check)
+        expired = []
+        timer = self.QTimer()
+        timer.setSingleShot(True)
+        timer.timeout.connect(lambda: (expired.append(True), loop.quit()))
+        timer.start(int(timeout * 1000))
+        # Cross-thread emissions queued before the connect above still run their
+        # other slots in this loop but never reach check, so done() is also polled
+        poll = self.QTimer()
+        if done:
+            poll.timeout.connect(check)
+            poll.start(WAIT_POLL_MS)
+        if start:
+            start()
+        if not (done and done()):
+            loop.exec_()
+        poll.stop()
+        timer.stop()
+        for signal in signals:
+            signal.disconnect(check)
+        return not expired
+
+    def run_thread(self, thread, signal, timeout):
+        finished = self.wait_for(signal, timeout, thread.start)
+        thread.wait()
+        return finished
+
+    def thumbnail_bytes(self):
+        from PyQt5.QtCore import QBuffer, QIODevice, Qt
+        from PyQt5.QtGui import QColor, QImage, QLinearGradient, QPainter
+        image = QImage(480, 360, QImage.Format_RGB32)
+        painter = QPainter(image)
+        gradient = QLinearGradient(0, 0, 480, 360)
+        gradient.setColorAt(0, QColor(20, 40, 120))
+        gradient.setColorAt(1, QColor(200, 90, 30))
+        painter.fillRect(image.rect(), gradient)
+        painter.setPen(QColor(255, 255, 255))
+        painter.drawText(image.rect(), Qt.AlignCenter, "benchmark")
+        painter.end()
+        buffer = QBuffer()
+        buffer.open(QIODevice.WriteOnly)
+        image.save(buffer, 'JPG', 90)
+        return bytes(buffer.data())
+
+def bench_queue(server, qt, cookies, work_dir, args):
+    urls = [f"{server.base}/watch?v={bench_video_id('q', i)}" for i in range(args.jobs)]
+    before = METRICS.snapshot()
+    t0 = time.perf_counter()
+    if qt:
+        resolver = 'BatchDownloader'
+        fetcher = qt.gui.BatchDownloader(urls, cookies, args.metadata_workers)
+        qt.run_thread(fetcher, fetcher.completed, args.timeout)
+        items = fetcher.download_items
+    else:
+        resolver = 'resolve_urls'
+        items = resolve_urls(cookies, urls, args.metadata_workers)
+    resolve_seconds = time.perf_counter() - t0
+
+    listener = BenchListener()
+    engine = DownloadEngine(os.path.join(work_dir, 'downloads'), cookies, args.concurrency, listener,
+                            postprocess_workers=args.postprocess_workers)
+    sent_before = server.sent_bytes
+    t0 = time.perf_counter()
+    engine.submit(items)
+    engine.start()
+    finished = engine.wait(args.timeout)
+    seconds = time.perf_counter() - t0
+    if not finished:
+        engine.shutdown()
+    transferred = server.sent_bytes - sent_before
+    return {
+        'jobs': len(urls),
+        'resolved': len(items),
+        'resolver': resolver,
+        'concurrency': args.concurrency,
+        'postprocess_workers': args.postprocess_workers,
+        'dash_fragments': args.fragments if args.dash else 0,
+        'completed': listener.completed,
+        'failed': len(listener.failures),
+        'errors': listener.failures[:5],
+        'timed_out': not finished,
+        'resolve_seconds': round(resolve_seconds, 3),
+        'queue_seconds': round(seconds, 3),
+        'jobs_per_minute': round(listener.completed / seconds * 60, 2) if seconds else 0,
+        'transferred_bytes': transferred,
+        'throughput_mb_s': round(transferred / seconds / 1e6, 2) if seconds else 0,
+        'phases': phase_delta(before, METRICS.snapshot()),
+    }
+
+def bench_playlist(server, qt, cookies, args):
+    url = f"{server.base}/playlist?list=bench{args.playlist_size}"
+    entries = []
+    first_batch = []
+    t0 = time.perf_counter()
+
+    def on_batch(playlist_info, batch):
+        if not first_batch:
+            first_batch.append(time.perf_counter() - t0)
+        entries.extend(batch)
+
+    enumerator = qt.gui.PlaylistEnumerator(url, cookies)
+    enumerator.batch.connect(on_batch)
+    qt.run_thread(enumerator, enumerator.finished_listing, args.timeout)
+    listing_seconds = time.perf_counter() - t0
+
+    results = {
+        'entries': len(entries),
+        'metadata_workers': args.metadata_workers,
+        'listing_seconds': round(listing_seconds, 3),
+        'first_batch_seconds': round(first_batch[0], 3) if first_batch else None,
+    }
+    # Cold resolves every entry through the server; warm is served by the metadata cache
+    for name in ('cold', 'warm'):
+        errors = []
+        hits = METADATA_CACHE.hits
+        processor = qt.gui.PlaylistProcessor(entries, list(range(1, len(entries) + 1)), cookies,
+                                             args.metadata_workers)
+        processor.error.connect(errors.append)
+        t0 = time.perf_counter()
+        qt.run_thread(processor, processor.completed, args.timeout)
+        seconds = time.perf_counter() - t0
+        results[name] = {
+            'seconds': round(seconds, 3),
+            'resolved': len(processor.download_items),
+            'errors': len(errors),
+            'entries_per_second': round(len(processor.download_items) / seconds, 1) if seconds else 0,
+            'cache_hits': METADATA_CACHE.hits - hits,
+        }
+    return results
+
+def bench_thumbnails(server, qt, args):
+    cache = qt.gui.THUMBNAIL_CACHE
+    fetcher = qt.gui.ThumbnailFetcher(args.thumbnail_workers)
+    video_ids = [bench_video_id('t', i) for i in range(args.thumbnails)]
+    loaded = set()
+    failed = set()
+    fetcher.loaded.connect(lambda video_id, image: loaded.add(video_id))
+    fetcher.failed.connect(lambda video_id: failed.add(video_id))
+    results = {'thumbnails': len(video_ids), 'workers': args.thumbnail_workers,
+               'jpeg_bytes': len(server.thumbnail)}
+    try:
+        for name in ('network', 'disk', 'memory'):
+            if name == 'disk':
+                with cache.lock:
+                    cache.memory.clear()
+                    cache.memory_bytes = 0
+            loaded.clear()
+            failed.clear()
+            finished = lambda: len(loaded) + len(failed) >= len(video_ids)
+
+            def request_all():
+                for video_id in video_ids:
+                    fetcher.request(f"{server.base}/thumb/{video_id}.jpg", video_id)
+
+            t0 = time.perf_counter()
+            completed = qt.wait_for((fetcher.loaded, fetcher.failed), args.timeout, start=request_all, done=finished)
+            seconds = time.perf_counter() - t0
+            results[name] = {
+                'timed_out': not completed,
+                'seconds': round(seconds, 4),
+                'loaded': len(loaded),
+                'failed': len(failed),
+                'ms_per_thumbnail': round(seconds / len(video_ids) * 1000, 3) if video_ids else 0,
+            }
+        results['timed_out'] = any(results[name]['timed_out'] for name in ('network', 'disk', 'memory'))
+    finally:
+        fetcher.shutdown()
+    return results
+
+def flatten(results, prefix=''):
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten(value, path + '.')
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+def compare(baseline, results):
+    """Print every numeric result that is in both runs with its relative change"""
+    old = dict(flatten(baseline.get('scenarios', {})))
+    for path, value in flatten(results['scenarios']):
+        if path in old:
+            change = f"{(value - old[path]) / old[path] * 100:+.1f}%" if old[path] else "n/a"
+            print(f"{path:<50} {old[path]:>14} {value:>14} {change:>9}", file=sys.stderr)
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="comma-separated subset to run")
+    parser.add_argument('--jobs', type=int, default=8, help="videos downloaded by the queue scenario")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--postprocess-workers', type=int, default=2)
+    parser.add_argument('--metadata-workers', type=int, default=8)
+    parser.add_argument('--playlist-size', type=int, default=1000)
+    parser.add_argument('--thumbnails', type=int, default=100)
+    parser.add_argument('--thumbnail-workers', type=int, default=4)
+    parser.add_argument('--media-seconds', type=int, default=20, help="length of the synthetic video")
+    parser.add_argument('--video-bitrate', default='8M')
+    parser.add_argument('--dash', action='store_true', help="serve media as DASH fragments instead of one file")
+    parser.add_argument('--fragments', type=int, default=40, help="fragments per stream with --dash")
+    parser.add_argument('--latency-ms', type=float, default=0, help="delay added to every server response")
+    parser.add_argument('--timeout', type=float, default=600, help="seconds before a scenario is abandoned")
+    parser.add_argument('--output', help="also write the results to this file")
+    parser.add_argument('--compare', metavar='BASELINE', help="print changes against an earlier results file")
+    parser.add_argument('--keep', action='store_true', help="keep the temporary directory")
+    args = parser.parse_args(argv)
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    work_dir = tempfile.mkdtemp(prefix='ytdl-bench-')
+    cookies = os.path.join(work_dir, 'cookies.txt')
+    # The caches connect lazily, so pointing them elsewhere here keeps the user's own untouched
+    METADATA_CACHE.path = os.path.join(work_dir, 'metadata_cache.sqlite3')
+    skipped = {}
+
+    qt = None
+    try:
+        qt = QtRunner()
+        qt.gui.THUMBNAIL_CACHE.cache_dir = os.path.join(work_dir, 'thumbnails')
+    except ImportError as e:
+        for name in ('playlist', 'thumbnails'):
+            skipped[name] = f"PyQt5 not available: {e}"
+
+    media = None
+    if 'queue' in scenarios:
+        if shutil.which(FFMPEG_PATH):
+            media = make_media(work_dir, args.media_seconds, args.video_bitrate)
+        else:
+            skipped['queue'] = f"ffmpeg not found ({FFMPEG_PATH})"
+
+    server = BenchServer(media, qt.thumbnail_bytes() if qt else b'', args.fragments if args.dash else 0,
+                         args.media_seconds, args.latency_ms / 1000)
+    threading.Thread(target=server.serve_forever, name='bench-server', daemon=True).start()
+    yt_dlp = load_yt_dlp()
+    results = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'yt_dlp': yt_dlp.version.__version__,
+        'platform': platform.platform(),
+        'media_bytes': {kind: len(data) for kind, data in (media or {}).items()},
+        'latency_ms': args.latency_ms,
+        'scenarios': {},
+    }
+    try:
+        probe = extract_video_info(cookies, f"{server.base}/watch?v={bench_video_id('x', 0)}")
+        if not probe or probe.get('extractor_key') != 'OfflineBench':
+            print("yt-dlp did not load the offline extractor from benchmarks/yt_dlp_plugins", file=sys.stderr)
+            return 2
+        for name in scenarios:
+            if name in skipped:
+                results['scenarios'][name] = {'skipped': skipped[name]}
+            elif name == 'queue':
+                results['scenarios'][name] = bench_queue(server, qt, cookies, work_dir, args)
+            elif name == 'playlist':
+                results['scenarios'][name] = bench_playlist(server, qt, cookies, args)
+            else:
+                results['scenarios'][name] = bench_thumbnails(server, qt, args)
+    finally:
+        server.shutdown()
+        YDL_SESSIONS.close_all()
+        METADATA_CACHE.close()
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+    failed = any(s.get('failed') or s.get('timed_out') for s in results['scenarios'].values())
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
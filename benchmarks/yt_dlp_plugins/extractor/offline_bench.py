@@ -0,0 +1,37 @@
+"""yt-dlp extractors for the local server started by benchmarks/offline_suite.py.
+
+yt-dlp picks these up because benchmarks/ is on sys.path when the suite runs.
+They only match http://127.0.0.1 URLs, so they cannot affect real downloads.
+"""
+import functools
+
+from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.utils import OnDemandPagedList
+
+
+class OfflineBenchIE(InfoExtractor):
+    IE_NAME = 'offlinebench'
+    _VALID_URL = r'(?P<base>http://127\.0\.0\.1:\d+)/watch\?v=(?P<id>[0-9A-Za-z_-]{11})'
+
+    def _real_extract(self, url):
+        base, video_id = self._match_valid_url(url).group('base', 'id')
+        # The server returns a complete info_dict, formats and thumbnail included
+        return self._download_json(f'{base}/info/{video_id}.json', video_id)
+
+
+class OfflineBenchPlaylistIE(InfoExtractor):
+    IE_NAME = 'offlinebench:playlist'
+    _VALID_URL = r'(?P<base>http://127\.0\.0\.1:\d+)/playlist\?list=(?P<id>bench\d+)'
+    _PAGE_SIZE = 100
+
+    def _fetch_page(self, base, playlist_id, page):
+        video_ids = self._download_json(f'{base}/playlist/{playlist_id}/{page}.json', playlist_id,
+                                        note=f'Downloading page {page + 1}')
+        for video_id in video_ids:
+            yield self.url_result(f'{base}/watch?v={video_id}', OfflineBenchIE.ie_key(), video_id)
+
+    def _real_extract(self, url):
+        base, playlist_id = self._match_valid_url(url).group('base', 'id')
+        # Paged like the YouTube tab extractor, so iter_playlist's lazy path is what gets measured
+        entries = OnDemandPagedList(functools.partial(self._fetch_page, base, playlist_id), self._PAGE_SIZE)
+        return self.playlist_result(entries, playlist_id, f'Benchmark playlist {playlist_id}')
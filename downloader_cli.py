@@ -0,0 +1,222 @@
+"""Headless front end for downloader_core.
+
+Examples:
+    python downloader_cli.py https://www.youtube.com/watch?v=... https://youtu.be/...
+    python downloader_cli.py --batch-file urls.txt --concurrency 4
+    python downloader_cli.py --playlist https://www.youtube.com/playlist?list=... --items 1-10,15
+    python downloader_cli.py --batch-file urls.txt --limit-rate 4M --schedule 09:00-18:00=1M
+"""
+import argparse
+import sys
+import threading
+
+from downloader_core import (
+    COOKIE_PATH, ARCHIVE_PATH, AUDIO_MODES, DEFAULT_AUDIO_MODE, DEFAULT_BASE_DOWNLOAD_DIR, DEFAULT_MAX_CONCURRENT_DOWNLOADS,
+    DEFAULT_EXTRACTION_WORKERS, DEFAULT_POSTPROCESS_WORKERS, DEFAULT_MIN_FRAGMENT_THREADS, DEFAULT_MAX_FRAGMENT_THREADS,
+    METRICS_DIR, PARTIAL_FILE_POLICIES, DEFAULT_PARTIAL_FILE_POLICY, YDL_SESSIONS, METADATA_CACHE, BANDWIDTH, FRAGMENT_TUNER, METRICS, PROFILER, profiling_requested,
+    DownloadEngine, EngineListener, JobJournal, DownloadArchive, LogPipeline, LOGGER,
+    format_size, format_eta, dated_download_dir, parse_range_selection, parse_rate, parse_schedule, skip_summary, video_id_from_url,
+    list_playlist, resolve_urls, resolve_playlist_entries
+)
+
+class ConsoleListener(EngineListener):
+    def __init__(self):
+        self.titles = {}
+        self.completed = 0
+        self.failed = 0
+        self.lock = threading.Lock()
+
+    def say(self, message):
+        with self.lock:
+            print(message, flush=True)
+        LOGGER.info(message)
+
+    def job_started(self, item):
+        self.titles[item['job_id']] = item['title']
+        self.say(f"Starting download: {item['title']}")
+
+    def job_status(self, job_id, status):
+        self.say(f"{self.titles.get(job_id, job_id)}: {status}")
+
+    def job_completed(self, job_id, result):
+        self.completed += 1
+        self.say(f"Completed: {result['title']}\nSaved to: {result['path']}")
+        if result.get('retries') or result.get('resumed_bytes'):
+            self.say(f"Retries: {result['retries']}, resumed {format_size(result['resumed_bytes'])} instead of re-downloading")
+
+    def job_failed(self, job_id, title, error):
+        self.failed += 1
+        self.say(f"Failed: {title} - {error}")
+
+    def job_cancelled(self, job_id):
+        self.say(f"Cancelled: {self.titles.get(job_id, job_id)}")
+
+    def print_progress(self, records):
+        for record in records.values():
+            title = self.titles.get(record.job_id, record.job_id)[:40]
+            percent = f"{record.downloaded / record.total * 100:5.1f}%" if record.total else "  ?  "
+            speed = f"{format_size(record.speed)}/s" if record.speed else "-"
+            fragments = f"  x{record.fragments}" if record.fragments else ""
+            self.say(f"  {title:<40} {percent} {speed:>12}  ETA {format_eta(record.eta)}{fragments}")
+
+def read_batch_file(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Download YouTube videos without the GUI.")
+    parser.add_argument('urls', nargs='*', help="video URLs to download")
+    parser.add_argument('-b', '--batch-file', help="file with one video URL per line ('#' starts a comment)")
+    parser.add_argument('-p', '--playlist', help="playlist URL to download")
+    parser.add_argument('--items', default='all', help="playlist selection, e.g. '1-10,15' (default: all)")
+    parser.add_argument('-o', '--output', default=DEFAULT_BASE_DOWNLOAD_DIR,
+                        help="base download directory; a dated sub-folder is created per day")
+    parser.add_argument('-j', '--concurrency', type=int, default=DEFAULT_MAX_CONCURRENT_DOWNLOADS,
+                        help="number of simultaneous downloads")
+    parser.add_argument('--metadata-workers', type=int, default=DEFAULT_EXTRACTION_WORKERS,
+                        help="number of parallel metadata extractions")
+    parser.add_argument('--postprocess-workers', type=int, default=DEFAULT_POSTPROCESS_WORKERS,
+                        help="number of simultaneous ffmpeg merges/conversions; downloads continue meanwhile")
+    parser.add_argument('--audio-only', action='store_true', help="download the best audio track only")
+    parser.add_argument('--audio-format', choices=AUDIO_MODES, default=DEFAULT_AUDIO_MODE,
+                        help="with --audio-only: keep the original stream (m4a/opus, no re-encode) or convert to mp3")
+    parser.add_argument('--embed-metadata', action='store_true',
+                        help="with --audio-only: write title/artist tags and, except for opus, the thumbnail as cover")
+    parser.add_argument('--cookies', default=COOKIE_PATH, help="cookies.txt file to pass to yt-dlp")
+    parser.add_argument('--journal', metavar='PATH',
+                        help="SQLite queue journal; unfinished jobs recorded there are resumed first")
+    parser.add_argument('--archive', default=ARCHIVE_PATH, metavar='PATH',
+                        help="record of finished downloads; videos listed there or already queued are skipped")
+    parser.add_argument('--no-archive', action='store_true', help="download even if a video was fetched before")
+    parser.add_argument('--limit-rate', type=parse_rate, default=0, metavar='RATE',
+                        help="total bandwidth cap shared by all downloads, e.g. 2M or 500K (default: unlimited)")
+    parser.add_argument('--per-job-limit', type=parse_rate, default=0, metavar='RATE',
+                        help="bandwidth cap for each individual download")
+    parser.add_argument('--schedule', type=parse_schedule, default=[], metavar='WINDOWS',
+                        help="time-of-day caps that override --limit-rate, e.g. '09:00-18:00=1M,18:00-23:00=5M'")
+    parser.add_argument('--fragments', default=f"{DEFAULT_MIN_FRAGMENT_THREADS}-{DEFAULT_MAX_FRAGMENT_THREADS}",
+                        metavar='N|MIN-MAX',
+                        help="parallel DASH/HLS fragment downloads per job; a range is tuned from measured throughput")
+    parser.add_argument('--progress-every', type=float, default=2.0,
+                        help="seconds between progress lines (0 disables them)")
+    parser.add_argument('--partial-files', choices=PARTIAL_FILE_POLICIES, default=DEFAULT_PARTIAL_FILE_POLICY,
+                        help="what to do with the partial files of interrupted downloads; "
+                             "with --journal they are always kept so the next run resumes them")
+    parser.add_argument('--metrics-dir', nargs='?', const=METRICS_DIR, metavar='DIR',
+                        help=f"write per-job phase timings (stats.json) and Prometheus text (downloader.prom) "
+                             f"here when done (default DIR: {METRICS_DIR})")
+    return parser.parse_args(argv)
+
+def report_skipped(source, skipped):
+    if skipped:
+        print(f"{source}: skipped {skip_summary(skipped)}", flush=True)
+    return sum(skipped.values())
+
+def collect_items(args, engine):
+    on_error = lambda job, e: print(f"Error resolving {job[1]}: {e}", file=sys.stderr, flush=True)
+    on_progress = lambda done, total: print(f"Resolved {done}/{total}", flush=True)
+    items = []
+    skipped_total = 0
+
+    urls = list(args.urls)
+    if args.batch_file:
+        urls += read_batch_file(args.batch_file)
+    urls, skipped = engine.filter_new(urls, video_id_from_url)
+    skipped_total += report_skipped("URLs", skipped)
+    if urls:
+        items += resolve_urls(args.cookies, urls, args.metadata_workers, args.audio_only,
+                              on_progress=on_progress, on_error=on_error)
+
+    if args.playlist:
+        playlist_info = list_playlist(args.cookies, args.playlist)
+        if not playlist_info or 'entries' not in playlist_info:
+            print("Invalid playlist or no videos found", file=sys.stderr)
+        else:
+            entries = list(playlist_info['entries'])
+            if args.items.strip().lower() == 'all':
+                selected = range(1, len(entries) + 1)
+            else:
+                selected = parse_range_selection(args.items, len(entries))
+            selected, skipped = engine.filter_new(selected, lambda idx: entries[idx - 1].get('id'))
+            skipped_total += report_skipped("Playlist", skipped)
+            print(f"Playlist '{playlist_info.get('title', 'Untitled Playlist')}': "
+                  f"{len(entries)} videos, {len(selected)} selected", flush=True)
+            items += resolve_playlist_entries(args.cookies, entries, selected, args.metadata_workers,
+                                              args.audio_only, on_progress=on_progress, on_error=on_error)
+    for item in items:
+        if item.get('audio_only'):
+            item['audio_mode'] = args.audio_format
+            item['embed_metadata'] = args.embed_metadata
+    return items, skipped_total
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if not (args.urls or args.batch_file or args.playlist or args.journal):
+        print("Nothing to download: pass URLs, --batch-file, --playlist or --journal", file=sys.stderr)
+        return 2
+
+    BANDWIDTH.set_global_rate(args.limit_rate)
+    BANDWIDTH.set_default_job_rate(args.per_job_limit)
+    BANDWIDTH.set_schedule(args.schedule)
+    low, _, high = args.fragments.partition('-')
+    try:
+        FRAGMENT_TUNER.set_bounds(int(low), int(high or low))
+    except ValueError:
+        print(f"Invalid --fragments value: {args.fragments}", file=sys.stderr)
+        return 2
+    log_pipeline = LogPipeline(dated_download_dir(args.output))
+    if profiling_requested():
+        PROFILER.start()
+    listener = ConsoleListener()
+    journal = JobJournal(args.journal) if args.journal else None
+    archive = None if args.no_archive else DownloadArchive(args.archive)
+    engine = DownloadEngine(args.output, args.cookies, max(1, args.concurrency), listener,
+                            journal=journal, archive=archive,
+                            postprocess_workers=max(1, args.postprocess_workers),
+                            partial_policy=args.partial_files)
+    try:
+        restored = engine.restore()
+        if restored:
+            print(f"Resuming {len(restored)} unfinished jobs from {args.journal}", flush=True)
+        items, skipped_total = collect_items(args, engine)
+        print(METADATA_CACHE.stats_text(), flush=True)
+        if not items and not restored:
+            if skipped_total:
+                print("Nothing new to download", flush=True)
+                return 0
+            print("No downloadable videos found", file=sys.stderr)
+            return 1
+
+        total_size = sum(item.get('estimated_size') or 0 for item in items + restored)
+        print(f"Queued {len(items) + len(restored)} videos, about {format_size(total_size)}", flush=True)
+        engine.submit(items)
+        engine.start()
+        interval = args.progress_every if args.progress_every > 0 else None
+        while not engine.wait(interval):
+            listener.print_progress(engine.progress_board.drain())
+    except KeyboardInterrupt:
+        print("Interrupted, cancelling downloads...", file=sys.stderr)
+        if not engine.shutdown():
+            print("Some downloads did not stop in time", file=sys.stderr)
+        return 130
+    finally:
+        YDL_SESSIONS.close_all()
+        METADATA_CACHE.close()
+        if journal:
+            journal.close()
+        if archive:
+            archive.close()
+        if args.metrics_dir:
+            METRICS.export(args.metrics_dir)
+        profile_path = PROFILER.stop()
+        if profile_path:
+            print(f"Profile written to {profile_path}", file=sys.stderr)
+            for line in PROFILER.slowest():
+                print(f"  {line}", file=sys.stderr)
+        log_pipeline.close()
+
+    print(f"Done: {listener.completed} completed, {listener.failed} failed", flush=True)
+    return 1 if listener.failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
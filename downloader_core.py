@@ -0,0 +1,2174 @@
+"""GUI-free download engine shared by the PyQt front end and the command line.
+
+Nothing in here may import PyQt: the engine has to run on headless boxes.
+"""
+import os
+import re
+import sys
+import time
+import json
+import logging
+import logging.handlers
+import queue
+import copy
+import glob
+import math
+import random
+import cProfile
+import pstats
+import tracemalloc
+import traceback
+import functools
+import uuid
+import shutil
+import sqlite3
+import subprocess
+import threading
+import urllib.request
+from collections import Counter, OrderedDict, deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait as wait_futures
+from contextlib import contextmanager
+from datetime import datetime
+
+# Global constants
+COOKIE_PATH = r"C:\Users\meet\Desktop\Some_randon_shi\youtube.com_cookies.txt"
+APP_DATA_DIR = os.path.join(os.path.expanduser('~'), '.youtube_downloader')
+DEFAULT_BASE_DOWNLOAD_DIR = os.path.join(os.getcwd(), 'download')
+DEFAULT_MAX_CONCURRENT_DOWNLOADS = 3
+MAX_CONCURRENT_DOWNLOADS_LIMIT = 16
+DEFAULT_EXTRACTION_WORKERS = 6
+MAX_EXTRACTION_WORKERS_LIMIT = 32
+MAX_IDLE_SESSIONS_PER_PROFILE = MAX_EXTRACTION_WORKERS_LIMIT
+DEFAULT_METADATA_TTL_HOURS = 7 * 24
+DEFAULT_STREAM_URL_TTL_HOURS = 4
+VIDEO_ID_RE = re.compile(r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([0-9A-Za-z_-]{11})')
+UNCACHED_INFO_KEYS = ('automatic_captions', 'subtitles', 'requested_subtitles', 'heatmap')
+# What yt-dlp's format selection merges into a processed info_dict. 'language' is
+# deliberately missing: YouTube sets none itself, so after processing it is the
+# language of the preferred (original) audio track, which build_download_item uses.
+SELECTED_FORMAT_KEYS = (
+    'requested_formats', 'requested_downloads', 'requested_subtitles', 'format_id', 'format', 'format_note',
+    'url', 'manifest_url', 'manifest_stream_number', 'fragment_base_url', 'fragments', 'is_from_start',
+    'protocol', 'ext', 'container', 'http_headers', 'downloader_options', 'width', 'height', 'resolution',
+    'aspect_ratio', 'stretched_ratio', 'fps', 'dynamic_range', 'vcodec', 'vbr', 'acodec', 'abr', 'asr',
+    'audio_channels', 'tbr', 'filesize', 'filesize_approx', 'quality', 'preference', 'source_preference',
+    'language_preference', 'has_drm', 'audio_ext', 'video_ext', 'available_at',
+    'filepath', '_filename', 'filename',
+)
+AAC_CODEC_PREFIXES = ('mp4a.40.2', 'mp4a.40.5', 'aac')
+VIDEO_CODEC_FAMILIES = ('avc1', 'vp09', 'vp9', 'av01', 'hev1', 'hvc1')
+PREFERRED_VIDEO_CODECS = ('avc1', 'vp09')
+DEFAULT_PROGRESS_INTERVAL_MS = 250
+PLAYLIST_BATCH_SIZE = 50
+THROUGHPUT_HALF_LIFE = 10.0
+JOURNAL_PATH = os.path.join(APP_DATA_DIR, 'queue_journal.sqlite3')
+JOURNAL_RETENTION_DAYS = 30
+UNFINISHED_JOB_STATES = ('queued', 'running')
+JOB_OUTCOMES = ('completed', 'failed', 'cancelled')
+LOG_FILE_NAME = 'download.log.jsonl'
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
+LOG_VIEW_MAX_LINES = 2000
+METRICS_DIR = os.path.join(APP_DATA_DIR, 'metrics')
+METRICS_MAX_JOBS = 500
+PROFILE_ENV_VAR = 'YTDL_PROFILE'
+PROFILE_DIR = os.path.join(APP_DATA_DIR, 'profiles')
+PROFILE_REPORT_TOP = 25
+TRACEMALLOC_FRAMES = 10
+STALL_THRESHOLD = 0.1
+MAX_RECORDED_STALLS = 200
+FFMPEG_PATH = shutil.which('ffmpeg') or 'ffmpeg'
+AUDIO_MODES = ('original', 'mp3')
+DEFAULT_AUDIO_MODE = 'original'
+OPUS_STREAM_EXTS = ('.webm', '.opus', '.ogg')
+MP3_BITRATE = '192k'
+DEFAULT_POSTPROCESS_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+ARCHIVE_PATH = os.path.join(APP_DATA_DIR, 'download_archive.sqlite3')
+DEFAULT_JOB_RETRIES = 4
+CANCEL_POLL_INTERVAL = 0.2
+FFMPEG_KILL_GRACE = 2.0
+SHUTDOWN_GRACE_SECONDS = 5.0
+PARTIAL_FILE_POLICIES = ('keep', 'delete')
+DEFAULT_PARTIAL_FILE_POLICY = 'keep'
+RETRY_BACKOFF_BASE = 2.0
+RETRY_BACKOFF_CAP = 60.0
+RATE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+RATE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:I?B)?(?:/S)?\s*$')
+SCHEDULE_RE = re.compile(r'^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*=\s*(.+)$')
+BANDWIDTH_BURST_SECONDS = 1.0
+MAX_THROTTLE_SLEEP = 0.5
+DEFAULT_MIN_FRAGMENT_THREADS = 1
+DEFAULT_MAX_FRAGMENT_THREADS = 8
+MAX_FRAGMENT_THREADS_LIMIT = 32
+FRAGMENT_THROUGHPUT_ALPHA = 0.3
+FRAGMENT_GAIN_THRESHOLD = 1.1
+FRAGMENT_LATENCY_PROBE = 0.5
+FRAGMENT_EXPLORE_EVERY = 8
+PERMANENT_ERROR_MARKERS = (
+    'private video', 'video unavailable', 'has been removed', 'copyright', 'members-only',
+    'confirm your age', 'not available in your country', 'requested format is not available',
+    'unsupported url', 'no video formats found', 'is not a valid url', 'has been terminated',
+    'finished without producing', 'postprocessing', 'ffmpeg',
+    # Checked before the transient markers, which match the 'unable to download' these come wrapped in
+    'http error 404', 'http error 410', 'http error 403: forbidden',
+)
+TRANSIENT_ERROR_MARKERS = (
+    'timed out', 'timeout', 'connection reset', 'connection aborted', 'connection refused',
+    'temporary failure', 'name resolution', 'network is unreachable', 'remote end closed',
+    'incomplete', 'eof occurred', 'http error 5', 'http error 429',
+    'unable to download', 'got error', 'read error', 'did not get any data',
+)
+
+LOGGER = logging.getLogger('youtube_downloader')
+
+ProgressRecord = namedtuple('ProgressRecord', 'job_id downloaded total speed eta fragments')
+
+class JsonLineFormatter(logging.Formatter):
+    """One JSON object per record: time, level, message and any `fields` passed via extra="""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class RetargetableFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotating file handler whose directory can be switched while the listener is running"""
+
+    def __init__(self, directory):
+        super().__init__(os.path.join(directory, LOG_FILE_NAME), maxBytes=LOG_FILE_MAX_BYTES,
+                         backupCount=LOG_FILE_BACKUPS, encoding='utf-8', delay=True)
+
+    def retarget(self, directory):
+        with self.lock:
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+            self.baseFilename = os.path.abspath(os.path.join(directory, LOG_FILE_NAME))
+
+    def emit(self, record):
+        if self.stream is None:
+            os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        super().emit(record)
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last `capacity` formatted lines and hands out the ones added since the last drain"""
+
+    def __init__(self, capacity=LOG_VIEW_MAX_LINES):
+        super().__init__()
+        self.lines = deque(maxlen=capacity)
+        self.fresh = deque(maxlen=capacity)
+        self.setFormatter(logging.Formatter('%(message)s'))
+
+    def emit(self, record):
+        line = self.format(record)
+        with self.lock:
+            self.lines.append(line)
+            self.fresh.append(line)
+
+    def history(self):
+        """Lines already handed out by drain(), for seeding a view that is created late"""
+        with self.lock:
+            lines = list(self.lines)
+            return lines[:len(lines) - len(self.fresh)]
+
+    def drain(self):
+        with self.lock:
+            lines = list(self.fresh)
+            self.fresh.clear()
+        return lines
+
+class LogPipeline:
+    """LOGGER -> QueueHandler -> background QueueListener -> JSONL file (+ optional ring buffer).
+
+    Callers only pay for a queue put; formatting and disk writes happen on the
+    listener thread.
+    """
+
+    def __init__(self, directory, ring_buffer=None):
+        self.file_handler = RetargetableFileHandler(directory)
+        self.file_handler.setFormatter(JsonLineFormatter())
+        handlers = [self.file_handler] + ([ring_buffer] if ring_buffer else [])
+        self.queue = queue.SimpleQueue()
+        self.queue_handler = logging.handlers.QueueHandler(self.queue)
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        LOGGER.setLevel(logging.INFO)
+        LOGGER.addHandler(self.queue_handler)
+        LOGGER.propagate = False
+        self.listener.start()
+
+    @property
+    def path(self):
+        return self.file_handler.baseFilename
+
+    def set_directory(self, directory):
+        self.file_handler.retarget(directory)
+
+    def close(self):
+        LOGGER.removeHandler(self.queue_handler)
+        self.listener.stop()
+        self.file_handler.close()
+
+def format_size(size_bytes):
+    """Format size in bytes to human-readable format"""
+    if size_bytes is None:
+        return "Unknown size"
+    
+    if size_bytes == 0:
+        return "0B"
+    
+    size_name = ("B", "KB", "MB", "GB", "TB")
+    i = int(math.floor(math.log(size_bytes, 1024)))
+    p = math.pow(1024, i)
+    s = round(size_bytes / p, 2)
+    return f"{s} {size_name[i]}"
+
+def format_eta(seconds):
+    if seconds is None:
+        return "Calculating..."
+    if seconds < 60:
+        return f"{seconds} sec"
+    elif seconds < 3600:
+        minutes = seconds // 60
+        seconds = seconds % 60
+        return f"{minutes} min {seconds} sec"
+    else:
+        hours = seconds // 3600
+        minutes = (seconds % 3600) // 60
+        seconds = seconds % 60
+        return f"{hours} hr {minutes} min {seconds} sec"
+
+def dated_download_dir(base_dir):
+    today = datetime.now().strftime('%Y-%m-%d')
+    download_dir = os.path.join(base_dir, today)
+    os.makedirs(download_dir, exist_ok=True)
+    return download_dir
+
+def parse_range_selection(selection, total_items):
+    selected_indices = set()
+    parts = selection.split(',')
+
+    for part in parts:
+        part = part.strip()
+        if '-' in part:
+            start, end = part.split('-')
+            try:
+                start = int(start.strip())
+                end = int(end.strip())
+                if 1 <= start <= total_items and 1 <= end <= total_items:
+                    selected_indices.update(range(min(start, end), max(start, end) + 1))
+            except ValueError:
+                pass
+        else:
+            try:
+                index = int(part)
+                if 1 <= index <= total_items:
+                    selected_indices.add(index)
+            except ValueError:
+                pass
+
+    return sorted(selected_indices)
+
+def load_yt_dlp():
+    # yt_dlp pulls in every extractor module, so it is imported on first use
+    # instead of at startup.
+    import yt_dlp
+    return yt_dlp
+
+def ydl_options(cookies, **extra):
+    """Build the yt-dlp option profile shared by every extraction and download"""
+    ydl_opts = {
+        'quiet': True,
+        'cookiefile': cookies if os.path.exists(cookies) else None,
+        'no_warnings': True,
+        'ignoreerrors': True
+    }
+    ydl_opts.update(extra)
+    return ydl_opts
+
+PER_DOWNLOAD_PARAMS = ('format', 'outtmpl', 'concurrent_fragment_downloads')
+
+class YDLSession:
+    """A long-lived YoutubeDL instance plus the per-job state it is borrowed with"""
+
+    def __init__(self, ydl_opts):
+        ydl_opts = dict(ydl_opts)
+        ydl_opts['progress_hooks'] = [self.dispatch_progress]
+        self.ydl = load_yt_dlp().YoutubeDL(ydl_opts)
+        self.progress_hook = None
+
+    def dispatch_progress(self, d):
+        if self.progress_hook:
+            self.progress_hook(d)
+
+    def extract_info(self, url, **kwargs):
+        return self.ydl.extract_info(url, download=False, **kwargs)
+
+    def download(self, url, format_spec, outtmpl, progress_hook=None, info=None, fragment_threads=None):
+        # Format, output template and fragment threads are the only per-job options,
+        # everything else (cookies, extractors, HTTP handlers) stays with the session.
+        # They are put back afterwards: the next borrower shares only the option profile.
+        params = self.ydl.params
+        saved = {key: params[key] for key in PER_DOWNLOAD_PARAMS if key in params}
+        saved_selector = self.ydl.format_selector
+        params['format'] = format_spec
+        params['outtmpl'] = {'default': outtmpl}
+        if fragment_threads:
+            params['concurrent_fragment_downloads'] = fragment_threads
+        self.ydl.format_selector = self.ydl.build_format_selector(format_spec)
+        self.progress_hook = progress_hook
+        try:
+            if info is not None:
+                return self.ydl.process_ie_result(info, download=True)
+            return self.ydl.extract_info(url, download=True)
+        finally:
+            self.progress_hook = None
+            for key in PER_DOWNLOAD_PARAMS:
+                params.pop(key, None)
+            params.update(saved)
+            self.ydl.format_selector = saved_selector
+
+    def close(self):
+        try:
+            self.ydl.close()
+        except Exception:
+            pass
+
+class YDLSessionPool:
+    """Hands out YDLSessions keyed by option profile, one borrower at a time"""
+
+    def __init__(self, max_idle_per_profile=MAX_IDLE_SESSIONS_PER_PROFILE):
+        self.max_idle_per_profile = max_idle_per_profile
+        self.idle = {}
+        self.lock = threading.Lock()
+        self.closed = False
+
+    @staticmethod
+    def profile_key(ydl_opts):
+        return json.dumps(ydl_opts, sort_keys=True, default=str)
+
+    @contextmanager
+    def session(self, ydl_opts):
+        key = self.profile_key(ydl_opts)
+        with self.lock:
+            idle = self.idle.get(key)
+            session = idle.pop() if idle else None
+        if session is None:
+            session = YDLSession(ydl_opts)
+        try:
+            yield session
+        finally:
+            self.release(key, session)
+
+    def release(self, key, session):
+        with self.lock:
+            idle = self.idle.setdefault(key, [])
+            if not self.closed and len(idle) < self.max_idle_per_profile:
+                idle.append(session)
+                return
+        session.close()
+
+    def close_all(self):
+        with self.lock:
+            self.closed = True
+            sessions = [session for idle in self.idle.values() for session in idle]
+            self.idle.clear()
+        for session in sessions:
+            session.close()
+
+YDL_SESSIONS = YDLSessionPool()
+
+def unselected_info(info):
+    """Copy of a processed info_dict without the format selection yt-dlp merged into it.
+
+    Processing it again with another format spec would otherwise inherit the old
+    selection: a leftover requested_formats makes 'bestaudio' download video+audio.
+    """
+    return {k: v for k, v in info.items() if k not in SELECTED_FORMAT_KEYS}
+
+def video_id_from_url(url):
+    match = VIDEO_ID_RE.search(url or '')
+    return match.group(1) if match else None
+
+class MetadataCache:
+    """SQLite-backed info_dict cache keyed by video_id.
+
+    Titles, durations and format lists stay valid for metadata_ttl; the signed
+    stream URLs inside the formats expire much sooner, so lookups that are
+    going to download (need_streams=True) use the shorter stream_ttl.
+    """
+
+    def __init__(self, path, metadata_ttl_hours=DEFAULT_METADATA_TTL_HOURS,
+                 stream_ttl_hours=DEFAULT_STREAM_URL_TTL_HOURS):
+        self.path = path
+        self.metadata_ttl = metadata_ttl_hours * 3600
+        self.stream_ttl = stream_ttl_hours * 3600
+        self.lock = threading.Lock()
+        self.conn = None
+        self.hits = 0
+        self.misses = 0
+
+    def connect(self):
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS video_info ("
+                "video_id TEXT PRIMARY KEY, fetched_at REAL NOT NULL, info TEXT NOT NULL)"
+            )
+            self.conn.execute("DELETE FROM video_info WHERE fetched_at < ?", (time.time() - self.metadata_ttl,))
+            self.conn.commit()
+        return self.conn
+
+    def get(self, video_id, need_streams=False):
+        if not video_id:
+            return None
+        with self.lock:
+            row = self.connect().execute(
+                "SELECT fetched_at, info FROM video_info WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            ttl = self.stream_ttl if need_streams else self.metadata_ttl
+            if row is None or time.time() - row[0] > ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[1])
+
+    def put(self, info):
+        video_id = info.get('id') if info else None
+        if not video_id or info.get('_type', 'video') != 'video':
+            return
+        # Only what the extractor returned is cached; formats are selected again on every use
+        info = unselected_info(load_yt_dlp().YoutubeDL.sanitize_info(info))
+        info = {k: v for k, v in info.items() if k not in UNCACHED_INFO_KEYS}
+        payload = json.dumps(info)
+        with self.lock:
+            self.connect().execute(
+                "INSERT OR REPLACE INTO video_info (video_id, fetched_at, info) VALUES (?, ?, ?)",
+                (video_id, time.time(), payload)
+            )
+            self.conn.commit()
+
+    def set_ttls(self, metadata_ttl_hours, stream_ttl_hours):
+        self.metadata_ttl = metadata_ttl_hours * 3600
+        self.stream_ttl = stream_ttl_hours * 3600
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats_text(self):
+        lookups = self.hits + self.misses
+        return f"Metadata cache: {self.hits}/{lookups} hits ({self.hit_rate():.0%})"
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+METADATA_CACHE = MetadataCache(os.path.join(APP_DATA_DIR, 'metadata_cache.sqlite3'))
+
+def extract_video_info(cookies, url, video_id=None):
+    video_id = video_id or video_id_from_url(url)
+    info = METADATA_CACHE.get(video_id)
+    if info is None:
+        with YDL_SESSIONS.session(ydl_options(cookies)) as session:
+            info = session.extract_info(url)
+        METADATA_CACHE.put(info)
+    return info
+
+class Metrics:
+    """Phase timings per job plus running count/sum/max per phase, exportable as JSON and Prometheus text.
+
+    Phases of one job that happen more than once (a finalize step in two
+    places, say) accumulate. Only the most recent METRICS_MAX_JOBS jobs are kept.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()
+        self.summaries = {}
+        self.counters = Counter()
+        self.started = time.time()
+
+    @contextmanager
+    def timed(self, name, job_id=None):
+        started_at = time.time()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, job_id, started_at)
+
+    def observe(self, name, seconds, job_id=None, started_at=None):
+        with self.lock:
+            summary = self.summaries.setdefault(name, [0, 0.0, 0.0])
+            summary[0] += 1
+            summary[1] += seconds
+            summary[2] = max(summary[2], seconds)
+            if job_id is not None:
+                self.add_phase(job_id, name, seconds, started_at)
+
+    def add_phase(self, job_id, name, seconds, started_at=None):
+        record = self.job_record(job_id)
+        phase = record['phases'].setdefault(name, {'started_at': started_at, 'seconds': 0.0})
+        phase['seconds'] = round(phase['seconds'] + seconds, 4)
+
+    def job_record(self, job_id):
+        record = self.jobs.get(job_id)
+        if record is None:
+            record = self.jobs[job_id] = {'job_id': job_id, 'phases': {}}
+            while len(self.jobs) > METRICS_MAX_JOBS:
+                self.jobs.popitem(last=False)
+        return record
+
+    def start_job(self, item):
+        with self.lock:
+            record = self.job_record(item['job_id'])
+            record.update(title=item.get('title'), video_id=item.get('video_id'), started_at=time.time())
+            if item.get('extraction_seconds') is not None:
+                # Already counted in the summary when the item was resolved
+                self.add_phase(item['job_id'], 'extraction', item['extraction_seconds'])
+
+    def finish_job(self, job_id, outcome, downloaded_bytes=None):
+        with self.lock:
+            record = self.job_record(job_id)
+            record.update(outcome=outcome, finished_at=time.time())
+            self.counters[f'jobs_{outcome}'] += 1
+            if downloaded_bytes:
+                record['bytes'] = downloaded_bytes
+                self.counters['downloaded_bytes'] += downloaded_bytes
+                download = record['phases'].get('download')
+                if download and download['seconds'] > 0:
+                    record['throughput'] = round(downloaded_bytes / download['seconds'])
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'generated_at': datetime.now().isoformat(timespec='seconds'),
+                'uptime_seconds': round(time.time() - self.started, 1),
+                'phases': {name: {'count': c, 'sum_seconds': round(total, 4), 'max_seconds': round(peak, 4),
+                                  'mean_seconds': round(total / c, 4) if c else 0}
+                           for name, (c, total, peak) in self.summaries.items()},
+                'counters': dict(self.counters),
+                'jobs': [json.loads(json.dumps(record)) for record in self.jobs.values()],
+            }
+
+    def prometheus_text(self):
+        with self.lock:
+            summaries = dict(self.summaries)
+            counters = dict(self.counters)
+        lines = [
+            "# HELP ytdl_phase_seconds Time spent in each job phase or background operation.",
+            "# TYPE ytdl_phase_seconds summary",
+        ]
+        for name, (c, total, _) in sorted(summaries.items()):
+            lines.append(f'ytdl_phase_seconds_count{{phase="{name}"}} {c}')
+            lines.append(f'ytdl_phase_seconds_sum{{phase="{name}"}} {total:.6f}')
+        lines += ["# HELP ytdl_phase_seconds_max Longest single observation per phase.",
+                  "# TYPE ytdl_phase_seconds_max gauge"]
+        for name, (_, _, peak) in sorted(summaries.items()):
+            lines.append(f'ytdl_phase_seconds_max{{phase="{name}"}} {peak:.6f}')
+        lines += ["# HELP ytdl_downloaded_bytes_total Bytes of media downloaded.",
+                  "# TYPE ytdl_downloaded_bytes_total counter",
+                  f"ytdl_downloaded_bytes_total {counters.pop('downloaded_bytes', 0)}",
+                  "# HELP ytdl_jobs_total Finished jobs by outcome.",
+                  "# TYPE ytdl_jobs_total counter"]
+        for name in sorted(k for k in counters if k.startswith('jobs_')):
+            lines.append(f'ytdl_jobs_total{{outcome="{name[5:]}"}} {counters.pop(name)}')
+        lines += ["# HELP ytdl_events_total Other counted events.", "# TYPE ytdl_events_total counter"]
+        for name, value in sorted(counters.items()):
+            lines.append(f'ytdl_events_total{{event="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory=METRICS_DIR):
+        """Write stats.json and downloader.prom atomically (the .prom suits a node_exporter textfile collector)"""
+        os.makedirs(directory, exist_ok=True)
+        for name, text in (('stats.json', json.dumps(self.snapshot(), indent=2)),
+                           ('downloader.prom', self.prometheus_text())):
+            path = os.path.join(directory, name)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(path + '.tmp', path)
+
+METRICS = Metrics()
+
+def profiling_requested():
+    return os.environ.get(PROFILE_ENV_VAR, '').strip().lower() not in ('', '0', 'false', 'no', 'off')
+
+class Profiler:
+    """Opt-in profiling session: cProfile, tracemalloc, section wall times and event-loop stalls.
+
+    Nothing is measured until start(); until then section() and @profiled cost
+    one attribute check. The main thread is profiled for the whole session.
+    Each outermost section on another thread gets its own cProfile, merged per
+    section name. On Python 3.12+ a profiler already sees every thread, so only
+    the session one is used.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.started_at = None
+        self.session_profile = None
+        self.sections = {}
+        self.section_profiles = {}
+        self.running = {}
+        self.stalls = deque(maxlen=MAX_RECORDED_STALLS)
+        self.stall_summary = [0, 0.0, 0.0]
+        self.heartbeat_interval = None
+        self.last_beat = None
+        self.stall_culprit = None
+        self.main_thread_id = None
+        self.watchdog = None
+        self.owns_tracemalloc = False
+
+    def start(self):
+        with self.lock:
+            if self.enabled:
+                return
+            self.reset()
+            self.started_at = datetime.now()
+            self.session_profile = cProfile.Profile()
+            try:
+                self.session_profile.enable()
+            except ValueError:
+                # Another profiler (a debugger, an outer cProfile run) got there first
+                self.session_profile = None
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                self.owns_tracemalloc = True
+            self.enabled = True
+
+    def stop(self, directory=PROFILE_DIR):
+        """End the session and write its dumps; returns the session directory (None if not running)"""
+        with self.lock:
+            if not self.enabled:
+                return None
+            self.enabled = False
+            if self.session_profile is not None:
+                self.session_profile.disable()
+        snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        current, peak = tracemalloc.get_traced_memory() if snapshot else (0, 0)
+        if self.owns_tracemalloc:
+            tracemalloc.stop()
+        path = os.path.join(directory, self.started_at.strftime('%Y%m%d-%H%M%S'))
+        os.makedirs(path, exist_ok=True)
+        if self.session_profile is not None:
+            self.session_profile.dump_stats(os.path.join(path, 'session.prof'))
+        with self.lock:
+            profiles = dict(self.section_profiles)
+        for name, stats in profiles.items():
+            stats.dump_stats(os.path.join(path, re.sub(r'[^0-9A-Za-z_.-]', '_', name) + '.prof'))
+
+        report = self.report()
+        report['memory'] = {'current_bytes': current, 'peak_bytes': peak, 'top_allocations': [
+            {'where': str(stat.traceback[0]), 'size_bytes': stat.size, 'count': stat.count}
+            for stat in (snapshot.statistics('lineno')[:PROFILE_REPORT_TOP] if snapshot else [])
+        ]}
+        with open(os.path.join(path, 'report.json'), 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        with open(os.path.join(path, 'report.txt'), 'w', encoding='utf-8') as f:
+            f.write(self.report_text(report))
+            if self.session_profile is not None:
+                f.write("\nSession profile, by cumulative time:\n")
+                pstats.Stats(self.session_profile, stream=f).sort_stats('cumulative').print_stats(PROFILE_REPORT_TOP)
+        return path
+
+    @contextmanager
+    def section(self, name):
+        if not self.enabled:
+            yield
+            return
+        stack = self.running.setdefault(threading.get_ident(), [])
+        profile = None
+        if not stack and threading.current_thread() is not threading.main_thread():
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                profile = None
+        stack.append(name)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - t0
+            stack.pop()
+            if profile is not None:
+                profile.disable()
+            with self.lock:
+                summary = self.sections.setdefault(name, [0, 0.0, 0.0])
+                summary[0] += 1
+                summary[1] += seconds
+                summary[2] = max(summary[2], seconds)
+                if profile is not None:
+                    if name in self.section_profiles:
+                        self.section_profiles[name].add(profile)
+                    else:
+                        self.section_profiles[name] = pstats.Stats(profile)
+
+    def watch_stalls(self, interval):
+        """Expect heartbeat() every interval seconds from the event loop; longer gaps are stalls"""
+        self.heartbeat_interval = interval
+        self.last_beat = time.monotonic()
+        self.main_thread_id = threading.get_ident()
+        self.watchdog = threading.Thread(target=self.watch, name="stall-watchdog", daemon=True)
+        self.watchdog.start()
+
+    def heartbeat(self):
+        if not self.enabled or self.last_beat is None:
+            return
+        now = time.monotonic()
+        stall = now - self.last_beat - self.heartbeat_interval
+        self.last_beat = now
+        culprit, self.stall_culprit = self.stall_culprit, None
+        if stall < STALL_THRESHOLD:
+            return
+        with self.lock:
+            self.stall_summary[0] += 1
+            self.stall_summary[1] += stall
+            self.stall_summary[2] = max(self.stall_summary[2], stall)
+            self.stalls.append(dict(culprit or {}, seconds=round(stall, 4),
+                                    at=datetime.now().isoformat(timespec='milliseconds')))
+
+    def watch(self):
+        # Runs beside the event loop; while it is late, note what the GUI thread is doing
+        while self.enabled:
+            time.sleep(STALL_THRESHOLD / 2)
+            late = time.monotonic() - self.last_beat - self.heartbeat_interval
+            if late < STALL_THRESHOLD or self.stall_culprit is not None:
+                continue
+            frame = sys._current_frames().get(self.main_thread_id)
+            stack = self.running.get(self.main_thread_id) or []
+            self.stall_culprit = {
+                'handler': stack[-1] if stack else None,
+                'stack': traceback.format_stack(frame)[-6:] if frame else [],
+            }
+
+    def report(self):
+        with self.lock:
+            sections = sorted(self.sections.items(), key=lambda kv: kv[1][1], reverse=True)
+            count, total, peak = self.stall_summary
+            stalls = sorted(self.stalls, key=lambda stall: stall['seconds'], reverse=True)
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds') if self.started_at else None,
+            'sections': [{'name': name, 'count': c, 'total_seconds': round(t, 4),
+                          'mean_seconds': round(t / c, 5), 'max_seconds': round(m, 4)}
+                         for name, (c, t, m) in sections],
+            'stalls': {'count': count, 'total_seconds': round(total, 3), 'max_seconds': round(peak, 3),
+                       'threshold_seconds': STALL_THRESHOLD, 'worst': stalls[:PROFILE_REPORT_TOP]},
+        }
+
+    def slowest(self, limit=5):
+        """'name: max/total' lines for the sections with the longest single call"""
+        with self.lock:
+            worst = sorted(self.sections.items(), key=lambda kv: kv[1][2], reverse=True)[:limit]
+        return [f"{name}: max {peak * 1000:.0f} ms, {c} calls, {total:.2f} s total"
+                for name, (c, total, peak) in worst]
+
+    @staticmethod
+    def report_text(report):
+        lines = [f"Profiling session started {report['started_at']}", "", "Sections by total time:"]
+        for section in report['sections'][:PROFILE_REPORT_TOP]:
+            lines.append(f"  {section['name']:<50} {section['count']:>7} calls  {section['total_seconds']:>9.3f} s"
+                         f"  mean {section['mean_seconds'] * 1000:>8.2f} ms  max {section['max_seconds'] * 1000:>8.1f} ms")
+        stalls = report['stalls']
+        lines += ["", f"Event-loop stalls over {stalls['threshold_seconds'] * 1000:.0f} ms: {stalls['count']}, "
+                      f"{stalls['total_seconds']:.2f} s in total, longest {stalls['max_seconds'] * 1000:.0f} ms"]
+        for stall in stalls['worst'][:10]:
+            lines.append(f"  {stall['seconds'] * 1000:>8.0f} ms at {stall['at']} in {stall.get('handler') or '?'}")
+        memory = report.get('memory')
+        if memory:
+            lines += ["", f"Traced memory: {format_size(memory['current_bytes'])} now, "
+                          f"{format_size(memory['peak_bytes'])} peak"]
+            for alloc in memory['top_allocations'][:10]:
+                lines.append(f"  {format_size(alloc['size_bytes']):>10} in {alloc['count']:>7} blocks  {alloc['where']}")
+        return "\n".join(lines) + "\n"
+
+PROFILER = Profiler()
+
+def profiled(fn):
+    """Time (and, in a profiling session, cProfile) every call of fn as a section named after it"""
+    name = fn.__qualname__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not PROFILER.enabled:
+            return fn(*args, **kwargs)
+        with PROFILER.section(name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+class ProgressBoard:
+    """Latest ProgressRecord per job, written by workers and drained by the GUI timer"""
+
+    def __init__(self, interval_ms=DEFAULT_PROGRESS_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.records = {}
+        self.lock = threading.Lock()
+
+    def post(self, record):
+        with self.lock:
+            self.records[record.job_id] = record
+
+    def drain(self):
+        with self.lock:
+            records, self.records = self.records, {}
+        return records
+
+class ThroughputMeter:
+    """Exponentially weighted aggregate download speed, decaying by half every `half_life` seconds.
+
+    The last estimate is kept while nothing is downloading so an idle queue
+    still gets an ETA based on how fast the link was recently.
+    """
+
+    def __init__(self, half_life=THROUGHPUT_HALF_LIFE):
+        self.half_life = half_life
+        self.rate = None
+        self.stamp = None
+
+    def update(self, bytes_per_second):
+        now = time.monotonic()
+        if self.rate is None:
+            self.rate = bytes_per_second
+        else:
+            weight = 1 - 0.5 ** ((now - self.stamp) / self.half_life)
+            self.rate += weight * (bytes_per_second - self.rate)
+        self.stamp = now
+
+    def eta(self, remaining_bytes):
+        if not self.rate or remaining_bytes <= 0:
+            return None
+        return remaining_bytes / self.rate
+
+def parse_rate(text):
+    """Parse '500K', '2M', '1.5MB/s' or a plain byte count into bytes/s; 0 or '' means unlimited"""
+    if text is None or not str(text).strip():
+        return 0
+    match = RATE_RE.match(str(text).upper())
+    if not match:
+        raise ValueError(f"Invalid rate: {text!r} (use e.g. 500K or 2M)")
+    return int(float(match.group(1)) * RATE_UNITS[match.group(2)])
+
+def parse_schedule(text):
+    """Parse 'HH:MM-HH:MM=RATE, ...' into [(start_minute, end_minute, bytes_per_second)]
+
+    A window whose end is before its start wraps past midnight.
+    """
+    windows = []
+    for part in (text or '').split(','):
+        if not part.strip():
+            continue
+        match = SCHEDULE_RE.match(part)
+        if not match:
+            raise ValueError(f"Invalid schedule window: {part.strip()!r} (use e.g. 09:00-18:00=1M)")
+        h1, m1, h2, m2, rate = match.groups()
+        windows.append((int(h1) * 60 + int(m1), int(h2) * 60 + int(m2), parse_rate(rate)))
+    return windows
+
+class TokenBucket:
+    """Byte budget refilled at `rate` bytes/s; callers may overdraw and then sleep off the debt"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate * BANDWIDTH_BURST_SECONDS
+        self.stamp = time.monotonic()
+
+    def take(self, nbytes, rate):
+        now = time.monotonic()
+        if rate != self.rate:
+            self.rate = rate
+            self.tokens = min(self.tokens, rate * BANDWIDTH_BURST_SECONDS)
+        self.tokens = min(rate * BANDWIDTH_BURST_SECONDS, self.tokens + (now - self.stamp) * rate)
+        self.stamp = now
+        self.tokens -= nbytes
+        return -self.tokens / rate if self.tokens < 0 else 0
+
+class BandwidthGovernor:
+    """Token-bucket rate limit shared by every download thread.
+
+    Workers report the bytes they just received through consume() from their
+    progress hook and are made to sleep until the global bucket (and their own
+    per-job bucket, if jobs are capped) can cover them. All limits are read on every call,
+    so changing them takes effect on running downloads immediately.
+    """
+
+    def __init__(self):
+        self.global_rate = 0
+        self.default_job_rate = 0
+        self.schedule = []
+        self.global_bucket = None
+        self.job_buckets = {}
+        self.lock = threading.Lock()
+
+    def set_global_rate(self, rate):
+        self.global_rate = max(0, int(rate))
+
+    def set_default_job_rate(self, rate):
+        self.default_job_rate = max(0, int(rate))
+
+    def set_schedule(self, windows):
+        self.schedule = list(windows)
+
+    def current_global_rate(self):
+        if self.schedule:
+            now = time.localtime()
+            minute = now.tm_hour * 60 + now.tm_min
+            for start, end, rate in self.schedule:
+                if start <= minute < end if start <= end else (minute >= start or minute < end):
+                    return rate
+        return self.global_rate
+
+    def describe(self):
+        rate = self.current_global_rate()
+        text = f"Limit: {format_size(rate)}/s" if rate else "Limit: unlimited"
+        if self.default_job_rate:
+            text += f", {format_size(self.default_job_rate)}/s per job"
+        return text
+
+    def consume(self, job_id, nbytes, cancel_event=None):
+        if nbytes <= 0:
+            return
+        global_rate = self.current_global_rate()
+        job_rate = self.default_job_rate
+        delay = 0
+        with self.lock:
+            if global_rate:
+                if self.global_bucket is None:
+                    self.global_bucket = TokenBucket(global_rate)
+                delay = self.global_bucket.take(nbytes, global_rate)
+            if job_rate:
+                bucket = self.job_buckets.get(job_id)
+                if bucket is None:
+                    bucket = self.job_buckets[job_id] = TokenBucket(job_rate)
+                delay = max(delay, bucket.take(nbytes, job_rate))
+        # Sleep in short steps so a lowered or lifted limit is noticed quickly
+        while delay > 0:
+            step = min(delay, MAX_THROTTLE_SLEEP)
+            if cancel_event is None:
+                time.sleep(step)
+            elif cancel_event.wait(step):
+                break
+            delay -= step
+            if not (self.current_global_rate() or self.default_job_rate):
+                break
+
+    def forget(self, job_id):
+        with self.lock:
+            self.job_buckets.pop(job_id, None)
+
+BANDWIDTH = BandwidthGovernor()
+
+class FragmentTuner:
+    """Picks yt-dlp's concurrent_fragment_downloads from the throughput it produced before.
+
+    Every finished DASH/HLS stream reports (threads used, bytes/s, seconds per
+    fragment per thread). Throughput is kept as an EWMA per thread count, and the
+    smallest count within FRAGMENT_GAIN_THRESHOLD of the best is chosen, so extra
+    connections have to earn their keep. An unexplored higher level is probed while
+    fragments are slow to arrive (latency-bound), and a neighbouring level is
+    re-probed every FRAGMENT_EXPLORE_EVERY choices so old figures do not go stale.
+    """
+
+    def __init__(self, minimum=DEFAULT_MIN_FRAGMENT_THREADS, maximum=DEFAULT_MAX_FRAGMENT_THREADS):
+        self.throughput = {}
+        self.fragment_seconds = 0
+        self.choices = 0
+        self.lock = threading.Lock()
+        self.set_bounds(minimum, maximum)
+
+    def set_bounds(self, minimum, maximum):
+        minimum = max(1, min(int(minimum), MAX_FRAGMENT_THREADS_LIMIT))
+        self.minimum, self.maximum = minimum, max(minimum, min(int(maximum), MAX_FRAGMENT_THREADS_LIMIT))
+
+    def clamp(self, threads):
+        return max(self.minimum, min(self.maximum, threads))
+
+    def record(self, threads, throughput, fragment_seconds):
+        if threads <= 0 or throughput <= 0:
+            return
+        with self.lock:
+            previous = self.throughput.get(threads)
+            self.throughput[threads] = throughput if previous is None else (
+                FRAGMENT_THROUGHPUT_ALPHA * throughput + (1 - FRAGMENT_THROUGHPUT_ALPHA) * previous)
+            self.fragment_seconds = fragment_seconds
+
+    def choose(self):
+        if self.minimum == self.maximum:
+            return self.minimum
+        with self.lock:
+            self.choices += 1
+            known = {n: bps for n, bps in self.throughput.items() if self.minimum <= n <= self.maximum}
+            if not known:
+                return self.clamp(4)
+            peak = max(known.values())
+            best = min(n for n, bps in known.items() if bps * FRAGMENT_GAIN_THRESHOLD >= peak)
+            up, down = self.clamp(best * 2), self.clamp(best // 2)
+            if up not in known and self.fragment_seconds > FRAGMENT_LATENCY_PROBE:
+                return up
+            if self.choices % FRAGMENT_EXPLORE_EVERY == 0:
+                return random.choice([up, down])
+            return best
+
+FRAGMENT_TUNER = FragmentTuner()
+
+class StreamSample:
+    """Throughput and fragment pacing of the stream a DownloadJob is currently receiving"""
+
+    def __init__(self, filename, threads, downloaded):
+        self.filename = filename
+        self.threads = threads
+        self.start_bytes = downloaded
+        self.started = time.monotonic()
+        self.first_fragment = None
+        self.fragments = 0
+
+    def update(self, d):
+        index = d.get('fragment_index')
+        if index is None:
+            return
+        if self.first_fragment is None:
+            self.first_fragment = index
+        self.fragments = index - self.first_fragment
+
+    def report(self, downloaded):
+        # Only fragmented streams are affected by the thread count
+        elapsed = time.monotonic() - self.started
+        if self.fragments <= 0 or elapsed <= 0:
+            return
+        FRAGMENT_TUNER.record(self.threads, (downloaded - self.start_bytes) / elapsed,
+                              elapsed * self.threads / self.fragments)
+
+
+CODEC_FAMILY_CACHE = {None: None, 'none': None}
+
+def codec_family(codec):
+    # Codec strings repeat across thousands of formats, so each is classified once
+    family = CODEC_FAMILY_CACHE.get(codec, False)
+    if family is not False:
+        return family
+    if codec.startswith(AAC_CODEC_PREFIXES):
+        family = 'aac'
+    else:
+        family = next((f for f in VIDEO_CODEC_FAMILIES if codec.startswith(f)), codec.split('.', 1)[0])
+    CODEC_FAMILY_CACHE[codec] = family
+    return family
+
+def select_formats(formats, language=None, families=PREFERRED_VIDEO_CODECS):
+    """Every format-selection policy answered from one pass over an info_dict's formats.
+
+    Returns (best_audio, best_video, resolutions): the highest-abr AAC audio-only
+    format, preferring the given (original) language; the tallest video-only format
+    of the first family in `families` that has one; and [(height, format)] tallest
+    first, the first listed format of any of `families` per height.
+    """
+    audio = audio_in_language = None
+    audio_abr = language_abr = -1
+    video_only = {}
+    by_height = {}
+    # Inlined codec_family() cache hits: this loop runs once per format of every resolved video
+    family_of = CODEC_FAMILY_CACHE.get
+    for f in formats or ():
+        vcodec = f.get('vcodec')
+        if vcodec == 'none' or vcodec is None:
+            acodec = f.get('acodec')
+            afamily = family_of(acodec, False)
+            if afamily is False:
+                afamily = codec_family(acodec)
+            if afamily != 'aac':
+                continue
+            abr = f.get('abr') or 0
+            if abr > audio_abr:
+                audio, audio_abr = f, abr
+            if abr > language_abr and language and f.get('language') == language:
+                audio_in_language, language_abr = f, abr
+            continue
+        height = f.get('height')
+        if not height:
+            continue
+        vfamily = family_of(vcodec, False)
+        if vfamily is False:
+            vfamily = codec_family(vcodec)
+        if vfamily not in families:
+            continue
+        by_height.setdefault(height, f)
+        acodec = f.get('acodec')
+        if acodec == 'none' or acodec is None:
+            best = video_only.get(vfamily)
+            if best is None or height > best['height']:
+                video_only[vfamily] = f
+    best_video = next((video_only[family] for family in families if family in video_only), None)
+    resolutions = [(height, by_height[height]) for height in sorted(by_height, reverse=True)]
+    return audio_in_language or audio, best_video, resolutions
+
+def video_codec_key(video_format):
+    return 'avc1' if 'avc1' in video_format['vcodec'] else 'vp9'
+
+def estimate_format_size(f, duration=None):
+    """Bytes for a format: exact filesize, else yt-dlp's approximation, else bitrate x duration"""
+    if not f:
+        return None
+    size = f.get('filesize') or f.get('filesize_approx')
+    if size:
+        return int(size)
+    bitrate = f.get('tbr') or ((f.get('vbr') or 0) + (f.get('abr') or 0))
+    duration = f.get('duration') or duration
+    if bitrate and duration:
+        # tbr/vbr/abr are in kbit/s
+        return int(bitrate * 1000 / 8 * duration)
+    return None
+
+def estimate_item_size(video_format, audio_format, duration=None):
+    sizes = [estimate_format_size(f, duration) for f in (video_format, audio_format) if f]
+    if not sizes or None in sizes:
+        return sum(size for size in sizes if size) or None
+    return sum(sizes)
+
+def build_download_item(info, url, position, audio_only=False, audio_mode=DEFAULT_AUDIO_MODE):
+    best_audio, best_video, _ = select_formats(info.get('formats'), info.get('language'))
+    if not best_audio:
+        return None
+
+    item = {
+        'url': url,
+        'title': info.get('title', f"Video {position}"),
+        'thumbnail': info.get('thumbnail', ''),
+        'video_id': info.get('id', f'vid_{position}'),
+        'uploader': info.get('uploader') or info.get('channel')
+    }
+    if audio_only:
+        item['audio_only'] = True
+        item['audio_format'] = best_audio
+        item['audio_mode'] = audio_mode
+        item['estimated_size'] = estimate_item_size(None, best_audio, info.get('duration'))
+        return item
+
+    if not best_video:
+        return None
+    item['video_res'] = best_video['height']
+    item['video_codec'] = video_codec_key(best_video)
+    item['audio_abr'] = best_audio['abr']
+    item['estimated_size'] = estimate_item_size(best_video, best_audio, info.get('duration'))
+    return item
+
+@profiled
+def resolve_item(cookies, url, position, video_id=None, audio_only=False):
+    t0 = time.perf_counter()
+    info = extract_video_info(cookies, url, video_id)
+    if not info:
+        return None
+    item = build_download_item(info, url, position, audio_only)
+    seconds = time.perf_counter() - t0
+    METRICS.observe('extraction', seconds)
+    if item is not None:
+        item['extraction_seconds'] = round(seconds, 4)
+    return item
+
+def resolve_in_order(resolve, jobs, max_workers=DEFAULT_EXTRACTION_WORKERS,
+                     on_progress=None, on_error=None, is_cancelled=None):
+    """Run resolve(*job) for every job on a bounded pool.
+
+    Results come back in the order of jobs with failures and empty results
+    dropped; None is returned if is_cancelled() turns true part way through.
+    """
+    total = len(jobs)
+    results = [None] * total
+    cancelled = False
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, total)))
+    try:
+        futures = {executor.submit(resolve, *job): i for i, job in enumerate(jobs)}
+        pending = set(futures)
+        done = 0
+        while pending:
+            # Polled rather than blocking on the next result, so a cancel is
+            # noticed even while every worker is stuck in a slow extraction
+            finished, pending = wait_futures(pending, CANCEL_POLL_INTERVAL, FIRST_COMPLETED)
+            if is_cancelled and is_cancelled():
+                cancelled = True
+                return None
+            for future in finished:
+                done += 1
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    if on_error:
+                        on_error(jobs[i], e)
+                if on_progress:
+                    on_progress(done, total)
+    finally:
+        executor.shutdown(wait=not cancelled, cancel_futures=True)
+    return [result for result in results if result]
+
+def resolve_urls(cookies, urls, max_workers=DEFAULT_EXTRACTION_WORKERS, audio_only=False, **callbacks):
+    jobs = [(cookies, url, i + 1, None, audio_only) for i, url in enumerate(urls)]
+    return resolve_in_order(resolve_item, jobs, max_workers, **callbacks)
+
+def resolve_playlist_entries(cookies, entries, selected_indices, max_workers=DEFAULT_EXTRACTION_WORKERS,
+                             audio_only=False, **callbacks):
+    jobs = [
+        (cookies, entries[idx-1]['url'], idx, entries[idx-1].get('id'), audio_only)
+        for idx in selected_indices if entries[idx-1].get('url')
+    ]
+    return resolve_in_order(resolve_item, jobs, max_workers, **callbacks)
+
+def list_playlist(cookies, url):
+    with YDL_SESSIONS.session(ydl_options(cookies, extract_flat=True)) as session:
+        return session.extract_info(url)
+
+def paged_entries(paged_list):
+    index = 0
+    while True:
+        try:
+            yield paged_list[index]
+        except IndexError:
+            return
+        index += 1
+
+def iter_playlist(cookies, url, batch_size=PLAYLIST_BATCH_SIZE, is_cancelled=lambda: False):
+    """Enumerate a playlist lazily, yielding (playlist_info, entries) one batch at a time.
+
+    Uses process=False so yt-dlp hands back its paged entry generator instead of
+    walking every page first; the first batch arrives after the first page.
+    """
+    with YDL_SESSIONS.session(ydl_options(cookies, extract_flat='in_playlist')) as session:
+        info = session.extract_info(url, process=False)
+        # Watch-page links with a list= parameter come back as a redirect first
+        for _ in range(3):
+            if not info or info.get('_type') not in ('url', 'url_transparent'):
+                break
+            info = session.ydl.extract_info(info['url'], download=False, process=False,
+                                            ie_key=info.get('ie_key'))
+        if not info or 'entries' not in info:
+            return
+        playlist_info = {k: v for k, v in info.items() if k != 'entries'}
+        entries = info['entries']
+        if hasattr(entries, 'getslice'):
+            # PagedList.getslice() is eager; indexing fetches (and caches) one page at a time
+            entries = paged_entries(entries)
+        batch = []
+        for entry in entries:
+            if is_cancelled():
+                return
+            if not entry:
+                continue
+            if 'url' not in entry and entry.get('id'):
+                entry['url'] = f"https://www.youtube.com/watch?v={entry['id']}"
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                yield playlist_info, batch
+                batch = []
+        if batch:
+            yield playlist_info, batch
+
+class DownloadCancelled(Exception):
+    """Raised inside a job (from yt-dlp's progress hook or around ffmpeg) to abort it on cancel"""
+
+def call_cancellable(fn, *args, is_cancelled, poll=CANCEL_POLL_INTERVAL):
+    """Run fn(*args) on a daemon thread, raising DownloadCancelled as soon as is_cancelled() turns true.
+
+    A yt-dlp extraction cannot be interrupted from outside, so an abandoned call
+    finishes (or hits its socket timeout) in the background and its result is dropped.
+    """
+    outcome = {}
+    done = threading.Event()
+
+    def target():
+        try:
+            outcome['result'] = fn(*args)
+        except BaseException as e:
+            outcome['error'] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=target, name="cancellable-call", daemon=True).start()
+    while not done.wait(poll):
+        if is_cancelled():
+            raise DownloadCancelled("Cancelled")
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+def run_ffmpeg(args, output_path, cancel_event=None):
+    """Run ffmpeg into a temporary file next to output_path and move it into place on success.
+
+    If cancel_event is set while ffmpeg runs, ffmpeg is terminated (killed after
+    FFMPEG_KILL_GRACE), the temporary file removed and DownloadCancelled raised.
+    """
+    root, ext = os.path.splitext(output_path)
+    temp_path = f"{root}.temp{ext}"
+    process = subprocess.Popen([FFMPEG_PATH, '-y', '-nostdin', '-loglevel', 'error', *args, temp_path],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    while True:
+        try:
+            _, stderr = process.communicate(timeout=CANCEL_POLL_INTERVAL)
+            break
+        except subprocess.TimeoutExpired:
+            if cancel_event is None or not cancel_event.is_set():
+                continue
+            process.terminate()
+            try:
+                process.communicate(timeout=FFMPEG_KILL_GRACE)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise DownloadCancelled("Post-processing cancelled")
+    if process.returncode != 0:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        message = stderr.decode(errors='replace').strip().splitlines()
+        raise RuntimeError(f"ffmpeg failed: {message[-1] if message else process.returncode}")
+    os.replace(temp_path, output_path)
+
+def fetch_cover(url, path):
+    """Save a thumbnail for embedding; cover art is optional, so failures just return None"""
+    try:
+        with urllib.request.urlopen(url, timeout=15) as response, open(path, 'wb') as f:
+            shutil.copyfileobj(response, f)
+        return path
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+
+def metadata_args(item):
+    tags = {'title': item.get('title'), 'artist': item.get('uploader'), 'comment': item.get('url')}
+    args = []
+    for key, value in tags.items():
+        if value:
+            args += ['-metadata', f"{key}={value}"]
+    return args
+
+def classify_error(error):
+    """Return 'transient' for failures worth retrying and 'permanent' for the rest"""
+    message = str(error).lower()
+    if any(marker in message for marker in PERMANENT_ERROR_MARKERS):
+        return 'permanent'
+    if any(marker in message for marker in TRANSIENT_ERROR_MARKERS):
+        return 'transient'
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return 'transient'
+    return 'permanent'
+
+def backoff_delay(attempt, base=RETRY_BACKOFF_BASE, cap=RETRY_BACKOFF_CAP):
+    # "Equal jitter": at least half the exponential step, so retries never bunch up at zero
+    step = min(cap, base * 2 ** (attempt - 1))
+    return step / 2 + random.uniform(0, step / 2)
+
+class DownloadJob:
+    def __init__(self, item, download_dir, cookies, progress_board, on_status=None,
+                 max_retries=DEFAULT_JOB_RETRIES):
+        self.item = item
+        self.job_id = item['job_id']
+        self.download_dir = download_dir
+        self.cookies = cookies
+        self.progress_board = progress_board
+        self.on_status = on_status
+        self.max_retries = max_retries
+        self.last_progress = 0
+        self.last_bytes = 0
+        self.last_file = None
+        self.session = None
+        self.sample = None
+        self.files = {}
+        self.stem = None
+        self.output_path = None
+        self.audio_mode = None
+        self.downloaded_bytes = 0
+        self.finished_file = None
+        self.cancelled = False
+        self.cancel_event = threading.Event()
+
+    def status(self, message):
+        if self.on_status:
+            self.on_status(self.job_id, message)
+
+    @profiled
+    def run(self):
+        """Download the streams; merging/transcoding is left to postprocess() so the slot frees early"""
+        url = self.item['url']
+        title = self.item['title'].replace('/', '_').replace('\\', '_')[:100]
+        stem = self.stem = os.path.join(self.download_dir, title)
+
+        if 'audio_only' in self.item:
+            streams = [('audio', f"bestaudio[abr>={self.item['audio_format']['abr']}]")]
+            # Items journaled before audio modes existed were queued as mp3
+            self.audio_mode = self.item.get('audio_mode', 'mp3')
+            self.output_path = f"{stem}.mp3"
+        else:
+            streams = [
+                ('video', f"bestvideo[height={self.item['video_res']}][vcodec^={self.item['video_codec']}]"),
+                ('audio', f"bestaudio[abr>={self.item['audio_abr']}]"),
+            ]
+            self.output_path = f"{stem}.mp4"
+        ydl_opts = ydl_options(
+            self.cookies,
+            noprogress=False,
+            ignoreerrors=False,
+            continuedl=True,
+            retries=10,
+            fragment_retries=10
+        )
+
+        try:
+            with METRICS.timed('download', self.job_id):
+                retries, resumed_bytes = self.download_with_retries(url, stem, streams, ydl_opts)
+        finally:
+            BANDWIDTH.forget(self.job_id)
+        if self.audio_mode == 'original':
+            # Keep whatever codec YouTube served; only the container changes
+            ext = os.path.splitext(self.files['audio'])[1].lower()
+            self.output_path = f"{stem}.opus" if ext in OPUS_STREAM_EXTS else f"{stem}.m4a"
+        return {"title": title, "path": self.output_path, "retries": retries, "resumed_bytes": resumed_bytes}
+
+    def download_with_retries(self, url, stem, streams, ydl_opts):
+        resumed_bytes = 0
+        attempt = 0
+        while True:
+            attempt += 1
+            partial = self.partial_bytes(stem)
+            if partial:
+                resumed_bytes += partial
+                self.status(f"Resuming from {format_size(partial)} already on disk")
+            try:
+                # Only the first attempt may use cached stream URLs; a retry
+                # re-extracts in case they are what expired.
+                self.download_streams(url, stem, streams, ydl_opts, use_cache=attempt == 1)
+                return attempt - 1, resumed_bytes
+            except Exception as e:
+                if self.cancelled:
+                    raise DownloadCancelled("Download cancelled") from e
+                kind = classify_error(e)
+                if kind == 'permanent' or attempt > self.max_retries:
+                    raise RuntimeError(f"{e} ({kind}, after {attempt} attempt{'s' if attempt > 1 else ''})") from e
+                delay = backoff_delay(attempt)
+                self.status(f"Transient error, retry {attempt}/{self.max_retries} in {delay:.1f}s: {e}")
+                if self.cancel_event.wait(delay):
+                    raise DownloadCancelled("Download cancelled") from e
+
+    def download_streams(self, url, stem, streams, ydl_opts, use_cache):
+        # '%' in a title would otherwise be read as an output template field
+        template_stem = stem.replace('%', '%%')
+        self.files = {}
+        for name, format_spec in streams:
+            self.check_cancelled()
+            try:
+                path = self.download(url, format_spec, f"{template_stem}.{name}.%(ext)s", ydl_opts, use_cache)
+            except Exception as e:
+                if name != 'video' or 'requested format is not available' not in str(e).lower():
+                    raise
+                # No separate stream at the chosen resolution: take the best muxed file as is
+                self.files = {'muxed': self.download(url, 'best', self.output_path.replace('%', '%%'),
+                                                     ydl_opts, use_cache)}
+                break
+            self.files[name] = path
+        for path in self.files.values():
+            if not path or not os.path.exists(path):
+                raise RuntimeError("Download finished without producing an output file")
+        if 'muxed' in self.files and self.files['muxed'] != self.output_path:
+            os.replace(self.files['muxed'], self.output_path)
+
+    def download(self, url, format_spec, outtmpl, ydl_opts, use_cache):
+        info = METADATA_CACHE.get(self.item.get('video_id'), need_streams=True) if use_cache else None
+        self.finished_file = None
+        with YDL_SESSIONS.session(ydl_opts) as session:
+            if info is None:
+                info = session.extract_info(url)
+                METADATA_CACHE.put(info)
+            self.check_cancelled()
+            self.session = session
+            try:
+                # process_ie_result annotates the dict it is given, so each stream gets a fresh
+                # copy, without the selection an earlier extraction or stream already made
+                result = session.download(url, format_spec, outtmpl, self.progress_hook,
+                                          copy.deepcopy(unselected_info(info)), FRAGMENT_TUNER.choose())
+            finally:
+                self.session = None
+                self.sample = None
+                self.last_file = None
+                self.last_bytes = 0
+        downloads = (result or {}).get('requested_downloads') or [{}]
+        return downloads[-1].get('filepath') or self.finished_file
+
+    @property
+    def needs_postprocess(self):
+        return bool(self.files) and 'muxed' not in self.files
+
+    @profiled
+    def postprocess(self):
+        """Merge video+audio or transcode to mp3; CPU-bound, run from the engine's post-processing pool"""
+        cover = None
+        try:
+            with METRICS.timed('postprocess', self.job_id):
+                self.check_cancelled()
+                if 'video' in self.files:
+                    self.status("Merging formats...")
+                    run_ffmpeg(['-i', self.files['video'], '-i', self.files['audio'],
+                                '-map', '0:v:0', '-map', '1:a:0', '-c', 'copy', '-movflags', '+faststart'],
+                               self.output_path, self.cancel_event)
+                    return
+                embed = self.item.get('embed_metadata')
+                opus = self.output_path.endswith('.opus')
+                args = ['-i', self.files['audio']]
+                # Ogg/Opus has no attached-picture stream, so only tags go in there
+                if embed and not opus and self.item.get('thumbnail'):
+                    cover = fetch_cover(self.item['thumbnail'], os.path.splitext(self.output_path)[0] + '.cover')
+                if cover:
+                    args += ['-i', cover, '-map', '0:a', '-map', '1:v', '-c:v', 'mjpeg', '-disposition:v', 'attached_pic']
+                else:
+                    args += ['-map', '0:a']
+                if self.audio_mode == 'mp3':
+                    self.status("Converting to mp3...")
+                    # Explicit, or libmp3lame silently falls back to 128k
+                    args += ['-c:a', 'libmp3lame', '-b:a', MP3_BITRATE, '-id3v2_version', '3']
+                else:
+                    self.status("Remuxing audio...")
+                    args += ['-c:a', 'copy']
+                    if not opus:
+                        args += ['-movflags', '+faststart']
+                if embed:
+                    args += metadata_args(self.item)
+                run_ffmpeg(args, self.output_path, self.cancel_event)
+        finally:
+            with METRICS.timed('finalize', self.job_id):
+                # Stream files are kept if ffmpeg failed so a retry does not re-download them
+                done = os.path.exists(self.output_path)
+                for path in list(self.files.values()) + [cover]:
+                    try:
+                        if path and (done or path == cover):
+                            os.remove(path)
+                    except OSError:
+                        pass
+
+    def partial_bytes(self, stem):
+        total = 0
+        for path in glob.glob(glob.escape(stem) + '.*part*'):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def progress_hook(self, d):
+        # yt-dlp calls this from inside the transfer loop (and from each fragment
+        # thread), so raising here is what actually stops the download
+        self.check_cancelled()
+
+        if d['status'] == 'downloading':
+            downloaded = d.get('downloaded_bytes') or 0
+            # Each stream of a merged format counts from its own start, and a
+            # resumed stream starts at its .part size, which was never received now.
+            # A retry attempt starts without a sample even when it resumes the same file
+            sample = self.sample
+            if sample is None or d.get('filename') != self.last_file or downloaded < self.last_bytes:
+                self.last_file = d.get('filename')
+                self.last_bytes = downloaded
+                sample = self.sample = StreamSample(self.last_file, self.fragment_threads(), downloaded)
+            sample.update(d)
+            BANDWIDTH.consume(self.job_id, downloaded - self.last_bytes, self.cancel_event)
+            self.downloaded_bytes += downloaded - self.last_bytes
+            self.last_bytes = downloaded
+            self.check_cancelled()
+            now = time.monotonic()
+            if now - self.last_progress < self.progress_board.interval:
+                return
+            self.last_progress = now
+            self.progress_board.post(ProgressRecord(
+                self.job_id,
+                d.get('downloaded_bytes') or 0,
+                d.get('total_bytes') or d.get('total_bytes_estimate') or 0,
+                d.get('speed'),
+                d.get('eta'),
+                sample.threads if sample.fragments else 0
+            ))
+        elif d['status'] == 'finished':
+            self.finished_file = d.get('filename')
+            if self.sample is not None:
+                self.sample.report(d.get('downloaded_bytes') or d.get('total_bytes') or self.last_bytes)
+                self.sample = None
+
+    def fragment_threads(self):
+        if self.session is None:
+            return 1
+        return self.session.ydl.params.get('concurrent_fragment_downloads') or 1
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise DownloadCancelled("Download cancelled")
+
+    def cancel(self):
+        self.cancelled = True
+        self.cancel_event.set()
+
+    def discard_partial_files(self):
+        """Remove everything this job left behind except a finished output file"""
+        if not self.stem:
+            return
+        stem = glob.escape(self.stem)
+        patterns = [stem + '.video.*', stem + '.audio.*', stem + '.temp.*', stem + '.cover']
+        if self.output_path:
+            output = glob.escape(self.output_path)
+            patterns += [output + '.part*', output + '.ytdl']
+        for pattern in patterns:
+            for path in glob.glob(pattern):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+class JobJournal:
+    """Crash-safe record of every job and its state transitions (SQLite in WAL mode).
+
+    Jobs are written when they are queued and updated on each transition, so
+    whatever was still queued or running when the process died can be handed
+    back to the engine by unfinished().
+    """
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = None
+        self.next_position = 0
+
+    def connect(self):
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY, position INTEGER NOT NULL, state TEXT NOT NULL,"
+                " item TEXT NOT NULL, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, position);"
+                "CREATE TABLE IF NOT EXISTS job_events ("
+                " job_id TEXT NOT NULL, state TEXT NOT NULL, at REAL NOT NULL, detail TEXT);"
+                "CREATE INDEX IF NOT EXISTS job_events_by_job ON job_events (job_id);"
+            )
+            cutoff = time.time() - JOURNAL_RETENTION_DAYS * 86400
+            with self.conn:
+                self.conn.execute(
+                    "DELETE FROM job_events WHERE job_id IN (SELECT job_id FROM jobs"
+                    " WHERE state NOT IN (?, ?) AND updated_at < ?)",
+                    UNFINISHED_JOB_STATES + (cutoff,)
+                )
+                self.conn.execute(
+                    "DELETE FROM jobs WHERE state NOT IN (?, ?) AND updated_at < ?",
+                    UNFINISHED_JOB_STATES + (cutoff,)
+                )
+            row = self.conn.execute("SELECT MAX(position) FROM jobs").fetchone()
+            self.next_position = (row[0] or 0) + 1
+        return self.conn
+
+    def add_jobs(self, items):
+        now = time.time()
+        with self.lock:
+            conn = self.connect()
+            rows = []
+            for item in items:
+                rows.append((item['job_id'], self.next_position, 'queued',
+                             json.dumps(item, default=str), now, now))
+                self.next_position += 1
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO jobs (job_id, position, state, item, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)", rows
+                )
+                conn.executemany(
+                    "INSERT INTO job_events (job_id, state, at) VALUES (?, 'queued', ?)",
+                    [(row[0], now) for row in rows]
+                )
+
+    def set_state(self, job_ids, state, detail=None):
+        now = time.time()
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                conn.executemany(
+                    "UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                    [(state, detail, now, job_id) for job_id in job_ids]
+                )
+                conn.executemany(
+                    "INSERT INTO job_events (job_id, state, at, detail) VALUES (?, ?, ?, ?)",
+                    [(job_id, state, now, detail) for job_id in job_ids]
+                )
+
+    def reorder(self, job_ids):
+        with self.lock:
+            conn = self.connect()
+            first = self.next_position
+            self.next_position += len(job_ids)
+            with conn:
+                conn.executemany(
+                    "UPDATE jobs SET position = ? WHERE job_id = ?",
+                    [(first + offset, job_id) for offset, job_id in enumerate(job_ids)]
+                )
+
+    def unfinished(self):
+        with self.lock:
+            rows = self.connect().execute(
+                "SELECT item FROM jobs WHERE state IN (?, ?) ORDER BY position", UNFINISHED_JOB_STATES
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+class DownloadArchive:
+    """Persistent set of video_ids that finished downloading, and where they were saved.
+
+    All ids are loaded into memory on first use so membership checks are O(1);
+    an entry whose file has since been deleted no longer counts as downloaded.
+    """
+
+    def __init__(self, path=ARCHIVE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = None
+        self.paths = None
+
+    def connect(self):
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS archive ("
+                "video_id TEXT PRIMARY KEY, path TEXT, completed_at REAL NOT NULL)"
+            )
+            self.paths = dict(self.conn.execute("SELECT video_id, path FROM archive"))
+        return self.conn
+
+    def contains(self, video_id):
+        with self.lock:
+            self.connect()
+            if video_id not in self.paths:
+                return False
+            path = self.paths[video_id]
+        if path and not os.path.exists(path):
+            self.discard(video_id)
+            return False
+        return True
+
+    def add(self, video_id, path):
+        with self.lock:
+            conn = self.connect()
+            self.paths[video_id] = path
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO archive (video_id, path, completed_at) VALUES (?, ?, ?)",
+                    (video_id, path, time.time())
+                )
+
+    def discard(self, video_id):
+        with self.lock:
+            conn = self.connect()
+            self.paths.pop(video_id, None)
+            with conn:
+                conn.execute("DELETE FROM archive WHERE video_id = ?", (video_id,))
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+def skip_summary(skipped):
+    """'3 already downloaded, 1 already queued' from a {'downloaded': 3, 'queued': 1} count"""
+    return ", ".join(f"{count} already {reason}" for reason, count in sorted(skipped.items()) if count)
+
+class EngineListener:
+    """Callbacks fired by DownloadEngine, from whichever thread the event happened on"""
+
+    def job_started(self, item):
+        pass
+
+    def job_status(self, job_id, status):
+        pass
+
+    def job_downloaded(self, job_id):
+        """All streams are on disk and the job has left its download slot for post-processing"""
+        pass
+
+    def job_completed(self, job_id, result):
+        pass
+
+    def job_failed(self, job_id, title, error):
+        pass
+
+    def job_cancelled(self, job_id):
+        pass
+
+    def queue_finished(self, outcomes):
+        """outcomes counts this run's jobs by 'completed', 'failed' and 'cancelled'"""
+        pass
+
+class DownloadEngine:
+    """Ordered queue of download items drained by a fixed number of worker slots"""
+
+    def __init__(self, base_download_dir=DEFAULT_BASE_DOWNLOAD_DIR, cookies=COOKIE_PATH,
+                 max_concurrent=DEFAULT_MAX_CONCURRENT_DOWNLOADS, listener=None, progress_board=None,
+                 journal=None, archive=None, postprocess_workers=DEFAULT_POSTPROCESS_WORKERS,
+                 partial_policy=DEFAULT_PARTIAL_FILE_POLICY):
+        self.base_download_dir = base_download_dir
+        self.cookies = cookies
+        self.max_concurrent = max_concurrent
+        self.postprocess_workers = postprocess_workers
+        self.listener = listener or EngineListener()
+        self.progress_board = progress_board or ProgressBoard()
+        self.journal = journal
+        self.archive = archive
+        self.partial_policy = partial_policy
+        self.queued_videos = Counter()
+        self.pending = OrderedDict()
+        self.active = {}
+        # Downloaded jobs waiting for, and holding, a post-processing (ffmpeg) slot
+        self.postprocess_pending = deque()
+        self.postprocessing = {}
+        # Threads still running a job, including cancelled ones that no longer hold a slot
+        self.workers = set()
+        self.running = False
+        self.shutting_down = False
+        self.outcomes = dict.fromkeys(JOB_OUTCOMES, 0)
+        self.lock = threading.RLock()
+        self.idle = threading.Event()
+        self.idle.set()
+
+    def seen(self, video_id):
+        """'queued' if the video is pending or downloading, 'downloaded' if archived, else None"""
+        if not video_id:
+            return None
+        if self.queued_videos[video_id] > 0:
+            return 'queued'
+        if self.archive and self.archive.contains(video_id):
+            return 'downloaded'
+        return None
+
+    def filter_new(self, candidates, video_id_of):
+        """Drop candidates whose video is queued, archived or repeated; returns (kept, {reason: count})"""
+        kept = []
+        skipped = Counter()
+        batch = set()
+        for candidate in candidates:
+            video_id = video_id_of(candidate)
+            reason = 'listed' if video_id and video_id in batch else self.seen(video_id)
+            if reason:
+                skipped[reason] += 1
+                continue
+            if video_id:
+                batch.add(video_id)
+            kept.append(candidate)
+        return kept, skipped
+
+    def track(self, items, delta):
+        for item in items:
+            video_id = item.get('video_id')
+            if video_id:
+                self.queued_videos[video_id] += delta
+                if self.queued_videos[video_id] <= 0:
+                    del self.queued_videos[video_id]
+
+    def submit(self, items, journaled=False):
+        with self.lock:
+            for item in items:
+                item.setdefault('job_id', uuid.uuid4().hex)
+                item['queued_at'] = time.monotonic()
+                self.pending[item['job_id']] = item
+            self.track(items, 1)
+        if self.journal and not journaled:
+            self.journal.add_jobs(items)
+        if self.running:
+            self.fill_slots()
+
+    def restore(self):
+        """Re-queue the jobs the journal still has as queued or running"""
+        if not self.journal:
+            return []
+        items = self.journal.unfinished()
+        self.submit(items, journaled=True)
+        return items
+
+    def remove(self, job_ids):
+        with self.lock:
+            removed_items = [self.pending.pop(job_id) for job_id in job_ids if job_id in self.pending]
+            self.track(removed_items, -1)
+            removed = [item['job_id'] for item in removed_items]
+        self.record(removed, 'removed')
+        return removed
+
+    def clear(self):
+        with self.lock:
+            removed = list(self.pending)
+            self.track(self.pending.values(), -1)
+            self.pending.clear()
+        self.record(removed, 'removed')
+
+    def reorder(self, job_ids):
+        with self.lock:
+            ordered = OrderedDict((job_id, self.pending.pop(job_id)) for job_id in job_ids if job_id in self.pending)
+            ordered.update(self.pending)
+            self.pending = ordered
+            order = list(self.pending)
+        if self.journal:
+            self.journal.reorder(order)
+
+    def record(self, job_ids, state, detail=None):
+        if self.journal and job_ids:
+            self.journal.set_state(job_ids, state, detail)
+
+    def pending_count(self):
+        return len(self.pending)
+
+    def active_count(self):
+        return len(self.active)
+
+    def postprocess_count(self):
+        return len(self.postprocess_pending) + len(self.postprocessing)
+
+    def set_max_concurrent(self, value):
+        self.max_concurrent = value
+        if self.running:
+            self.fill_slots()
+
+    def set_postprocess_workers(self, value):
+        self.postprocess_workers = value
+        self.fill_postprocess()
+
+    def start(self):
+        with self.lock:
+            if not self.pending and not self.active and not self.postprocess_count():
+                return
+            if not self.running:
+                self.outcomes = dict.fromkeys(JOB_OUTCOMES, 0)
+            self.running = True
+            self.idle.clear()
+        self.fill_slots()
+
+    def fill_slots(self):
+        started = []
+        with self.lock:
+            while self.running and self.pending and len(self.active) < self.max_concurrent:
+                _, item = self.pending.popitem(last=False)
+                job = DownloadJob(
+                    item,
+                    dated_download_dir(self.base_download_dir),
+                    self.cookies,
+                    self.progress_board,
+                    self.listener.job_status
+                )
+                self.active[job.job_id] = job
+                started.append(job)
+                METRICS.start_job(item)
+                METRICS.observe('queue_wait', time.monotonic() - item.pop('queued_at', time.monotonic()), job.job_id)
+            finished = self.running and not self.pending and not self.active and not self.postprocess_count()
+
+        self.record([job.job_id for job in started], 'running')
+        for job in started:
+            self.listener.job_started(job.item)
+            self.start_worker(self.run_job, (job,), f"download-{job.job_id[:8]}")
+        if finished:
+            self.finish()
+
+    def start_worker(self, target, args, name):
+        thread = threading.Thread(target=self.run_worker, args=(target, args), name=name, daemon=True)
+        with self.lock:
+            self.workers.add(thread)
+        thread.start()
+
+    def run_worker(self, target, args):
+        try:
+            target(*args)
+        finally:
+            with self.lock:
+                self.workers.discard(threading.current_thread())
+
+    def run_job(self, job):
+        result = error = None
+        try:
+            result = job.run()
+        except Exception as e:
+            error = e
+        finally:
+            # Whoever takes the job out of self.active reports its outcome: this
+            # thread normally, cancel() if the job was cancelled mid-transfer.
+            # The slot is released as soon as the bytes are on disk; merging or
+            # transcoding waits for one of the separate post-processing slots.
+            with self.lock:
+                owned = self.active.pop(job.job_id, None) is not None
+                deferred = owned and result is not None and not job.cancelled and job.needs_postprocess
+                if deferred:
+                    job.postprocess_queued_at = time.monotonic()
+                    self.postprocess_pending.append((job, result))
+                elif owned:
+                    self.track([job.item], -1)
+            if job.cancelled:
+                self.discard_partial(job)
+            if owned and not deferred:
+                if job.cancelled:
+                    self.job_cancelled(job)
+                elif error is not None:
+                    self.job_failed(job, error)
+                else:
+                    self.job_completed(job, result)
+            if deferred:
+                self.listener.job_downloaded(job.job_id)
+                self.listener.job_status(job.job_id, "Waiting for post-processing...")
+                self.fill_postprocess()
+            self.fill_slots()
+
+    def fill_postprocess(self):
+        started = []
+        with self.lock:
+            while (self.postprocess_pending and not self.shutting_down
+                   and len(self.postprocessing) < self.postprocess_workers):
+                job, result = self.postprocess_pending.popleft()
+                self.postprocessing[job.job_id] = job
+                started.append((job, result))
+        for job, result in started:
+            self.start_worker(self.run_postprocess, (job, result), f"postprocess-{job.job_id[:8]}")
+
+    def run_postprocess(self, job, result):
+        METRICS.observe('postprocess_wait', time.monotonic() - job.postprocess_queued_at, job.job_id)
+        error = None
+        try:
+            job.postprocess()
+        except Exception as e:
+            error = e
+        finally:
+            with self.lock:
+                owned = self.postprocessing.pop(job.job_id, None) is not None
+            if job.cancelled:
+                self.discard_partial(job)
+            if owned:
+                if job.cancelled:
+                    self.job_cancelled(job)
+                elif error is not None:
+                    self.job_failed(job, error)
+                else:
+                    self.job_completed(job, result)
+                # Only now, so seen() never reports a just-finished video as new
+                with self.lock:
+                    self.track([job.item], -1)
+            self.fill_postprocess()
+            self.fill_slots()
+
+    def job_completed(self, job, result):
+        with METRICS.timed('finalize', job.job_id):
+            self.record([job.job_id], 'completed', result['path'])
+            if self.archive and job.item.get('video_id'):
+                self.archive.add(job.item['video_id'], result['path'])
+        METRICS.finish_job(job.job_id, 'completed', job.downloaded_bytes)
+        self.count_outcome('completed')
+        self.listener.job_completed(job.job_id, result)
+
+    def job_failed(self, job, error):
+        self.record([job.job_id], 'failed', str(error))
+        METRICS.finish_job(job.job_id, 'failed', job.downloaded_bytes)
+        self.count_outcome('failed')
+        self.listener.job_failed(job.job_id, job.item['title'], str(error))
+
+    def finish(self):
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+            self.idle.set()
+            outcomes = dict(self.outcomes)
+        self.listener.queue_finished(outcomes)
+
+    def wait(self, timeout=None):
+        return self.idle.wait(timeout)
+
+    def count_outcome(self, outcome):
+        with self.lock:
+            self.outcomes[outcome] += 1
+
+    def job_cancelled(self, job):
+        # Jobs interrupted by a shutdown stay queued so the next run picks them up
+        self.record([job.job_id], 'queued' if self.shutting_down else 'cancelled')
+        METRICS.finish_job(job.job_id, 'interrupted' if self.shutting_down else 'cancelled', job.downloaded_bytes)
+        if not self.shutting_down:
+            self.count_outcome('cancelled')
+        self.listener.job_cancelled(job.job_id)
+
+    def discard_partial(self, job):
+        # A job interrupted by shutdown resumes from its partial files next run
+        if self.partial_policy == 'delete' and not (self.shutting_down and self.journal):
+            job.discard_partial_files()
+
+    def cancel(self, job_ids):
+        """Cancel queued, downloading and post-processing jobs.
+
+        Their slots and bandwidth are released before this returns. The job
+        threads stop at their next progress callback (ffmpeg is terminated)
+        and then tidy up partial files according to partial_policy.
+        """
+        job_ids = set(job_ids)
+        with self.lock:
+            queued = [self.pending.pop(job_id) for job_id in list(self.pending) if job_id in job_ids]
+            stopped = [self.active.pop(job_id) for job_id in list(self.active) if job_id in job_ids]
+            stopped += [self.postprocessing.pop(job_id) for job_id in list(self.postprocessing) if job_id in job_ids]
+            waiting = [job for job, _ in self.postprocess_pending if job.job_id in job_ids]
+            self.postprocess_pending = deque(entry for entry in self.postprocess_pending
+                                             if entry[0].job_id not in job_ids)
+            self.track(queued + [job.item for job in stopped + waiting], -1)
+        self.record([item['job_id'] for item in queued], 'cancelled')
+        for item in queued:
+            self.count_outcome('cancelled')
+            self.listener.job_cancelled(item['job_id'])
+        for job in stopped + waiting:
+            job.cancel()
+            BANDWIDTH.forget(job.job_id)
+            self.job_cancelled(job)
+        # Nothing runs for jobs that were waiting for post-processing, so they are tidied here
+        for job in waiting:
+            self.discard_partial(job)
+        self.fill_postprocess()
+        if self.running:
+            self.fill_slots()
+        return [item['job_id'] for item in queued] + [job.job_id for job in stopped + waiting]
+
+    def cancel_all(self):
+        with self.lock:
+            job_ids = (list(self.pending) + list(self.active) + list(self.postprocessing)
+                       + [job.job_id for job, _ in self.postprocess_pending])
+        return self.cancel(job_ids)
+
+    def shutdown(self, timeout=SHUTDOWN_GRACE_SECONDS):
+        """Stop scheduling and interrupt running jobs, leaving the journal resumable.
+
+        Waits up to timeout seconds for the job threads (and their ffmpeg
+        children) to exit; returns False if some were still running.
+        """
+        with self.lock:
+            self.shutting_down = True
+            self.running = False
+            jobs = list(self.active.values()) + list(self.postprocessing.values())
+        for job in jobs:
+            job.cancel()
+        deadline = time.monotonic() + (timeout or 0)
+        with self.lock:
+            workers = list(self.workers)
+        for thread in workers:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        return not any(thread.is_alive() for thread in workers)
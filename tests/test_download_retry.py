@@ -0,0 +1,116 @@
+import os
+import sys
+import shutil
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import downloader_core
+
+
+class FlakyYoutubeDL:
+    """Writes one .part file in two halves and drops the connection after the first"""
+
+    attempts = 0
+    size = 4096
+
+    def __init__(self, params):
+        self.params = params
+        self.format_selector = None
+
+    def build_format_selector(self, format_spec):
+        return None
+
+    def extract_info(self, url, download=False):
+        return {'title': 'clip', 'ext': 'webm'}
+
+    def process_ie_result(self, info, download=True):
+        type(self).attempts += 1
+        path = self.params['outtmpl']['default'].replace('%(ext)s', 'webm').replace('%%', '%')
+        part = path + '.part'
+        start = os.path.getsize(part) if os.path.exists(part) else 0
+        self.hook({'status': 'downloading', 'filename': part, 'downloaded_bytes': start, 'total_bytes': self.size})
+        with open(part, 'ab') as f:
+            for downloaded in range(start, self.size, 1024):
+                f.write(b'\0' * 1024)
+                self.hook({'status': 'downloading', 'filename': part,
+                           'downloaded_bytes': downloaded + 1024, 'total_bytes': self.size})
+                if type(self).attempts == 1 and downloaded + 1024 == self.size // 2:
+                    raise OSError('Connection reset by peer')
+        os.replace(part, path)
+        self.hook({'status': 'finished', 'filename': path, 'downloaded_bytes': self.size})
+        return {'requested_downloads': [{'filepath': path}]}
+
+    def hook(self, d):
+        for hook in self.params['progress_hooks']:
+            hook(d)
+
+    def close(self):
+        pass
+
+
+class RetryResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.download_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.download_dir)
+        FlakyYoutubeDL.attempts = 0
+        stub = types.ModuleType('yt_dlp')
+        stub.YoutubeDL = FlakyYoutubeDL
+        patches = [
+            mock.patch.dict(sys.modules, {'yt_dlp': stub}),
+            mock.patch.object(downloader_core, 'YDL_SESSIONS', downloader_core.YDLSessionPool()),
+            mock.patch.object(downloader_core, 'backoff_delay', lambda attempt: 0),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_retry_resumes_partial_file(self):
+        item = {
+            'job_id': 'job-1',
+            'url': 'https://www.youtube.com/watch?v=aaaaaaaaaaa',
+            'title': 'clip',
+            'audio_only': True,
+            'audio_format': {'abr': 128},
+            'audio_mode': 'original',
+        }
+        job = downloader_core.DownloadJob(item, self.download_dir, 'missing-cookies.txt',
+                                          downloader_core.ProgressBoard(interval_ms=0))
+        result = job.run()
+
+        self.assertEqual(FlakyYoutubeDL.attempts, 2)
+        self.assertEqual(result['retries'], 1)
+        self.assertEqual(result['resumed_bytes'], FlakyYoutubeDL.size // 2)
+        # Bytes already on disk when the retry started are not counted twice
+        self.assertEqual(job.downloaded_bytes, FlakyYoutubeDL.size)
+        self.assertEqual(os.path.getsize(job.files['audio']), FlakyYoutubeDL.size)
+        self.assertEqual(result['path'], os.path.join(self.download_dir, 'clip.opus'))
+
+
+class ClassifyErrorTest(unittest.TestCase):
+    def test_missing_resources_are_permanent(self):
+        for message in ("unable to download video data: HTTP Error 404: Not Found",
+                        "unable to download video data: HTTP Error 410: Gone",
+                        "unable to download video data: HTTP Error 403: Forbidden",
+                        "Private video. Sign in if you've been granted access to this video"):
+            with self.subTest(message=message):
+                self.assertEqual(downloader_core.classify_error(Exception(message)), 'permanent')
+
+    def test_network_trouble_is_transient(self):
+        for error in (Exception("unable to download video data: HTTP Error 503: Service Unavailable"),
+                      Exception("unable to download video data: HTTP Error 429: Too Many Requests"),
+                      Exception("Read timed out."),
+                      OSError("Connection reset by peer"),
+                      ConnectionError("boom")):
+            with self.subTest(error=error):
+                self.assertEqual(downloader_core.classify_error(error), 'transient')
+
+    def test_unknown_errors_are_permanent(self):
+        self.assertEqual(downloader_core.classify_error(ValueError("bad value")), 'permanent')
+
+
+if __name__ == '__main__':
+    unittest.main()
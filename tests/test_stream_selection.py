@@ -0,0 +1,110 @@
+import copy
+import importlib.util
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import downloader_core
+
+STREAMS = {'/video': b'v' * 3000, '/audio': b'a' * 1000}
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requested.append(self.path)
+        body = STREAMS.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@unittest.skipUnless(importlib.util.find_spec('yt_dlp'), "needs yt-dlp")
+class StreamSelectionTest(unittest.TestCase):
+    """A stream download must select its format afresh from an already processed info_dict"""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StreamHandler)
+        self.server.requested = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.cache = downloader_core.MetadataCache(os.path.join(self.work_dir, 'cache.sqlite3'))
+        self.addCleanup(self.cache.close)
+        pool = downloader_core.YDLSessionPool()
+        self.addCleanup(pool.close_all)
+        for patch in (mock.patch.object(downloader_core, 'METADATA_CACHE', self.cache),
+                      mock.patch.object(downloader_core, 'YDL_SESSIONS', pool)):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        raw = {
+            'id': 'aaaaaaaaaaa', 'title': 'clip', 'duration': 10,
+            'extractor': 'generic', 'extractor_key': 'Generic', 'webpage_url': f"{base}/watch",
+            'formats': [
+                {'format_id': '136', 'url': f"{base}/video", 'ext': 'mp4', 'vcodec': 'avc1.4d401f',
+                 'acodec': 'none', 'height': 720, 'tbr': 1000},
+                {'format_id': '140', 'url': f"{base}/audio", 'ext': 'm4a', 'vcodec': 'none',
+                 'acodec': 'mp4a.40.2', 'abr': 128},
+            ],
+        }
+        # What extract_info() hands back: the default bestvideo*+bestaudio selection merged in
+        with downloader_core.YDL_SESSIONS.session(downloader_core.ydl_options('missing-cookies.txt')) as session:
+            self.processed = session.ydl.process_ie_result(raw, download=False)
+        self.assertEqual([f['format_id'] for f in self.processed['requested_formats']], ['136', '140'])
+
+    def download_audio(self):
+        item = {'job_id': 'job-1', 'url': self.processed['webpage_url'], 'title': 'clip',
+                'video_id': self.processed['id']}
+        job = downloader_core.DownloadJob(item, self.work_dir, 'missing-cookies.txt',
+                                          downloader_core.ProgressBoard())
+        ydl_opts = downloader_core.ydl_options('missing-cookies.txt', ignoreerrors=False)
+        outtmpl = os.path.join(self.work_dir, 'clip.audio.%(ext)s')
+        return job.download(item['url'], 'bestaudio', outtmpl, ydl_opts, use_cache=True)
+
+    def assert_audio_only(self, path):
+        self.assertEqual(self.server.requested, ['/audio'])
+        self.assertEqual(os.path.basename(path), 'clip.audio.m4a')
+        self.assertEqual(os.path.getsize(path), len(STREAMS['/audio']))
+
+    def test_cached_info(self):
+        self.cache.put(self.processed)
+        self.assert_audio_only(self.download_audio())
+
+    def test_pre_extracted_info(self):
+        with mock.patch.object(self.cache, 'get', lambda *args, **kwargs: copy.deepcopy(self.processed)):
+            self.assert_audio_only(self.download_audio())
+
+    def test_pooled_session_is_restored(self):
+        self.cache.put(self.processed)
+        self.download_audio()
+        ydl_opts = downloader_core.ydl_options('missing-cookies.txt', ignoreerrors=False)
+        with downloader_core.YDL_SESSIONS.session(ydl_opts) as session:
+            self.assertIsNone(session.ydl.params.get('format'))
+            self.assertIsNone(session.ydl.format_selector)
+            self.assertNotIn('concurrent_fragment_downloads', session.ydl.params)
+            self.assertNotIn('clip.audio', session.ydl.params['outtmpl']['default'])
+            # The next borrower's extraction gets the default bestvideo*+bestaudio selection again
+            info = session.ydl.process_ie_result(downloader_core.unselected_info(self.processed), download=False)
+        self.assertEqual([f['format_id'] for f in info['requested_formats']], ['136', '140'])
+
+
+if __name__ == '__main__':
+    unittest.main()